@@ -0,0 +1,98 @@
+# # Agregação das vendas em blocos (modo streaming)
+
+# Para extrações maiores que a memória: o CSV é lido em blocos de 'tamanho_bloco' linhas e, a cada bloco,
+# apenas os agregados usados em 'ice.py' são atualizados. A memória usada fica limitada ao tamanho do bloco
+# mais o número de grupos (plataformas, gêneros, classificações e anos), e não ao número de linhas.
+
+import argparse
+
+import pandas as pd
+
+from carregamento import COLUNAS_VENDAS, ler_jogos, limpar_jogos
+
+
+COLUNAS_SOMA = COLUNAS_VENDAS + ['total_sales']
+
+
+# Agrupando e aplicando a função de agregação, com o índice das colunas categóricas convertido para texto
+# (as categorias de cada bloco são diferentes, então os resultados parciais são combinados pelo valor)
+def _agrupar(dados, chave, colunas, funcao):
+    resultado = dados.groupby(chave, observed=True)[colunas].agg(funcao)
+    if isinstance(resultado.index, pd.CategoricalIndex):
+        resultado.index = resultado.index.astype(str)
+    return resultado
+
+
+# Combinando o agregado acumulado com o resultado parcial de um bloco
+def _acumular(acumulado, parcial, funcao):
+    if acumulado is None:
+        return parcial
+    return pd.concat([acumulado, parcial]).groupby(level=0).agg(funcao)
+
+
+# Calculando os agregados parciais de um bloco já limpo
+def _agregar_bloco(games, ano_inicio, ano_fim, ano_corte):
+    # As somas são acumuladas em float64, independente do tipo das colunas de vendas
+    dados = games[['platform', 'genre', 'rating', 'year_of_release']].copy()
+    dados[COLUNAS_SOMA] = games[COLUNAS_SOMA].astype('float64')
+
+    janela = dados[(dados['year_of_release'] >= ano_inicio) & (dados['year_of_release'] <= ano_fim)]
+    antes_corte = dados[dados['year_of_release'] < ano_corte]
+
+    return {
+        'vendas_por_plataforma': ('sum', _agrupar(dados, 'platform', 'total_sales', 'sum')),
+        'contagem_por_ano': ('sum', _agrupar(dados, 'year_of_release', 'total_sales', 'size')),
+        'vendas_por_plataforma_antes_corte': ('sum', _agrupar(antes_corte, 'platform', 'total_sales', 'sum')),
+        'anos_primeira_aparicao': ('min', _agrupar(dados, 'platform', 'year_of_release', 'min')),
+        'anos_ultima_aparicao': ('max', _agrupar(dados, 'platform', 'year_of_release', 'max')),
+        'contagem_janela_por_plataforma': ('sum', _agrupar(janela, 'platform', 'total_sales', 'size')),
+        'vendas_janela_por_plataforma': ('sum', _agrupar(janela, 'platform', COLUNAS_SOMA, 'sum')),
+        'vendas_janela_por_genero': ('sum', _agrupar(janela, 'genre', COLUNAS_SOMA, 'sum')),
+        'vendas_janela_por_classificacao': ('sum', _agrupar(janela, 'rating', COLUNAS_SOMA, 'sum')),
+    }
+
+
+# Calculando os agregados derivados (médias e tempo de vida) e ordenando os índices
+def _finalizar(acumulados):
+    agregados = {nome: valor.sort_index() for nome, valor in acumulados.items()}
+    agregados['contagem_por_ano'] = agregados['contagem_por_ano'].astype('int64')
+    agregados['contagem_janela_por_plataforma'] = agregados['contagem_janela_por_plataforma'].astype('int64')
+    agregados['vendas_medias_por_plataforma'] = (
+        agregados['vendas_janela_por_plataforma']['total_sales'] / agregados['contagem_janela_por_plataforma']
+    )
+    agregados['tempo_vida_plataformas'] = agregados['anos_ultima_aparicao'] - agregados['anos_primeira_aparicao']
+    return agregados
+
+
+# Calculando os agregados lendo o arquivo em blocos
+def agregar_em_blocos(caminho, tamanho_bloco=1_000_000, ano_inicio=2012, ano_fim=2016, ano_corte=1995):
+    acumulados = {}
+    for bloco in ler_jogos(caminho, chunksize=tamanho_bloco):
+        bloco = limpar_jogos(bloco)
+        if bloco.empty:
+            continue
+        for nome, (funcao, parcial) in _agregar_bloco(bloco, ano_inicio, ano_fim, ano_corte).items():
+            acumulados[nome] = _acumular(acumulados.get(nome), parcial, funcao)
+    return _finalizar(acumulados)
+
+
+# Calculando os mesmos agregados a partir de um DataFrame já carregado em memória (para comparação)
+def agregar_em_memoria(games, ano_inicio=2012, ano_fim=2016, ano_corte=1995):
+    parciais = _agregar_bloco(games, ano_inicio, ano_fim, ano_corte)
+    return _finalizar({nome: parcial for nome, (_, parcial) in parciais.items()})
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Agregação das vendas de jogos lendo o CSV em blocos.')
+    parser.add_argument('caminho', help='arquivo CSV de vendas')
+    parser.add_argument('--tamanho-bloco', type=int, default=1_000_000, help='número de linhas por bloco')
+    parser.add_argument('--ano-inicio', type=int, default=2012)
+    parser.add_argument('--ano-fim', type=int, default=2016)
+    parser.add_argument('--ano-corte', type=int, default=1995)
+    args = parser.parse_args()
+
+    agregados = agregar_em_blocos(args.caminho, args.tamanho_bloco, args.ano_inicio, args.ano_fim, args.ano_corte)
+    for nome, valor in agregados.items():
+        print(f'{nome}:')
+        print(valor)
+        print()
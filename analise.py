@@ -0,0 +1,332 @@
+# # Análise parametrizada por linha de comando
+
+# Ponto de entrada com os parâmetros que em 'ice.py' são constantes (arquivo, período de análise, limite de
+# vendas baixas, tamanho dos rankings, limiar de crescimento, ...). A análise é dividida em etapas nomeadas
+# (carregar -> limpar -> janela / cubo -> agregados, tendência, previsão, testes, correlações -> gráficos), e o
+# resultado de cada etapa fica salvo em disco, identificado pelos parâmetros que ela usa e pelas etapas de que
+# depende.
+# Assim, ao mudar apenas o limiar de crescimento, somente a etapa de tendência é executada novamente.
+#
+# Exemplo:
+#     python analise.py /datasets/games.csv --ano-inicio 2013 --limiar-crescimento 0.2
+
+import argparse
+import functools
+import hashlib
+import importlib.util
+import json
+import os
+import pickle
+import time
+from pathlib import Path
+
+from carregamento import DIR_CACHE_PADRAO, chave_cache, limpar_jogos
+from cubo import agregar_cubo, construir_cubo
+from instrumentacao import Rastreador
+from tendencias import matriz_anual, matriz_regioes, resumir_tendencias
+from validacao import gravar_quarentena, ler_validado
+
+
+# Registro das etapas: nome -> função, dependências, parâmetros usados, versão do código da etapa e módulos de
+# que ela depende (o hash do código-fonte desses módulos entra na chave, então uma mudança em 'relatorio.py', por
+# exemplo, refaz a etapa de gráficos mesmo sem mudar a versão). As etapas cujo resultado é um efeito fora do
+# cache (como os arquivos do relatório) têm memorizar=False e são executadas sempre: o resultado guardado seria
+# apenas o caminho de arquivos que podem ter sido apagados
+ETAPAS = {}
+
+
+def etapa(nome, dependencias=(), parametros=(), versao=1, modulos=(), memorizar=True):
+    def registrar(funcao):
+        ETAPAS[nome] = {
+            'funcao': funcao,
+            'dependencias': tuple(dependencias),
+            'parametros': tuple(parametros),
+            'versao': versao,
+            'modulos': tuple(modulos),
+            'memorizar': memorizar,
+        }
+        return funcao
+    return registrar
+
+
+# Hash do código-fonte de um módulo, lido do arquivo (sem importar o módulo)
+@functools.cache
+def hash_modulo(modulo):
+    origem = importlib.util.find_spec(modulo).origin
+    return hashlib.sha256(Path(origem).read_bytes()).hexdigest()[:12]
+
+
+# ## Etapas
+
+# As linhas que não passam na validação de 'validacao.py' ficam de fora. As rejeitadas fazem parte do resultado
+# da etapa, e o arquivo de quarentena é gravado por 'main' a cada execução (também quando a etapa vem do cache)
+@etapa('carregar', parametros=['caminho', 'arquivo'], versao=3, modulos=['validacao'])
+def carregar(caminho, arquivo):
+    jogos, rejeitadas, contagens = ler_validado(caminho)
+    if len(rejeitadas):
+        print(f'{len(rejeitadas)} linhas rejeitadas na validação:')
+        print(contagens.to_string())
+    return {'jogos': jogos, 'rejeitadas': rejeitadas}
+
+
+@etapa('limpar', dependencias=['carregar'], modulos=['carregamento'])
+def limpar(dados):
+    return limpar_jogos(dados['jogos'])
+
+
+@etapa('janela', dependencias=['limpar'], parametros=['ano_inicio', 'ano_fim'])
+def janela(games, ano_inicio, ano_fim):
+    games_novo = games[(games['year_of_release'] >= ano_inicio) & (games['year_of_release'] <= ano_fim)].copy()
+    for coluna in ['platform', 'genre', 'rating']:
+        games_novo[coluna] = games_novo[coluna].cat.remove_unused_categories()
+    return games_novo
+
+
+@etapa('cubo', dependencias=['limpar'], modulos=['cubo'])
+def cubo(games):
+    return construir_cubo(games)
+
+
+@etapa('agregados', dependencias=['cubo'],
+       parametros=['ano_inicio', 'ano_fim', 'ano_corte', 'limite_vendas_baixas', 'top_n'], modulos=['cubo'])
+def agregados(cubo, ano_inicio, ano_fim, ano_corte, limite_vendas_baixas, top_n):
+    anos = (ano_inicio, ano_fim)
+    vendas_antes_corte = agregar_cubo(cubo, 'platform', anos=(None, ano_corte - 1))
+    anos_primeira_aparicao = cubo.groupby('platform', observed=True)['year_of_release'].min()
+    anos_ultima_aparicao = cubo.groupby('platform', observed=True)['year_of_release'].max()
+    tempo_vida_plataformas = anos_ultima_aparicao - anos_primeira_aparicao
+
+    resultado = {
+        'contagem_por_ano': agregar_cubo(cubo, 'year_of_release', estatistica='contagem'),
+        'top_plataformas': agregar_cubo(cubo, 'platform').sort_values(ascending=False).head(top_n),
+        'plataformas_baixas_vendas_antes_corte': list(vendas_antes_corte[vendas_antes_corte < limite_vendas_baixas].index.astype(str)),
+        'tempo_vida_media': tempo_vida_plataformas.mean(),
+        'tempo_vida_mediana': tempo_vida_plataformas.median(),
+        'plataformas_lideres': agregar_cubo(cubo, 'platform', anos=anos).sort_values(ascending=False),
+        'vendas_por_genero': agregar_cubo(cubo, 'genre', anos=anos).sort_values(ascending=False),
+    }
+    for regiao in ['na_sales', 'eu_sales', 'jp_sales']:
+        for dimensao in ['platform', 'genre', 'rating']:
+            serie = agregar_cubo(cubo, dimensao, coluna=regiao, anos=anos).sort_values(ascending=False)
+            resultado[f'{dimensao}_{regiao}'] = serie if dimensao == 'rating' else serie.head(top_n)
+    return resultado
+
+
+@etapa('tendencia', dependencias=['cubo'], parametros=['ano_inicio', 'ano_fim', 'limiar_crescimento'], versao=2,
+       modulos=['tendencias'])
+def tendencia(cubo, ano_inicio, ano_fim, limiar_crescimento):
+    anos = (ano_inicio, ano_fim)
+    plataformas_lideres = agregar_cubo(cubo, 'platform', anos=anos).sort_values(ascending=False)
+    tendencias_plataformas = resumir_tendencias(matriz_anual(cubo, 'platform', anos=anos), limiar=limiar_crescimento)
+    crescendo = tendencias_plataformas.index[tendencias_plataformas['tendencia'] == 'crescendo']
+    diminuindo = tendencias_plataformas.index[tendencias_plataformas['tendencia'] == 'diminuindo']
+    return {
+        'tendencias_plataformas': tendencias_plataformas,
+        'tendencias_generos': resumir_tendencias(matriz_anual(cubo, 'genre', anos=anos), limiar=limiar_crescimento),
+        'tendencias_regioes': resumir_tendencias(matriz_regioes(cubo, anos=anos), limiar=limiar_crescimento),
+        'plataformas_crescendo': list(crescendo),
+        'plataformas_diminuindo': list(diminuindo),
+        'plataformas_potencialmente_lucrativas': sorted(set(plataformas_lideres.index.astype(str)) & set(crescendo)),
+    }
+
+
+@etapa('previsao', dependencias=['cubo'], parametros=['ano_inicio', 'ano_fim', 'nivel_previsao', 'anos_validacao'],
+       modulos=['previsao', 'tendencias'])
+def previsao(cubo, ano_inicio, ano_fim, nivel_previsao, anos_validacao):
+    from previsao import estatisticas_ciclo_vida, matriz_series, prever, validar
+    anos = (ano_inicio, ano_fim)
+    ciclo = estatisticas_ciclo_vida(cubo)
+    plataformas = matriz_anual(cubo, 'platform', anos=anos)
+    combinacoes = matriz_series(cubo, ('platform', 'genre'), anos=anos)
+    return {
+        'previsoes_plataformas': prever(plataformas, nivel=nivel_previsao, ciclo=ciclo),
+        'previsoes_generos': prever(matriz_anual(cubo, 'genre', anos=anos), nivel=nivel_previsao),
+        'previsoes_regioes': prever(matriz_regioes(cubo, anos=anos), nivel=nivel_previsao),
+        'previsoes_combinacoes': prever(combinacoes, nivel=nivel_previsao, ciclo=ciclo),
+        'validacao_plataformas': validar(plataformas, anos_validacao, nivel=nivel_previsao, ciclo=ciclo),
+        'validacao_combinacoes': validar(combinacoes, anos_validacao, nivel=nivel_previsao, ciclo=ciclo),
+    }
+
+
+@etapa('testes', dependencias=['janela'], parametros=['alfa', 'correcao'], modulos=['testes'])
+def testes(games_novo, alfa, correcao):
+    from testes import testar_pares
+    return {
+        'testes_plataformas': testar_pares(games_novo, 'platform', 'user_score', correcao=correcao, alfa=alfa),
+        'testes_generos': testar_pares(games_novo, 'genre', 'user_score', correcao=correcao, alfa=alfa),
+    }
+
+
+@etapa('correlacoes', dependencias=['janela'], parametros=['n_bootstrap', 'semente'], modulos=['correlacoes'])
+def correlacoes(games_novo, n_bootstrap, semente):
+    from correlacoes import correlacoes_por_plataforma
+    return {'correlacoes': correlacoes_por_plataforma(games_novo, n_bootstrap=n_bootstrap, semente=semente)}
+
+
+# A simulação usa um número fixo de sorteios, sem limite de tempo: com um tempo fixo, o número de sorteios (e o
+# resultado guardado) dependeria da máquina, e não só da chave
+@etapa('simulacao', dependencias=['janela'], parametros=['alocacoes', 'titulos', 'sorteios_simulacao', 'semente'],
+       versao=2, modulos=['simulacao'])
+def simulacao(games_novo, alocacoes, titulos, sorteios_simulacao, semente):
+    from simulacao import fronteira_eficiente, simular
+    resultado, informacoes = simular(games_novo, alocacoes, titulos, tempo=float('inf'), max_sorteios=sorteios_simulacao,
+                                     semente=semente)
+    return {
+        'simulacao': informacoes,
+        'alocacao_recomendada': resultado[resultado['recomendada']].T,
+        'maiores_valores_esperados': resultado.head(10),
+        'fronteira_eficiente': fronteira_eficiente(resultado),
+    }
+
+
+@etapa('graficos', dependencias=['limpar'], parametros=['ano_inicio', 'ano_fim', 'top_n', 'dir_graficos', 'dispersao'],
+       versao=3, modulos=['relatorio', 'esbocos', 'densidade'], memorizar=False)
+def graficos(games, ano_inicio, ano_fim, top_n, dir_graficos, dispersao):
+    from relatorio import gerar_relatorio
+    arquivo = gerar_relatorio(games, dir_graficos, janela=(ano_inicio, ano_fim), top_n=top_n, dispersao=dispersao)
+    return {'relatorio': str(arquivo)}
+
+
+# ## Execução com memorização em disco
+
+class Executor:
+    def __init__(self, parametros, dir_cache=DIR_CACHE_PADRAO, usar_cache=True, rastreador=None):
+        self.parametros = parametros
+        self.rastreador = rastreador if rastreador is not None else Rastreador()
+        self.dir_etapas = Path(dir_cache) / 'etapas'
+        self.usar_cache = usar_cache
+        self.chaves = {}
+        self.resultados = {}
+        self.origens = {}
+
+    # Chave de uma etapa: nome, versão, hash dos módulos, valores dos parâmetros que ela usa e chaves das etapas de
+    # que depende
+    def chave(self, nome):
+        if nome not in self.chaves:
+            definicao = ETAPAS[nome]
+            conteudo = {
+                'etapa': nome,
+                'versao': definicao['versao'],
+                'modulos': {modulo: hash_modulo(modulo) for modulo in definicao['modulos']},
+                'parametros': {p: self.parametros[p] for p in definicao['parametros']},
+                'dependencias': [self.chave(dep) for dep in definicao['dependencias']],
+            }
+            texto = json.dumps(conteudo, sort_keys=True, default=str)
+            self.chaves[nome] = hashlib.sha256(texto.encode('utf-8')).hexdigest()[:20]
+        return self.chaves[nome]
+
+    # Executando uma etapa: se o resultado já está em disco para a mesma chave, ele é lido e as dependências
+    # não são executadas (nem carregadas)
+    def executar(self, nome):
+        if nome in self.resultados:
+            return self.resultados[nome]
+
+        definicao = ETAPAS[nome]
+        arquivo = self.dir_etapas / f'{nome}-{self.chave(nome)}.pkl'
+        usar_cache = self.usar_cache and definicao['memorizar']
+        inicio = time.perf_counter()
+
+        if usar_cache and arquivo.exists():
+            with open(arquivo, 'rb') as entrada:
+                resultado = pickle.load(entrada)
+            self.origens[nome] = ('cache', time.perf_counter() - inicio)
+        else:
+            entradas = [self.executar(dep) for dep in definicao['dependencias']]
+            inicio = time.perf_counter()
+            with self.rastreador.secao(nome, entrada=entradas[0] if entradas else None) as secao:
+                resultado = definicao['funcao'](*entradas, **{p: self.parametros[p] for p in definicao['parametros']})
+                secao.saida(resultado)
+            self.origens[nome] = ('executada', time.perf_counter() - inicio)
+            if usar_cache:
+                self.dir_etapas.mkdir(parents=True, exist_ok=True)
+                temporario = arquivo.with_suffix(f'.tmp{os.getpid()}')
+                with open(temporario, 'wb') as saida:
+                    pickle.dump(resultado, saida, protocol=pickle.HIGHEST_PROTOCOL)
+                os.replace(temporario, arquivo)
+
+        self.resultados[nome] = resultado
+        return resultado
+
+
+def criar_parser():
+    parser = argparse.ArgumentParser(description='Análise das vendas de videogame da Loja Online Ice.')
+    parser.add_argument('caminho', nargs='?', default='/datasets/games.csv', help='arquivo CSV de vendas')
+    parser.add_argument('--ano-inicio', type=int, default=2012, help='primeiro ano do período de análise')
+    parser.add_argument('--ano-fim', type=int, default=2016, help='último ano do período de análise')
+    parser.add_argument('--ano-corte', type=int, default=1995, help='plataformas antigas: lançamentos antes deste ano')
+    parser.add_argument('--limite-vendas-baixas', type=float, default=1.0, help='vendas totais consideradas muito baixas')
+    parser.add_argument('--top-n', type=int, default=5, help='tamanho dos rankings')
+    parser.add_argument('--limiar-crescimento', type=float, default=0.1, help='variação mínima para crescimento/queda')
+    parser.add_argument('--nivel-previsao', type=float, default=0.9, help='nível dos intervalos das previsões')
+    parser.add_argument('--anos-validacao', type=int, default=2, help='últimos anos previstos na validação das previsões')
+    parser.add_argument('--alfa', type=float, default=0.05, help='nível de significância dos testes')
+    parser.add_argument('--correcao', default='holm', choices=['holm', 'bh'], help='correção para comparações múltiplas')
+    parser.add_argument('--n-bootstrap', type=int, default=10_000, help='reamostragens do bootstrap das correlações')
+    parser.add_argument('--semente', type=int, default=42, help='semente do bootstrap')
+    parser.add_argument('--alocacoes', type=int, default=5000, help='alocações candidatas da simulação da campanha')
+    parser.add_argument('--titulos', type=int, default=10, help='títulos sorteados por célula na simulação')
+    parser.add_argument('--sorteios-simulacao', type=int, default=20_000, help='número de sorteios da simulação da campanha')
+    parser.add_argument('--quarentena', metavar='ARQUIVO', help='arquivo CSV onde as linhas rejeitadas na validação são gravadas')
+    parser.add_argument('--graficos', metavar='DIR', help='gera o relatório de gráficos neste diretório')
+    parser.add_argument('--dispersao', default='densidade', choices=['densidade', 'pontos'],
+                        help='avaliações x vendas no relatório como grade de densidade ou como pontos')
+    parser.add_argument('--etapas', nargs='+', help='etapas finais a executar (padrão: todas)')
+    parser.add_argument('--dir-cache', default=DIR_CACHE_PADRAO, help='diretório do cache das etapas')
+    parser.add_argument('--sem-cache', action='store_true', help='executa todas as etapas sem ler nem gravar o cache')
+    parser.add_argument('--rastreio', metavar='ARQUIVO', help='grava o rastreio das etapas (.jsonl ou .json do Chrome)')
+    parser.add_argument('--perfil', action='store_true', help='grava um perfil do cProfile para cada etapa executada')
+    return parser
+
+
+def main(argv=None):
+    args = criar_parser().parse_args(argv)
+
+    parametros = {
+        'caminho': str(Path(args.caminho).resolve()),
+        'arquivo': chave_cache(args.caminho, args.dir_cache),
+        'ano_inicio': args.ano_inicio,
+        'ano_fim': args.ano_fim,
+        'ano_corte': args.ano_corte,
+        'limite_vendas_baixas': args.limite_vendas_baixas,
+        'top_n': args.top_n,
+        'limiar_crescimento': args.limiar_crescimento,
+        'nivel_previsao': args.nivel_previsao,
+        'anos_validacao': args.anos_validacao,
+        'alfa': args.alfa,
+        'correcao': args.correcao,
+        'n_bootstrap': args.n_bootstrap,
+        'semente': args.semente,
+        'alocacoes': args.alocacoes,
+        'titulos': args.titulos,
+        'sorteios_simulacao': args.sorteios_simulacao,
+        'dir_graficos': args.graficos,
+        'dispersao': args.dispersao,
+    }
+
+    etapas = args.etapas or ['agregados', 'tendencia', 'previsao', 'testes', 'correlacoes'] + (['graficos'] if args.graficos else [])
+    rastreador = Rastreador(args.rastreio, perfil=args.perfil)
+    executor = Executor(parametros, args.dir_cache, usar_cache=not args.sem_cache, rastreador=rastreador)
+    for nome in etapas:
+        if nome not in ETAPAS:
+            raise SystemExit(f'Etapa desconhecida: {nome} (etapas: {", ".join(ETAPAS)})')
+        resultado = executor.executar(nome)
+        if isinstance(resultado, dict):
+            for chave, valor in resultado.items():
+                print(f'{chave}:')
+                print(valor)
+                print()
+
+    # A quarentena reflete esta execução: o arquivo é substituído pelas linhas rejeitadas do arquivo atual
+    if args.quarentena:
+        rejeitadas = executor.executar('carregar')['rejeitadas']
+        gravar_quarentena(rejeitadas, args.quarentena, origem=parametros['caminho'], substituir=True)
+        print(f'{len(rejeitadas)} linhas rejeitadas em {args.quarentena}')
+
+    for nome, (origem, tempo) in executor.origens.items():
+        print(f'[{nome}] {origem} em {tempo:.3f} s')
+    rastreador.fechar()
+    return executor
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+# # Benchmark das etapas da análise com dados sintéticos
+
+# Gera arquivos sintéticos com o mesmo esquema de 'games.csv' em tamanhos maiores (por padrão 1e5, 1e6 e 1e7
+# linhas) e mede o tempo e o pico de memória (RSS) de cada etapa: leitura, limpeza, agrupamentos, testes e
+# gráficos. Cada tamanho roda em um processo separado, para que o pico de memória de um não contamine o do
+# outro. Os resultados são salvos em JSON e podem ser comparados com os de uma versão anterior (--comparar).
+#
+# Exemplo:
+#     python benchmark.py --tamanhos 1e5 1e6 --saida benchmark.json --comparar benchmark_anterior.json
+
+import argparse
+import json
+import multiprocessing
+import platform
+import queue
+import subprocess
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from instrumentacao import AmostradorRSS, rss_atual_mb, rss_pico_mb
+
+
+ARQUIVO_REFERENCIA = Path(__file__).resolve().parent / 'games.csv'
+COLUNAS_VENDAS_ORIGINAIS = ['NA_sales', 'EU_sales', 'JP_sales', 'Other_sales']
+
+
+# ## Geração dos dados sintéticos
+
+# Gerando 'n' linhas a partir do arquivo de referência: as linhas são sorteadas com reposição, o que mantém
+# as cardinalidades e as frequências de plataformas, gêneros e classificações, a relação entre plataforma e
+# ano, as taxas de valores nulos e os 'tbd' em 'User_Score'. As vendas são multiplicadas por um fator aleatório
+# e os nomes são sintéticos, com cada título repetido em algumas plataformas
+def gerar_dados_sinteticos(n, semente=0, referencia=None):
+    if referencia is None:
+        referencia = pd.read_csv(ARQUIVO_REFERENCIA, dtype=str)
+    rng = np.random.default_rng(semente)
+
+    dados = referencia.iloc[rng.integers(0, len(referencia), size=n)].reset_index(drop=True)
+    fator = rng.lognormal(mean=0.0, sigma=0.5, size=n)
+    for coluna in COLUNAS_VENDAS_ORIGINAIS:
+        dados[coluna] = (dados[coluna].astype('float64') * fator).round(2)
+
+    n_titulos = max(1, n // 3)
+    nomes_nulos = dados['Name'].isna()
+    dados['Name'] = pd.Series(rng.integers(0, n_titulos, size=n)).map('Jogo {}'.format)
+    dados.loc[nomes_nulos, 'Name'] = np.nan
+    return dados
+
+
+# Gravando o arquivo sintético em blocos (reaproveitando o arquivo se ele já existir)
+def arquivo_sintetico(n, dir_dados, semente=0, tamanho_bloco=1_000_000):
+    arquivo = Path(dir_dados) / f'games_sintetico_{n}_{semente}.csv'
+    if arquivo.exists():
+        return arquivo
+
+    Path(dir_dados).mkdir(parents=True, exist_ok=True)
+    referencia = pd.read_csv(ARQUIVO_REFERENCIA, dtype=str)
+    temporario = arquivo.with_suffix('.tmp')
+    for bloco, inicio in enumerate(range(0, n, tamanho_bloco)):
+        dados = gerar_dados_sinteticos(min(tamanho_bloco, n - inicio), semente + bloco, referencia)
+        dados.to_csv(temporario, mode='w' if bloco == 0 else 'a', header=bloco == 0, index=False)
+    temporario.replace(arquivo)
+    return arquivo
+
+
+# ## Medição
+
+# O pico de RSS de cada etapa é amostrado durante a etapa ('pico_rss_mb'). O pico do processo (ru_maxrss) é o
+# maior desde o início do processo, e é registrado uma vez por tamanho, em 'medir_etapas'
+class Medidor:
+    def __init__(self):
+        self.etapas = {}
+
+    def medir(self, nome, funcao, *args, **kwargs):
+        inicio = time.perf_counter()
+        with AmostradorRSS() as amostrador:
+            resultado = funcao(*args, **kwargs)
+        self.etapas[nome] = {
+            'segundos': time.perf_counter() - inicio,
+            'rss_mb': rss_atual_mb(),
+            'pico_rss_mb': amostrador.pico_mb,
+        }
+        return resultado
+
+
+# Executando as etapas da análise sobre um arquivo e medindo cada uma
+def medir_etapas(arquivo, graficos=True, janela=(2012, 2016)):
+    from carregamento import ler_jogos, limpar_jogos
+    from cubo import agregar_cubo, construir_cubo
+    from testes import testar_pares
+
+    medidor = Medidor()
+    dados = medidor.medir('leitura', ler_jogos, arquivo)
+    games = medidor.medir('limpeza', limpar_jogos, dados)
+    del dados
+
+    def agrupamentos():
+        cubo = construir_cubo(games)
+        for dimensao in ['platform', 'genre', 'rating']:
+            for coluna in ['total_sales', 'na_sales', 'eu_sales', 'jp_sales']:
+                agregar_cubo(cubo, dimensao, coluna=coluna, anos=janela)
+        agregar_cubo(cubo, 'year_of_release', estatistica='contagem')
+        return cubo
+    medidor.medir('agrupamentos', agrupamentos)
+
+    games_novo = games[(games['year_of_release'] >= janela[0]) & (games['year_of_release'] <= janela[1])]
+
+    def testes():
+        testar_pares(games_novo, 'platform', 'user_score')
+        testar_pares(games_novo, 'genre', 'user_score')
+    medidor.medir('testes', testes)
+
+    if graficos:
+        from relatorio import montar_figuras, renderizar
+        import tempfile
+
+        def figuras():
+            with tempfile.TemporaryDirectory() as dir_saida:
+                for nome, funcao, kwargs in montar_figuras(games, janela):
+                    renderizar(nome, funcao, kwargs, dir_saida)
+        medidor.medir('graficos', figuras)
+
+    return {'linhas': int(len(games)), 'etapas': medidor.etapas, 'pico_rss_processo_mb': rss_pico_mb()}
+
+
+# Executado em um processo separado para cada tamanho
+def _medir_em_processo(arquivo, graficos, fila):
+    try:
+        fila.put(medir_etapas(arquivo, graficos))
+    except Exception as erro:
+        fila.put({'erro': repr(erro)})
+
+
+# Esperando o resultado do processo sem bloquear para sempre: se o processo termina sem enviar nada (morto por
+# falta de memória nos tamanhos grandes, por exemplo), o erro é registrado com o código de saída
+def _esperar_resultado(processo, fila, intervalo=1.0):
+    while True:
+        try:
+            return fila.get(timeout=intervalo)
+        except queue.Empty:
+            if not processo.is_alive():
+                # O resultado pode ter chegado entre a espera e a verificação
+                try:
+                    return fila.get(timeout=intervalo)
+                except queue.Empty:
+                    return {'erro': f'exitcode {processo.exitcode}'}
+
+
+def medir_tamanho(n, dir_dados, semente=0, graficos=True):
+    arquivo = arquivo_sintetico(n, dir_dados, semente)
+    contexto = multiprocessing.get_context('spawn')
+    fila = contexto.Queue()
+    processo = contexto.Process(target=_medir_em_processo, args=(str(arquivo), graficos, fila))
+    processo.start()
+    resultado = _esperar_resultado(processo, fila)
+    processo.join()
+    resultado['tamanho'] = n
+    resultado['bytes_arquivo'] = arquivo.stat().st_size
+    return resultado
+
+
+# ## Resultados
+
+def versao_codigo():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=Path(__file__).resolve().parent,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def ambiente():
+    return {
+        'versao_codigo': versao_codigo(),
+        'data': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'maquina': platform.platform(),
+        'processador': platform.processor() or platform.machine(),
+    }
+
+
+# Comparando os tempos com os de um resultado anterior (razão atual / anterior para cada etapa)
+def comparar(atual, anterior):
+    anteriores = {r['tamanho']: r for r in anterior['resultados']}
+    linhas = []
+    for resultado in atual['resultados']:
+        base = anteriores.get(resultado['tamanho'])
+        if base is None or 'etapas' not in base or 'etapas' not in resultado:
+            continue
+        for etapa, medidas in resultado['etapas'].items():
+            if etapa in base['etapas']:
+                linhas.append({
+                    'tamanho': resultado['tamanho'],
+                    'etapa': etapa,
+                    'segundos_anterior': base['etapas'][etapa]['segundos'],
+                    'segundos_atual': medidas['segundos'],
+                    'razao': medidas['segundos'] / base['etapas'][etapa]['segundos'],
+                })
+    return pd.DataFrame(linhas)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark das etapas da análise com dados sintéticos.')
+    parser.add_argument('--tamanhos', nargs='+', type=float, default=[1e5, 1e6, 1e7], help='número de linhas')
+    parser.add_argument('--dir-dados', default='.benchmark_dados', help='diretório dos arquivos sintéticos')
+    parser.add_argument('--semente', type=int, default=0)
+    parser.add_argument('--sem-graficos', action='store_true', help='não mede a etapa de gráficos')
+    parser.add_argument('--saida', default='benchmark.json', help='arquivo JSON de resultados')
+    parser.add_argument('--comparar', help='arquivo JSON de uma execução anterior')
+    args = parser.parse_args()
+
+    resultados = {'ambiente': ambiente(), 'resultados': []}
+    for tamanho in args.tamanhos:
+        resultado = medir_tamanho(int(tamanho), args.dir_dados, args.semente, not args.sem_graficos)
+        resultados['resultados'].append(resultado)
+        pico_processo = resultado.get('pico_rss_processo_mb', float('nan'))
+        print(f"{int(tamanho):>12,} linhas   pico RSS do processo {pico_processo:9.1f} MB")
+        for etapa, medidas in resultado.get('etapas', {}).items():
+            print(f"    {etapa:<14} {medidas['segundos']:9.3f} s   pico RSS {medidas['pico_rss_mb']:9.1f} MB")
+        if 'erro' in resultado:
+            print(f"    erro: {resultado['erro']}")
+
+    Path(args.saida).write_text(json.dumps(resultados, indent=2))
+    print(f'Resultados: {args.saida}')
+
+    if args.comparar:
+        print(comparar(resultados, json.loads(Path(args.comparar).read_text())).to_string(index=False))
@@ -0,0 +1,139 @@
+# # Carregamento e preparação dos dados de vendas de jogos
+
+# Leitura do arquivo de vendas com tipos explícitos, aplicação da limpeza feita em 'ice.py' e
+# gravação de uma cópia já limpa em cache (Parquet), para que as execuções seguintes não
+# precisem interpretar o CSV novamente.
+
+import hashlib
+import importlib.util
+import json
+import os
+from pathlib import Path
+
+import pandas as pd
+
+
+# Versão da limpeza. Deve ser incrementada sempre que 'limpar_jogos' mudar, para invalidar os caches antigos
+VERSAO_LIMPEZA = 2
+
+# Diretório padrão do cache (pode ser alterado pela variável de ambiente ICE_CACHE_DIR)
+DIR_CACHE_PADRAO = os.environ.get('ICE_CACHE_DIR', '.cache_ice')
+
+COLUNAS_VENDAS = ['na_sales', 'eu_sales', 'jp_sales', 'other_sales']
+COLUNAS_CATEGORICAS = ['platform', 'genre', 'rating']
+
+# Tipos de cada coluna do arquivo original. 'User_Score' é lida como texto por conter o valor 'tbd'
+TIPOS_COLUNAS = {
+    'Name': str,
+    'Platform': 'category',
+    'Year_of_Release': 'float64',
+    'Genre': 'category',
+    'NA_sales': 'float32',
+    'EU_sales': 'float32',
+    'JP_sales': 'float32',
+    'Other_sales': 'float32',
+    'Critic_Score': 'float64',
+    'User_Score': str,
+    'Rating': 'category',
+}
+
+
+# Lendo o CSV com os tipos explícitos (sem inferência de tipos pelo pandas)
+def ler_jogos(caminho, **kwargs):
+    return pd.read_csv(caminho, dtype=TIPOS_COLUNAS, **kwargs)
+
+
+# Aplicando a mesma preparação de dados descrita em 'ice.py':
+# - nomes das colunas em letra minúscula
+# - remoção das linhas sem ano de lançamento
+# - valores nulos de texto substituídos por 'None'
+# - pontuações como float nulável (Float32), com as ausentes (e 'tbd') como nulas, e a coluna booleana
+#   'is_rated', que indica os jogos com as duas pontuações (usuário e crítica)
+# - criação da coluna 'total_sales'
+def limpar_jogos(games):
+    games = games.rename(columns=str.lower)
+    games = games.dropna(subset=['year_of_release'])
+
+    games['name'] = games['name'].fillna('None')
+    for coluna in COLUNAS_CATEGORICAS:
+        if 'None' not in games[coluna].cat.categories:
+            games[coluna] = games[coluna].cat.add_categories('None')
+        games[coluna] = games[coluna].fillna('None').cat.remove_unused_categories()
+
+    games['critic_score'] = games['critic_score'].astype('Float32')
+    games['user_score'] = pd.to_numeric(games['user_score'].replace('tbd', None)).astype('Float32')
+    games['is_rated'] = (games['user_score'].notna() & games['critic_score'].notna()).astype('bool')
+
+    games['year_of_release'] = games['year_of_release'].astype('int64')
+    games['total_sales'] = games[COLUNAS_VENDAS].sum(axis=1).astype('float32')
+    return games.reset_index(drop=True)
+
+
+# O cache usa Parquet quando o pyarrow está instalado; caso contrário, pickle
+def _formato_cache():
+    return 'parquet' if importlib.util.find_spec('pyarrow') is not None else 'pkl'
+
+
+# Calculando o hash do conteúdo do arquivo em blocos de 1 MB
+def hash_arquivo(caminho):
+    h = hashlib.blake2b(digest_size=16)
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(1 << 20), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+
+# Chave do cache: hash do conteúdo + mtime do arquivo + versão da limpeza.
+# O hash de cada arquivo fica registrado em 'indice.json' e só é recalculado quando o tamanho ou o mtime mudam
+def chave_cache(caminho, dir_cache=DIR_CACHE_PADRAO):
+    caminho = Path(caminho).resolve()
+    estado = caminho.stat()
+    arquivo_indice = Path(dir_cache) / 'indice.json'
+
+    indice = {}
+    if arquivo_indice.exists():
+        try:
+            indice = json.loads(arquivo_indice.read_text())
+        except ValueError:
+            indice = {}
+
+    registro = indice.get(str(caminho))
+    if registro is None or registro['tamanho'] != estado.st_size or registro['mtime_ns'] != estado.st_mtime_ns:
+        registro = {
+            'tamanho': estado.st_size,
+            'mtime_ns': estado.st_mtime_ns,
+            'hash': hash_arquivo(caminho),
+        }
+        indice[str(caminho)] = registro
+        Path(dir_cache).mkdir(parents=True, exist_ok=True)
+        temporario = arquivo_indice.with_suffix(f'.tmp{os.getpid()}')
+        temporario.write_text(json.dumps(indice, indent=1))
+        os.replace(temporario, arquivo_indice)
+
+    return f"{registro['hash']}-{registro['mtime_ns']}-v{VERSAO_LIMPEZA}"
+
+
+# Carregando os dados já limpos, a partir do cache quando disponível.
+# Com usar_cache=False o CSV é sempre lido e nada é gravado
+def carregar_jogos(caminho, dir_cache=DIR_CACHE_PADRAO, usar_cache=True):
+    if not usar_cache:
+        return limpar_jogos(ler_jogos(caminho))
+
+    formato = _formato_cache()
+    arquivo_cache = Path(dir_cache) / f'{Path(caminho).stem}-{chave_cache(caminho, dir_cache)}.{formato}'
+
+    if arquivo_cache.exists():
+        if formato == 'parquet':
+            return pd.read_parquet(arquivo_cache)
+        return pd.read_pickle(arquivo_cache)
+
+    games = limpar_jogos(ler_jogos(caminho))
+
+    # Gravando em um arquivo temporário e renomeando, para que uma execução interrompida não deixe um cache corrompido
+    temporario = arquivo_cache.with_suffix(f'.tmp{os.getpid()}')
+    if formato == 'parquet':
+        games.to_parquet(temporario, index=False)
+    else:
+        games.to_pickle(temporario)
+    os.replace(temporario, arquivo_cache)
+    return games
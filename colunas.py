@@ -0,0 +1,237 @@
+# # Armazenamento em colunas dos dados limpos
+
+# Os dados já limpos de 'carregamento.py' são gravados como um diretório de colunas do NumPy ('.npy'): as numéricas
+# como estão (pontuações ausentes como NaN) e 'platform', 'genre', 'rating' e 'name' codificadas por dicionário
+# (códigos inteiros + lista de valores em 'colunas.json'). Processos paralelos abrem as colunas com
+# np.load(mmap_mode='r'), e o sistema operacional compartilha as mesmas páginas entre eles, ou recebem os
+# nomes de blocos de multiprocessing.shared_memory; nos dois casos há uma única cópia física dos dados e nenhum
+# DataFrame é serializado para cada processo.
+#
+# Exemplo:
+#     python colunas.py /datasets/games.csv
+
+import argparse
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from carregamento import DIR_CACHE_PADRAO, VERSAO_LIMPEZA, carregar_jogos, chave_cache
+
+
+COLUNAS_DICIONARIO = ['platform', 'genre', 'rating', 'name']
+ARQUIVO_METADADOS = 'colunas.json'
+
+
+# ## Memória compartilhada
+
+class ArraysCompartilhados:
+    # Copiando cada array para um bloco de memória compartilhada. 'descritores' é o que os processos precisam para
+    # abrir os mesmos blocos (nome, formato e tipo de cada array)
+    def __init__(self, arrays):
+        self.blocos = {}
+        self.descritores = {}
+        for nome, array in arrays.items():
+            array = np.ascontiguousarray(array)
+            bloco = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+            np.ndarray(array.shape, dtype=array.dtype, buffer=bloco.buf)[...] = array
+            self.blocos[nome] = bloco
+            self.descritores[nome] = (bloco.name, array.shape, array.dtype.str)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *erro):
+        for bloco in self.blocos.values():
+            bloco.close()
+            bloco.unlink()
+
+
+# Abrindo, em outro processo, os blocos criados por ArraysCompartilhados (somente leitura). Os blocos são
+# guardados em 'blocos' para que não sejam fechados enquanto os arrays estiverem em uso
+def anexar_arrays(descritores, blocos):
+    arrays = {}
+    for nome, (nome_bloco, formato, tipo) in descritores.items():
+        bloco = shared_memory.SharedMemory(name=nome_bloco)
+        blocos[nome] = bloco
+        array = np.ndarray(formato, dtype=np.dtype(tipo), buffer=bloco.buf)
+        array.flags.writeable = False
+        arrays[nome] = array
+    return arrays
+
+
+# ## Gravação
+
+# Gravando o DataFrame limpo em um diretório de colunas. O diretório é montado em um temporário e renomeado no
+# final, para que uma gravação interrompida não deixe um armazenamento incompleto
+def salvar_colunas(games, diretorio):
+    diretorio = Path(diretorio)
+    temporario = diretorio.with_name(f'{diretorio.name}.tmp{os.getpid()}')
+    temporario.mkdir(parents=True, exist_ok=True)
+
+    metadados = {'linhas': int(len(games)), 'versao_limpeza': VERSAO_LIMPEZA, 'colunas': {}}
+    for coluna in games.columns:
+        serie = games[coluna]
+        if coluna in COLUNAS_DICIONARIO:
+            if isinstance(serie.dtype, pd.CategoricalDtype):
+                codigos, valores = serie.cat.codes.to_numpy(), serie.cat.categories
+            else:
+                codigos, valores = pd.factorize(serie)
+            tipo_codigos = np.int8 if len(valores) < 2 ** 7 else np.int16 if len(valores) < 2 ** 15 else np.int32
+            np.save(temporario / f'{coluna}.npy', codigos.astype(tipo_codigos))
+            metadados['colunas'][coluna] = {'tipo': str(serie.dtype), 'dicionario': [str(v) for v in valores]}
+        else:
+            tipo = str(serie.dtype)
+            valores = serie.to_numpy(dtype=tipo.lower(), na_value=np.nan) if tipo in ('Float32', 'Float64') else serie.to_numpy()
+            np.save(temporario / f'{coluna}.npy', valores)
+            metadados['colunas'][coluna] = {'tipo': tipo}
+
+    (temporario / ARQUIVO_METADADOS).write_text(json.dumps(metadados, ensure_ascii=False))
+    if diretorio.exists():
+        shutil.rmtree(diretorio)
+    os.replace(temporario, diretorio)
+    return diretorio
+
+
+# ## Leitura
+
+class ArmazemColunas:
+    def __init__(self, arrays, metadados):
+        self.arrays = arrays
+        self.metadados = metadados
+
+    # Abrindo as colunas do diretório como arrays mapeados em memória (nada é lido do disco até ser usado)
+    @classmethod
+    def abrir(cls, diretorio, colunas=None):
+        diretorio = Path(diretorio)
+        metadados = json.loads((diretorio / ARQUIVO_METADADOS).read_text())
+        colunas = colunas or list(metadados['colunas'])
+        arrays = {coluna: np.load(diretorio / f'{coluna}.npy', mmap_mode='r') for coluna in colunas}
+        return cls(arrays, metadados)
+
+    # Abrindo, em outro processo, as colunas copiadas para a memória compartilhada por 'compartilhar'
+    @classmethod
+    def anexar(cls, descritores, metadados, blocos):
+        return cls(anexar_arrays(descritores, blocos), metadados)
+
+    # Copiando as colunas para blocos de memória compartilhada; os processos usam 'descritores' e 'metadados'
+    # com ArmazemColunas.anexar
+    def compartilhar(self):
+        return ArraysCompartilhados(self.arrays)
+
+    def __len__(self):
+        return self.metadados['linhas']
+
+    def __getitem__(self, coluna):
+        return self.arrays[coluna]
+
+    @property
+    def colunas(self):
+        return list(self.arrays)
+
+    def dicionario(self, coluna):
+        return self.metadados['colunas'][coluna]['dicionario']
+
+    # Códigos das linhas com os valores pedidos em uma coluna codificada (para filtrar sem decodificar)
+    def codigos(self, coluna, valores):
+        dicionario = self.dicionario(coluna)
+        return np.array([dicionario.index(v) for v in valores if v in dicionario], dtype=self.arrays[coluna].dtype)
+
+    # Valores de uma coluna como no DataFrame original: as codificadas voltam a ser categorias ou texto, e todas
+    # voltam ao tipo original guardado nos metadados (o texto, por exemplo, como 'str' e não como 'object')
+    def serie(self, coluna, linhas=None):
+        valores = self.arrays[coluna] if linhas is None else self.arrays[coluna][linhas]
+        informacoes = self.metadados['colunas'][coluna]
+        if 'dicionario' in informacoes:
+            categorias = pd.Categorical.from_codes(np.asarray(valores), categories=informacoes['dicionario'])
+            if informacoes['tipo'] == 'category':
+                return pd.Series(categorias, name=coluna)
+            return pd.Series(np.asarray(categorias), name=coluna, dtype=informacoes['tipo'])
+        return pd.Series(np.asarray(valores), name=coluna).astype(informacoes['tipo'])
+
+    def dataframe(self, colunas=None, linhas=None):
+        return pd.concat([self.serie(coluna, linhas) for coluna in colunas or self.colunas], axis=1)
+
+
+# Armazenamento em colunas do arquivo, no diretório de cache (identificado pelo mesmo hash de 'carregamento.py')
+def carregar_colunas(caminho, dir_cache=DIR_CACHE_PADRAO, colunas=None):
+    diretorio = Path(dir_cache) / 'colunas' / f'{Path(caminho).stem}-{chave_cache(caminho, dir_cache)}'
+    if not (diretorio / ARQUIVO_METADADOS).exists():
+        salvar_colunas(carregar_jogos(caminho, dir_cache), diretorio)
+    return ArmazemColunas.abrir(diretorio, colunas)
+
+
+# ## Processamento paralelo
+
+# Armazém aberto em cada processo do pool (preenchido por '_abrir_no_processo')
+_ARMAZEM = {}
+
+
+def _abrir_no_processo(diretorio, descritores, metadados):
+    if descritores is None:
+        _ARMAZEM['armazem'] = ArmazemColunas.abrir(diretorio)
+    else:
+        _ARMAZEM['blocos'] = {}
+        _ARMAZEM['armazem'] = ArmazemColunas.anexar(descritores, metadados, _ARMAZEM['blocos'])
+
+
+def _executar_tarefa(funcao, tarefa):
+    return funcao(_ARMAZEM['armazem'], tarefa)
+
+
+# Executando funcao(armazem, tarefa) para cada tarefa em um pool de processos. Cada processo abre as colunas uma
+# única vez, mapeadas do disco (modo 'mmap') ou da memória compartilhada (modo 'compartilhada'). A função precisa
+# estar definida no nível de um módulo, para ser enviada aos processos
+def mapear_em_processos(funcao, tarefas, diretorio, processos=None, modo='mmap'):
+    if modo not in ('mmap', 'compartilhada'):
+        raise ValueError(f'Modo desconhecido: {modo} (use mmap ou compartilhada)')
+    armazem = ArmazemColunas.abrir(diretorio)
+    tarefas = list(tarefas)
+
+    if modo == 'mmap':
+        with ProcessPoolExecutor(processos, initializer=_abrir_no_processo, initargs=(str(diretorio), None, None)) as pool:
+            return list(pool.map(_executar_tarefa, [funcao] * len(tarefas), tarefas))
+
+    with armazem.compartilhar() as compartilhados, \
+            ProcessPoolExecutor(processos, initializer=_abrir_no_processo,
+                                initargs=(None, compartilhados.descritores, armazem.metadados)) as pool:
+        return list(pool.map(_executar_tarefa, [funcao] * len(tarefas), tarefas))
+
+
+# Vendas totais e número de jogos de uma plataforma (exemplo de tarefa para 'mapear_em_processos')
+def vendas_da_plataforma(armazem, plataforma):
+    linhas = np.isin(armazem['platform'], armazem.codigos('platform', [plataforma]))
+    return plataforma, float(armazem['total_sales'][linhas].sum(dtype='float64')), int(linhas.sum())
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Grava os dados limpos como colunas do NumPy para uso em paralelo.')
+    parser.add_argument('caminho', nargs='?', default='/datasets/games.csv', help='arquivo CSV de vendas')
+    parser.add_argument('--dir-cache', default=DIR_CACHE_PADRAO, help='diretório do cache')
+    parser.add_argument('--processos', type=int, help='processos do exemplo de leitura em paralelo')
+    parser.add_argument('--modo', default='mmap', choices=['mmap', 'compartilhada'])
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    armazem = carregar_colunas(args.caminho, args.dir_cache)
+    diretorio = Path(next(iter(armazem.arrays.values())).filename).parent
+    print(f'{len(armazem)} linhas em {diretorio} ({time.perf_counter() - inicio:.3f} s)')
+    for coluna in armazem.colunas:
+        print(f'    {coluna:<16} {str(armazem[coluna].dtype):<8} {armazem[coluna].nbytes / 2 ** 20:8.2f} MB')
+
+    # O DataFrame reconstruído das colunas é igual ao dos dados limpos (valores e tipos)
+    pd.testing.assert_frame_equal(armazem.dataframe(), carregar_jogos(args.caminho, args.dir_cache))
+    print('DataFrame reconstruído igual ao de carregar_jogos')
+
+    inicio = time.perf_counter()
+    resultados = mapear_em_processos(vendas_da_plataforma, armazem.dicionario('platform'), diretorio,
+                                     args.processos, args.modo)
+    print(f'Vendas por plataforma em paralelo ({args.modo}, {time.perf_counter() - inicio:.3f} s):')
+    for plataforma, vendas, jogos in sorted(resultados, key=lambda r: -r[1]):
+        print(f'    {plataforma:<6} {vendas:10.2f} {jogos:8d}')
@@ -0,0 +1,180 @@
+# # Correlações entre avaliações e vendas para todas as plataformas
+
+# Calcula, de uma só vez para todas as plataformas, as correlações de Pearson e de Spearman entre cada
+# avaliação ('user_score', 'critic_score') e cada coluna de vendas, com intervalos de confiança por bootstrap.
+# As estimativas pontuais saem de um único agrupamento (somas dos valores e dos postos dentro de cada
+# plataforma) e as reamostragens do bootstrap são geradas como matrizes de índices (reamostragens x jogos).
+
+import numpy as np
+import pandas as pd
+
+
+AVALIACOES = ['user_score', 'critic_score']
+VENDAS = ['total_sales', 'na_sales', 'eu_sales', 'jp_sales']
+
+# Limite aproximado de elementos de cada matriz de reamostragem, para controlar a memória usada no bootstrap
+ELEMENTOS_POR_BLOCO = 2_000_000
+
+# Com poucos jogos, boa parte das reamostragens repete um único jogo (correlação indefinida) e as demais dão
+# correlações de -1 ou 1: o intervalo só é calculado a partir deste número de jogos e se pelo menos esta fração
+# das reamostragens tem correlação definida; caso contrário, os limites do intervalo ficam NaN
+N_MINIMO_IC = 10
+FRACAO_MINIMA_VALIDAS = 0.5
+
+
+# Correlação de Pearson a partir das somas agrupadas: n, Σx, Σy, Σx², Σy², Σxy. Quando uma das variâncias é nula
+# (ou só não é nula por arredondamento, como em uma reamostragem em que todas as vendas são 0), a correlação é
+# indefinida (NaN), e não ±inf ou um valor fora de [-1, 1]
+def _pearson_somas(n, sx, sy, sxx, syy, sxy):
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variancia_x = sxx - sx ** 2 / n
+        variancia_y = syy - sy ** 2 / n
+        indefinida = (variancia_x <= 1e-12 * np.abs(sxx)) | (variancia_y <= 1e-12 * np.abs(syy))
+        return np.where(indefinida, np.nan, (sxy - sx * sy / n) / np.sqrt(variancia_x * variancia_y))[()]
+
+
+# Postos (com média nos empates) de cada valor dentro de cada reamostragem, a partir da matriz de contagens
+# (quantas vezes cada jogo foi sorteado em cada reamostragem). Basta uma ordenação dos valores originais,
+# sem ordenar cada reamostragem
+def postos_ponderados(valores, contagens):
+    ordem = np.argsort(valores, kind='stable')
+    ordenados = valores[ordem]
+    inicio_empates = np.flatnonzero(np.r_[True, ordenados[1:] != ordenados[:-1]])
+    tamanhos = np.diff(np.r_[inicio_empates, len(ordenados)])
+    totais = np.add.reduceat(contagens[:, ordem], inicio_empates, axis=1)
+    antes = np.cumsum(totais, axis=1) - totais
+    postos = np.empty(contagens.shape)
+    postos[:, ordem] = np.repeat(antes + (totais + 1) / 2, tamanhos, axis=1)
+    return postos
+
+
+# Correlação de Pearson de cada reamostragem, com os pares ponderados pelas contagens.
+# 'x' e 'y' podem ser vetores (valores originais, produtos matriz-vetor) ou matrizes (postos de cada reamostragem)
+def pearson_ponderado(contagens, x, y, centro_x, centro_y):
+    xc = x - centro_x
+    yc = y - centro_y
+    n = contagens.sum(axis=1)
+    if xc.ndim == 1 and yc.ndim == 1:
+        sx, sy, sxx, syy, sxy = (contagens @ np.column_stack([xc, yc, xc ** 2, yc ** 2, xc * yc])).T
+    else:
+        sx = np.einsum('ij,ij->i', contagens, xc)
+        sy = np.einsum('ij,ij->i', contagens, yc)
+        sxx = np.einsum('ij,ij,ij->i', contagens, xc, xc)
+        syy = np.einsum('ij,ij,ij->i', contagens, yc, yc)
+        sxy = np.einsum('ij,ij,ij->i', contagens, xc, yc)
+    return _pearson_somas(n, sx, sy, sxx, syy, sxy)
+
+
+# Reamostrando (com reposição) os pares de um grupo em blocos de reamostragens, e devolvendo as correlações
+# de Pearson e Spearman de cada reamostragem para cada coluna de vendas. Cada bloco é uma matriz de índices
+# sorteados (reamostragens x jogos), convertida em uma matriz de contagens com um único bincount
+def _bootstrap_grupo(x, ys, n_bootstrap, rng):
+    n = len(x)
+    tamanho_bloco = max(1, ELEMENTOS_POR_BLOCO // n)
+    pearson = np.empty((len(ys), n_bootstrap))
+    spearman = np.empty((len(ys), n_bootstrap))
+    centro_postos = (n + 1) / 2
+
+    for inicio in range(0, n_bootstrap, tamanho_bloco):
+        fim = min(inicio + tamanho_bloco, n_bootstrap)
+        indices = rng.integers(0, n, size=(fim - inicio, n))
+        deslocamento = np.arange(fim - inicio)[:, None] * n
+        contagens = np.bincount((indices + deslocamento).ravel(), minlength=(fim - inicio) * n)
+        contagens = contagens.reshape(fim - inicio, n).astype('float64')
+
+        x_postos = postos_ponderados(x, contagens)
+        for k, y in enumerate(ys):
+            pearson[k, inicio:fim] = pearson_ponderado(contagens, x, y, x.mean(), y.mean())
+            spearman[k, inicio:fim] = pearson_ponderado(
+                contagens, x_postos, postos_ponderados(y, contagens), centro_postos, centro_postos)
+
+    return pearson, spearman
+
+
+# Correlação de Pearson entre 'x' e 'y' considerando apenas as linhas da máscara (e sem valores nulos),
+# calculada com reduções mascaradas, sem criar cópias filtradas dos dados
+def correlacao_mascarada(x, y, mascara):
+    x = np.asarray(x, dtype='float64')
+    y = np.asarray(y, dtype='float64')
+    pesos = (np.asarray(mascara, dtype=bool) & ~np.isnan(x) & ~np.isnan(y)).astype('float64')
+    x = np.where(pesos > 0, x, 0.0)
+    y = np.where(pesos > 0, y, 0.0)
+    n = pesos.sum()
+    centro_x = (pesos @ x) / n
+    centro_y = (pesos @ y) / n
+    return pearson_ponderado(pesos[None, :], x, y, centro_x, centro_y)[0]
+
+
+# Limites do intervalo de confiança a partir das correlações das reamostragens (NaN nas reamostragens em que a
+# correlação é indefinida)
+def _intervalo(replicas, quantis):
+    validas = replicas[~np.isnan(replicas)]
+    if len(validas) < FRACAO_MINIMA_VALIDAS * len(replicas) or not len(validas):
+        return np.nan, np.nan
+    return tuple(np.percentile(validas, quantis))
+
+
+# Calculando as correlações para cada combinação de plataforma x avaliação x vendas.
+# Os jogos sem a avaliação (nula) são ignorados para aquela avaliação
+def correlacoes_por_plataforma(games, avaliacoes=AVALIACOES, vendas=VENDAS, grupo='platform',
+                               n_bootstrap=10_000, nivel=0.95, semente=None, n_minimo=3, n_minimo_ic=N_MINIMO_IC):
+    rng = np.random.default_rng(semente)
+    quantis = [(1 - nivel) / 2 * 100, (1 + nivel) / 2 * 100]
+    linhas = []
+
+    for avaliacao in avaliacoes:
+        x = games[avaliacao].to_numpy(dtype='float64', na_value=np.nan)
+        validos = ~np.isnan(x)
+
+        dados = pd.DataFrame({grupo: games[grupo].to_numpy()[validos], 'x': x[validos]})
+        for coluna in vendas:
+            dados[coluna] = games[coluna].to_numpy(dtype='float64')[validos]
+        agrupado = dados.groupby(grupo, observed=True)
+
+        # Postos dentro de cada grupo, para a correlação de Spearman
+        postos = agrupado[['x'] + list(vendas)].rank()
+        postos.columns = [f'posto_{coluna}' for coluna in postos.columns]
+
+        # Somas de cada grupo, calculadas em um único agrupamento
+        produtos = {'x2': dados['x'] ** 2, 'px2': postos['posto_x'] ** 2}
+        for coluna in vendas:
+            produtos[f'{coluna}_2'] = dados[coluna] ** 2
+            produtos[f'{coluna}_x'] = dados[coluna] * dados['x']
+            produtos[f'posto_{coluna}_2'] = postos[f'posto_{coluna}'] ** 2
+            produtos[f'posto_{coluna}_x'] = postos[f'posto_{coluna}'] * postos['posto_x']
+        somas = pd.concat([dados, postos, pd.DataFrame(produtos)], axis=1).groupby(grupo, observed=True).sum()
+        n = agrupado.size()
+
+        posicoes = agrupado.indices
+        for nome in somas.index:
+            n_grupo = int(n[nome])
+            if n_grupo < n_minimo:
+                continue
+
+            bootstrap = n_bootstrap and n_grupo >= n_minimo_ic
+            if bootstrap:
+                linhas_grupo = posicoes[nome]
+                x_grupo = dados['x'].to_numpy()[linhas_grupo]
+                ys = [dados[coluna].to_numpy()[linhas_grupo] for coluna in vendas]
+                pearson_boot, spearman_boot = _bootstrap_grupo(x_grupo, ys, n_bootstrap, rng)
+
+            s = somas.loc[nome]
+            for k, coluna in enumerate(vendas):
+                linha = {
+                    grupo: str(nome),
+                    'avaliacao': avaliacao,
+                    'vendas': coluna,
+                    'n': n_grupo,
+                    'pearson': _pearson_somas(n_grupo, s['x'], s[coluna], s['x2'], s[f'{coluna}_2'], s[f'{coluna}_x']),
+                    'spearman': _pearson_somas(n_grupo, s['posto_x'], s[f'posto_{coluna}'], s['px2'],
+                                               s[f'posto_{coluna}_2'], s[f'posto_{coluna}_x']),
+                }
+                if bootstrap:
+                    linha['pearson_ic_inf'], linha['pearson_ic_sup'] = _intervalo(pearson_boot[k], quantis)
+                    linha['spearman_ic_inf'], linha['spearman_ic_sup'] = _intervalo(spearman_boot[k], quantis)
+                elif n_bootstrap:
+                    linha.update(pearson_ic_inf=np.nan, pearson_ic_sup=np.nan, spearman_ic_inf=np.nan,
+                                 spearman_ic_sup=np.nan)
+                linhas.append(linha)
+
+    return pd.DataFrame(linhas)
@@ -0,0 +1,91 @@
+# # Cubo de agregados pré-calculados
+
+# O cubo guarda, para cada combinação de (ano, plataforma, gênero, classificação), a contagem de jogos e a
+# soma e a soma dos quadrados de cada coluna de vendas. É construído com uma única passada pelos dados, e
+# todos os agrupamentos por plataforma, gênero, classificação e ano feitos em 'ice.py' (somas, médias,
+# contagens e variâncias, em qualquer região) passam a ser obtidos a partir dele, sem varrer os dados de novo.
+
+import importlib.util
+
+import numpy as np
+import pandas as pd
+
+from carregamento import COLUNAS_VENDAS
+
+
+DIMENSOES = ['year_of_release', 'platform', 'genre', 'rating']
+COLUNAS_SOMA = COLUNAS_VENDAS + ['total_sales']
+ESTATISTICAS = ['soma', 'contagem', 'media', 'variancia', 'desvio']
+
+
+# Construindo o cubo a partir do DataFrame de jogos já limpo
+def construir_cubo(games):
+    dados = games[DIMENSOES].copy()
+    for coluna in COLUNAS_SOMA:
+        valores = games[coluna].astype('float64')
+        dados[f'{coluna}_soma'] = valores
+        dados[f'{coluna}_soma_quad'] = valores ** 2
+    dados['contagem'] = 1
+
+    cubo = dados.groupby(DIMENSOES, observed=True).sum()
+    return cubo.reset_index()
+
+
+# Selecionando as células do cubo dentro do intervalo de anos (inclusivo, None para sem limite)
+# e com os valores indicados em cada dimensão, por exemplo rating='M' ou platform=['PS4', 'XOne']
+def filtrar_cubo(cubo, anos=None, **filtros):
+    mascara = np.ones(len(cubo), dtype=bool)
+    if anos is not None:
+        inicio, fim = anos
+        if inicio is not None:
+            mascara &= (cubo['year_of_release'] >= inicio).to_numpy()
+        if fim is not None:
+            mascara &= (cubo['year_of_release'] <= fim).to_numpy()
+    for dimensao, valores in filtros.items():
+        if dimensao not in DIMENSOES:
+            raise ValueError(f'Dimensão desconhecida: {dimensao}')
+        if isinstance(valores, (str, int, np.integer)):
+            valores = [valores]
+        mascara &= cubo[dimensao].isin(list(valores)).to_numpy()
+    return cubo[mascara]
+
+
+# Agregando o cubo pelas dimensões em 'por' (uma ou mais), para a coluna e a estatística pedidas
+def agregar_cubo(cubo, por, coluna='total_sales', estatistica='soma', anos=None, **filtros):
+    if coluna not in COLUNAS_SOMA:
+        raise ValueError(f'Coluna desconhecida: {coluna}')
+    if estatistica not in ESTATISTICAS:
+        raise ValueError(f'Estatística desconhecida: {estatistica} (use uma de {ESTATISTICAS})')
+
+    selecionado = filtrar_cubo(cubo, anos, **filtros)
+    grupos = selecionado.groupby(por, observed=True)[[f'{coluna}_soma', f'{coluna}_soma_quad', 'contagem']].sum()
+    soma = grupos[f'{coluna}_soma']
+    soma_quad = grupos[f'{coluna}_soma_quad']
+    n = grupos['contagem']
+
+    if estatistica == 'soma':
+        resultado = soma
+    elif estatistica == 'contagem':
+        resultado = n
+    elif estatistica == 'media':
+        resultado = soma / n
+    else:
+        # Variância amostral (ddof=1) a partir das somas, como em pandas .var()
+        variancia = ((soma_quad - soma ** 2 / n) / (n - 1)).clip(lower=0).where(n > 1)
+        resultado = variancia if estatistica == 'variancia' else np.sqrt(variancia)
+
+    return resultado.rename('contagem' if estatistica == 'contagem' else coluna)
+
+
+# Salvando e lendo o cubo em disco (Parquet quando o pyarrow está instalado; caso contrário, pickle)
+def salvar_cubo(cubo, caminho):
+    if importlib.util.find_spec('pyarrow') is not None:
+        cubo.to_parquet(caminho, index=False)
+    else:
+        cubo.to_pickle(caminho)
+
+
+def carregar_cubo(caminho):
+    if importlib.util.find_spec('pyarrow') is not None:
+        return pd.read_parquet(caminho)
+    return pd.read_pickle(caminho)
@@ -0,0 +1,214 @@
+# # Gráficos de dispersão por densidade
+
+# Com milhões de pontos, o plt.scatter desenha cada ponto (o tempo cresce com o número de pontos) e o resultado
+# é uma mancha em que não se vê onde os pontos se concentram. Aqui os pontos são contados em uma grade
+# (histograma 2D calculado com NumPy, sem laços em Python) e o gráfico desenha apenas a grade, com a contagem de
+# cada célula em cores: o tempo de desenho depende do tamanho da grade, e não do número de pontos. O eixo das
+# vendas pode ser logarítmico (as vendas se concentram perto de zero, com poucos jogos muito vendidos), e os
+# histogramas de todas as plataformas são calculados de uma vez, para os gráficos em pequenos múltiplos.
+#
+# Exemplo:
+#     python densidade.py /datasets/games.csv --avaliacao critic_score --saida densidade.png
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+
+# Menor venda considerada no eixo logarítmico (vendas nulas ficam na primeira faixa)
+VENDA_MINIMA_LOG = 0.01
+
+
+# Valores como float64, com os nulos (inclusive pd.NA das colunas Float32) como NaN
+def _como_float(valores):
+    return pd.Series(valores).to_numpy(dtype='float64', na_value=np.nan)
+
+
+def _transformar(valores, log):
+    valores = _como_float(valores)
+    return np.log10(np.clip(valores, VENDA_MINIMA_LOG, None)) if log else valores
+
+
+# Menor passo entre os valores de um eixo discreto (as notas da crítica são inteiras, as dos usuários vão de 0.1
+# em 0.1), ou None se os valores não são múltiplos de nenhum dos passos
+PASSOS_DISCRETOS = (1.0, 0.1, 0.01)
+
+
+def resolucao(valores):
+    valores = _como_float(valores)
+    valores = valores[np.isfinite(valores)]
+    if not len(valores):
+        return None
+    for passo in PASSOS_DISCRETOS:
+        if np.allclose(valores / passo, np.round(valores / passo), rtol=0, atol=1e-3):
+            return passo
+    return None
+
+
+# Bordas alinhadas a um eixo discreto: cada faixa cobre o mesmo número inteiro de valores possíveis, com as
+# bordas no meio entre dois valores, de forma que nenhuma faixa fica vazia ou com um valor a mais só pela posição
+# das bordas (o que desenharia listras que não existem nos dados). O número de faixas fica no máximo em 'bins'
+def _bordas_discretas(inicio, fim, passo, bins):
+    inicio, fim = np.round(inicio / passo), np.round(fim / passo)
+    niveis = int(fim - inicio) + 1
+    largura = int(np.ceil(niveis / bins))
+    n = int(np.ceil(niveis / largura))
+    return (inicio - 0.5 + largura * np.arange(n + 1)) * passo
+
+
+# Bordas da grade em um eixo: 'bins' faixas iguais entre o mínimo e o máximo (na escala logarítmica, se 'log').
+# Com 'alinhar', se os valores são discretos, as bordas seguem a resolução dos valores (ver _bordas_discretas)
+def bordas(valores, bins=40, faixa=None, log=False, alinhar=False):
+    passo = resolucao(valores) if alinhar and not log else None
+    if passo is not None:
+        if faixa is None:
+            validos = _como_float(valores)
+            validos = validos[np.isfinite(validos)]
+            faixa = (validos.min(), validos.max())
+        return _bordas_discretas(faixa[0], faixa[1], passo, bins)
+
+    if faixa is None:
+        transformados = _transformar(valores, log)
+        transformados = transformados[np.isfinite(transformados)]
+        faixa = (transformados.min(), transformados.max()) if len(transformados) else (0.0, 1.0)
+    else:
+        faixa = tuple(_transformar(faixa, log))
+    inicio, fim = faixa
+    if fim <= inicio:
+        fim = inicio + 1.0
+    return np.linspace(inicio, fim, bins + 1)
+
+
+# Índice da faixa de cada valor (os valores fora da grade ficam nas faixas das pontas; os nulos, com -1)
+def _indices(valores, bordas_eixo):
+    n = len(bordas_eixo) - 1
+    passo = (bordas_eixo[-1] - bordas_eixo[0]) / n
+    nulos = np.isnan(valores)
+    indices = np.clip(np.floor((np.where(nulos, bordas_eixo[0], valores) - bordas_eixo[0]) / passo), 0, n - 1)
+    indices = indices.astype(np.int64)
+    indices[nulos] = -1
+    return indices
+
+
+# Contagens da grade para cada grupo, em uma única passada: o índice da célula de cada ponto é combinado com o
+# código do grupo e contado com np.bincount. Retorna um array (grupos, faixas de y, faixas de x), os grupos e as
+# bordas (na escala original). As bordas de x (as notas) são alinhadas à resolução dos valores quando eles são
+# discretos, e o número de faixas de x pode ficar menor que bins[0]
+def histogramas(x, y, grupos=None, bins=(40, 40), faixa_x=None, faixa_y=None, log_y=False):
+    x = _como_float(x)
+    y = _como_float(y)
+    bordas_x = bordas(x, bins[0], faixa_x, alinhar=True)
+    bordas_y = bordas(y, bins[1], faixa_y, log_y)
+
+    if grupos is None:
+        codigos, categorias = np.zeros(len(x), dtype=np.int64), np.array(['todos'], dtype=object)
+    else:
+        codigos, categorias = pd.factorize(pd.Series(grupos).astype(str), sort=True)
+
+    coluna = _indices(x, bordas_x)
+    linha = _indices(_transformar(y, log_y), bordas_y)
+    validos = (coluna >= 0) & (linha >= 0) & (codigos >= 0)
+    nx, ny = len(bordas_x) - 1, len(bordas_y) - 1
+    celulas = (codigos[validos] * ny + linha[validos]) * nx + coluna[validos]
+    contagens = np.bincount(celulas, minlength=len(categorias) * ny * nx).reshape(len(categorias), ny, nx)
+    return contagens, list(categorias), bordas_x, 10 ** bordas_y if log_y else bordas_y
+
+
+# ## Desenho
+
+# Desenhando uma grade de contagens (as células vazias ficam em branco, e as cores em escala logarítmica, para
+# que as células com poucos jogos continuem visíveis ao lado das mais cheias). O quarto mais claro do mapa de
+# cores é descartado, para que as células com um único jogo não se confundam com o fundo
+def desenhar_densidade(ax, contagens, bordas_x, bordas_y, log_y=False, cmap='viridis', maximo=None):
+    import matplotlib
+    from matplotlib.colors import ListedColormap, LogNorm
+
+    cores = ListedColormap(matplotlib.colormaps[cmap](np.linspace(0.25, 1, 256)))
+    grade = np.ma.masked_equal(contagens, 0)
+    maximo = maximo or max(int(contagens.max()), 1)
+    malha = ax.pcolormesh(bordas_x, bordas_y, grade, cmap=cores, norm=LogNorm(vmin=1, vmax=max(maximo, 2)),
+                          rasterized=True)
+    if log_y:
+        ax.set_yscale('log')
+    return malha
+
+
+# Barra de cores com as contagens como números inteiros (também nas marcas secundárias da escala logarítmica)
+def _barra_cores(fig, malha, **kwargs):
+    from matplotlib.ticker import FormatStrFormatter
+
+    barra = fig.colorbar(malha, label='Número de jogos', **kwargs)
+    barra.ax.yaxis.set_major_formatter(FormatStrFormatter('%.0f'))
+    barra.ax.yaxis.set_minor_formatter(FormatStrFormatter('%.0f'))
+    return barra
+
+
+def figura_densidade(contagens, bordas_x, bordas_y, titulo, xlabel, log_y=False, cmap='viridis'):
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(10, 6))
+    malha = desenhar_densidade(ax, contagens, bordas_x, bordas_y, log_y, cmap)
+    _barra_cores(fig, malha, ax=ax)
+    ax.set_title(titulo)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel('Vendas Totais (milhões)')
+    return fig
+
+
+# Pequenos múltiplos: um painel por grupo, com os mesmos eixos e a mesma escala de cores
+def figura_pequenos_multiplos(contagens, grupos, bordas_x, bordas_y, titulo, xlabel, log_y=False, colunas=6,
+                              cmap='viridis'):
+    import matplotlib.pyplot as plt
+
+    linhas = int(np.ceil(len(grupos) / colunas))
+    fig, eixos = plt.subplots(linhas, colunas, figsize=(2.6 * colunas, 2.2 * linhas), sharex=True, sharey=True,
+                              squeeze=False, constrained_layout=True)
+    maximo = max(int(contagens.max()), 1)
+    for ax, grupo, grade in zip(eixos.flat, grupos, contagens):
+        malha = desenhar_densidade(ax, grade, bordas_x, bordas_y, log_y, cmap, maximo)
+        ax.set_title(f'{grupo} ({int(grade.sum())})', fontsize=9)
+    for ax in eixos.flat[len(grupos):]:
+        ax.set_visible(False)
+    for ax in eixos[-1]:
+        ax.set_xlabel(xlabel)
+    for ax in eixos[:, 0]:
+        ax.set_ylabel('Vendas (milhões)')
+    _barra_cores(fig, malha, ax=eixos, shrink=0.6)
+    fig.suptitle(titulo)
+    return fig
+
+
+if __name__ == '__main__':
+    import matplotlib
+    matplotlib.use('Agg')
+
+    from carregamento import carregar_jogos
+
+    parser = argparse.ArgumentParser(description='Avaliações x vendas por densidade, com todas as plataformas.')
+    parser.add_argument('caminho', nargs='?', default='/datasets/games.csv', help='arquivo CSV de vendas')
+    parser.add_argument('--avaliacao', default='critic_score', choices=['critic_score', 'user_score'])
+    parser.add_argument('--ano-inicio', type=int, default=2012)
+    parser.add_argument('--ano-fim', type=int, default=2016)
+    parser.add_argument('--bins', type=int, nargs=2, default=[40, 40], metavar=('X', 'Y'), help='tamanho da grade')
+    parser.add_argument('--linear', action='store_true', help='eixo das vendas linear (padrão: logarítmico)')
+    parser.add_argument('--saida', default='densidade.png', help='arquivo PNG da figura')
+    args = parser.parse_args()
+
+    games = carregar_jogos(args.caminho)
+    janela = games[(games['year_of_release'] >= args.ano_inicio) & (games['year_of_release'] <= args.ano_fim)]
+    avaliados = janela[janela['is_rated'].to_numpy()]
+
+    inicio = time.perf_counter()
+    contagens, grupos, bordas_x, bordas_y = histogramas(
+        avaliados[args.avaliacao], avaliados['total_sales'],
+        avaliados['platform'], bins=args.bins, log_y=not args.linear)
+    tempo_grade = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    fig = figura_pequenos_multiplos(contagens, grupos, bordas_x, bordas_y, f'{args.avaliacao} x vendas totais',
+                                    args.avaliacao, log_y=not args.linear)
+    fig.savefig(args.saida, dpi=100)
+    print(f'{len(avaliados)} jogos em {len(grupos)} plataformas; grade em {tempo_grade:.3f} s, '
+          f'figura em {time.perf_counter() - inicio:.3f} s: {args.saida}')
@@ -0,0 +1,345 @@
+# # Esboços de quantis e de contagem de distintos
+
+# O diagrama de caixa das vendas por plataforma e as tabelas de resumo precisam dos quantis de cada plataforma,
+# e os quantis exatos exigem guardar e ordenar todas as vendas. Aqui cada grupo é resumido por esboços de
+# tamanho limitado, que podem ser construídos em uma passada pelos dados (bloco a bloco) e combinados entre
+# blocos ou processos:
+# - EsbocoQuantis: esboço KLL (Karnin, Lang e Liberty). Os valores ficam em níveis; quando um nível passa da
+#   capacidade, ele é ordenado e metade dos valores (alternados, a partir de uma posição sorteada) sobe para o
+#   nível seguinte com o dobro do peso. O erro de posto é da ordem de 1/k, e a memória, de k valores por grupo.
+#   Enquanto o grupo tem até 'limite_exato' valores, nada é compactado: os quantis e os bigodes dos diagramas de
+#   caixa são exatos, e a aproximação só começa nos grupos grandes demais para guardar inteiros.
+# - HyperLogLog: contagem aproximada de valores distintos (títulos por plataforma ou gênero) com 2 ** p
+#   registradores de um byte; o erro padrão relativo é de 1.04 / sqrt(2 ** p). Até 2 ** p valores distintos, a
+#   contagem é exata (os hashes são guardados), e a estimativa nunca passa do número de valores recebidos.
+#
+# Exemplo:
+#     python esbocos.py /datasets/games.csv --tamanho-bloco 5000
+
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+
+from carregamento import ler_jogos, limpar_jogos
+
+
+# ## Quantis
+
+class EsbocoQuantis:
+    FATOR_CAPACIDADE = 2 / 3
+    LIMITE_EXATO = 100_000
+
+    def __init__(self, k=200, semente=None, limite_exato=LIMITE_EXATO):
+        self.k = k
+        self.limite_exato = limite_exato
+        self.niveis = [np.empty(0)]
+        self.n = 0
+        self.minimo = np.inf
+        self.maximo = -np.inf
+        self._rng = np.random.default_rng(semente)
+
+    def __len__(self):
+        return self.n
+
+    # Número de valores guardados (a memória do esboço)
+    @property
+    def tamanho(self):
+        return sum(len(nivel) for nivel in self.niveis)
+
+    # Capacidade de um nível: k no nível mais alto, diminuindo em uma progressão geométrica para os mais baixos
+    def _capacidade(self, nivel):
+        altura = len(self.niveis) - 1 - nivel
+        return max(2, int(np.ceil(self.k * self.FATOR_CAPACIDADE ** altura)))
+
+    # Compactando os níveis acima da capacidade (só depois que o grupo passa de 'limite_exato' valores)
+    def _compactar(self):
+        if self.n <= self.limite_exato:
+            return
+        nivel = 0
+        while nivel < len(self.niveis):
+            valores = self.niveis[nivel]
+            if len(valores) <= self._capacidade(nivel):
+                nivel += 1
+                continue
+            if nivel + 1 == len(self.niveis):
+                self.niveis.append(np.empty(0))
+            valores = np.sort(valores)
+            # Com um número ímpar de valores, o último fica no nível
+            sobra = valores[len(valores) - len(valores) % 2:]
+            promovidos = valores[self._rng.integers(2):len(valores) - len(sobra):2]
+            self.niveis[nivel] = sobra
+            self.niveis[nivel + 1] = np.concatenate([self.niveis[nivel + 1], promovidos])
+            nivel = 0
+
+    def atualizar(self, valores):
+        valores = np.asarray(valores, dtype='float64')
+        valores = valores[~np.isnan(valores)]
+        if not len(valores):
+            return self
+        self.n += len(valores)
+        self.minimo = min(self.minimo, valores.min())
+        self.maximo = max(self.maximo, valores.max())
+        self.niveis[0] = np.concatenate([self.niveis[0], valores])
+        self._compactar()
+        return self
+
+    # Combinando outro esboço a este (os níveis de mesmo peso são concatenados e compactados)
+    def combinar(self, outro):
+        for nivel, valores in enumerate(outro.niveis):
+            if nivel == len(self.niveis):
+                self.niveis.append(np.empty(0))
+            self.niveis[nivel] = np.concatenate([self.niveis[nivel], valores])
+        self.n += outro.n
+        self.minimo = min(self.minimo, outro.minimo)
+        self.maximo = max(self.maximo, outro.maximo)
+        self._compactar()
+        return self
+
+    # Valores guardados, ordenados, com o peso de cada um e o peso acumulado
+    def _ordenados(self):
+        valores = np.concatenate(self.niveis)
+        pesos = np.concatenate([np.full(len(nivel), 2.0 ** i) for i, nivel in enumerate(self.niveis)])
+        ordem = np.argsort(valores, kind='stable')
+        return valores[ordem], pesos[ordem], np.cumsum(pesos[ordem])
+
+    # Se o esboço ainda guarda todos os valores (nada foi compactado)
+    @property
+    def exato(self):
+        return len(self.niveis) == 1
+
+    # Quantis com interpolação linear entre os postos centrais dos valores guardados (um valor de peso w
+    # representa w postos consecutivos). Enquanto nada foi compactado, o resultado é o mesmo de np.quantile
+    def quantis(self, q):
+        q = np.atleast_1d(np.asarray(q, dtype='float64'))
+        if self.n == 0:
+            return np.full(len(q), np.nan)
+        valores, pesos, acumulado = self._ordenados()
+        centros = acumulado - (pesos + 1) / 2
+        resultado = np.interp(q * (self.n - 1), centros, valores)
+        resultado[q <= 0] = self.minimo
+        resultado[q >= 1] = self.maximo
+        return resultado
+
+    def quantil(self, q):
+        return float(self.quantis([q])[0])
+
+    # Menor e maior valor guardado (ou o mínimo e o máximo) dentro do intervalo [inferior, superior]. Os valores
+    # guardados são observações reais, então o resultado é sempre um valor que ocorre nos dados
+    def extremos_entre(self, inferior, superior):
+        valores = np.concatenate([[self.minimo], np.concatenate(self.niveis), [self.maximo]])
+        valores = valores[(valores >= inferior) & (valores <= superior)]
+        return (valores.min(), valores.max()) if len(valores) else (np.nan, np.nan)
+
+    # Fração aproximada dos valores menores ou iguais a cada x
+    def posto(self, x):
+        x = np.atleast_1d(np.asarray(x, dtype='float64'))
+        if self.n == 0:
+            return np.full(len(x), np.nan)
+        valores, _, acumulado = self._ordenados()
+        posicoes = np.searchsorted(valores, x, side='right')
+        return np.where(posicoes > 0, acumulado[np.maximum(posicoes - 1, 0)], 0.0) / acumulado[-1]
+
+
+# ## Contagem de distintos
+
+# Extraindo o número de zeros à esquerda de inteiros de 64 bits (em seis deslocamentos, sem passar por float)
+def _zeros_a_esquerda(x):
+    x = x.astype(np.uint64)
+    zeros = np.zeros(len(x), dtype=np.int64)
+    for deslocamento in [32, 16, 8, 4, 2, 1]:
+        vazio = (x >> np.uint64(64 - deslocamento)) == 0
+        zeros[vazio] += deslocamento
+        x[vazio] <<= np.uint64(deslocamento)
+    zeros[x == 0] = 64
+    return zeros
+
+
+class HyperLogLog:
+    def __init__(self, p=12, limite_exato=None):
+        self.p = p
+        self.registros = np.zeros(2 ** p, dtype=np.uint8)
+        self.n = 0
+        # Enquanto há poucos valores distintos, os hashes são guardados e a contagem é exata (até 'limite_exato'
+        # hashes, por padrão o número de registradores)
+        self.limite_exato = 2 ** p if limite_exato is None else limite_exato
+        self.hashes = np.empty(0, dtype=np.uint64)
+
+    def _guardar(self, hashes):
+        if self.hashes is not None:
+            self.hashes = np.union1d(self.hashes, hashes)
+            if len(self.hashes) > self.limite_exato:
+                self.hashes = None
+
+    def atualizar(self, valores):
+        valores = pd.Series(valores).dropna()
+        if not len(valores):
+            return self
+        self.n += len(valores)
+        hashes = pd.util.hash_array(valores.astype(str).to_numpy(dtype=object))
+        self._guardar(hashes)
+        indices = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        # Posição do primeiro bit 1 depois dos p bits do índice (limitada ao número de bits restantes)
+        restantes = hashes << np.uint64(self.p)
+        postos = np.minimum(_zeros_a_esquerda(restantes) + 1, 64 - self.p + 1).astype(np.uint8)
+        np.maximum.at(self.registros, indices, postos)
+        return self
+
+    def combinar(self, outro):
+        if outro.p != self.p:
+            raise ValueError(f'Esboços com precisões diferentes: {self.p} e {outro.p}')
+        np.maximum(self.registros, outro.registros, out=self.registros)
+        self.n += outro.n
+        if outro.hashes is None:
+            self.hashes = None
+        else:
+            self._guardar(outro.hashes)
+        return self
+
+    # Contagem exata enquanto os hashes estão guardados; depois, a estimativa do HyperLogLog (com a contagem
+    # linear para cardinalidades pequenas), nunca maior que o número de valores recebidos
+    def contagem(self):
+        if self.hashes is not None:
+            return float(len(self.hashes))
+        m = len(self.registros)
+        alfa = 0.7213 / (1 + 1.079 / m)
+        estimativa = alfa * m * m / np.sum(2.0 ** -self.registros.astype('float64'))
+        vazios = int(np.count_nonzero(self.registros == 0))
+        if estimativa <= 2.5 * m and vazios:
+            estimativa = m * np.log(m / vazios)
+        return float(min(estimativa, self.n))
+
+
+# ## Esboços por grupo
+
+# Atualizando um esboço por grupo a partir de um bloco de dados. Os valores são separados por grupo de uma vez
+# (ordenação pelos códigos do grupo), e cada esboço recebe o seu trecho
+def atualizar_por_grupo(esbocos, grupos, valores, criar):
+    codigos, categorias = pd.factorize(pd.Series(grupos).astype(str))
+    ordem = np.argsort(codigos, kind='stable')
+    limites = np.cumsum(np.bincount(codigos[codigos >= 0], minlength=len(categorias)))
+    valores = np.asarray(valores)[ordem[codigos[ordem] >= 0]]
+    for categoria, trecho in zip(categorias, np.split(valores, limites[:-1])):
+        esbocos.setdefault(categoria, criar()).atualizar(trecho)
+    return esbocos
+
+
+def combinar_por_grupo(esbocos, outros):
+    for grupo, esboco in outros.items():
+        if grupo in esbocos:
+            esbocos[grupo].combinar(esboco)
+        else:
+            esbocos[grupo] = esboco
+    return esbocos
+
+
+# Esboços de um bloco já limpo: quantis das vendas de cada plataforma no período e títulos distintos por
+# plataforma e por gênero
+def resumir_bloco(games, ano_inicio=2012, ano_fim=2016, k=200, p=12, coluna='total_sales'):
+    janela = games[(games['year_of_release'] >= ano_inicio) & (games['year_of_release'] <= ano_fim)]
+    return {
+        'quantis_plataforma': atualizar_por_grupo({}, janela['platform'], janela[coluna].to_numpy(dtype='float64'),
+                                                  lambda: EsbocoQuantis(k)),
+        'titulos_plataforma': atualizar_por_grupo({}, janela['platform'], janela['name'], lambda: HyperLogLog(p)),
+        'titulos_genero': atualizar_por_grupo({}, janela['genre'], janela['name'], lambda: HyperLogLog(p)),
+    }
+
+
+def combinar_resumos(resumo, outro):
+    if resumo is None:
+        return outro
+    return {nome: combinar_por_grupo(resumo[nome], outro[nome]) for nome in resumo}
+
+
+# Construindo os esboços lendo o arquivo em blocos: a memória fica limitada ao bloco e ao tamanho dos esboços
+def resumir_em_blocos(caminho, tamanho_bloco=1_000_000, ano_inicio=2012, ano_fim=2016, k=200, p=12):
+    resumo = None
+    for bloco in ler_jogos(caminho, chunksize=tamanho_bloco):
+        bloco = limpar_jogos(bloco)
+        if not bloco.empty:
+            resumo = combinar_resumos(resumo, resumir_bloco(bloco, ano_inicio, ano_fim, k, p))
+    return resumo
+
+
+# ## Tabelas e diagramas de caixa
+
+QUANTIS_RESUMO = {'q25': 0.25, 'mediana': 0.5, 'q75': 0.75, 'q90': 0.9}
+
+
+# Tabela com o número de valores, o mínimo, os quantis de QUANTIS_RESUMO e o máximo de cada grupo
+def tabela_quantis(esbocos):
+    linhas = {}
+    for grupo, esboco in esbocos.items():
+        quantis = esboco.quantis(list(QUANTIS_RESUMO.values()))
+        linhas[grupo] = {'n': esboco.n, 'minimo': esboco.minimo, **dict(zip(QUANTIS_RESUMO, quantis)),
+                         'maximo': esboco.maximo}
+    return pd.DataFrame.from_dict(linhas, orient='index').sort_index()
+
+
+def contagem_distintos(esbocos):
+    return pd.Series({grupo: round(esboco.contagem()) for grupo, esboco in esbocos.items()},
+                     name='titulos_distintos').sort_index()
+
+
+# Estatísticas de um diagrama de caixa para o ax.bxp do matplotlib, como no boxplot do seaborn sem os valores
+# discrepantes: caixa do primeiro ao terceiro quartil, e bigodes até o valor mais extremo a menos de 1.5 vezes
+# a distância interquartil da caixa. Nos esboços exatos (até 'limite_exato' valores) o resultado é o mesmo do
+# matplotlib; nos compactados, os bigodes vêm dos valores guardados e podem ficar um pouco para dentro
+def estatisticas_caixa(esbocos, grupos=None, amplitude=1.5):
+    estatisticas = []
+    for grupo in grupos if grupos is not None else sorted(esbocos):
+        esboco = esbocos[grupo]
+        q1, mediana, q3 = esboco.quantis([0.25, 0.5, 0.75])
+        distancia = q3 - q1
+        bigode_inferior, bigode_superior = esboco.extremos_entre(q1 - amplitude * distancia, q3 + amplitude * distancia)
+        estatisticas.append({
+            'label': str(grupo),
+            'q1': q1,
+            'med': mediana,
+            'q3': q3,
+            'whislo': min(bigode_inferior, q1),
+            'whishi': max(bigode_superior, q3),
+            'fliers': [],
+        })
+    return estatisticas
+
+
+# Desenhando o diagrama de caixa a partir das estatísticas, com a cor padrão do seaborn
+def desenhar_caixas(ax, estatisticas, cor='C0'):
+    caixas = ax.bxp(estatisticas, showfliers=False, patch_artist=True, medianprops={'color': 'black'})
+    for caixa in caixas['boxes']:
+        caixa.set_facecolor(cor)
+    return caixas
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Quantis e títulos distintos por plataforma com esboços.')
+    parser.add_argument('caminho', nargs='?', default='/datasets/games.csv', help='arquivo CSV de vendas')
+    parser.add_argument('--tamanho-bloco', type=int, default=1_000_000, help='número de linhas por bloco')
+    parser.add_argument('--ano-inicio', type=int, default=2012)
+    parser.add_argument('--ano-fim', type=int, default=2016)
+    parser.add_argument('-k', type=int, default=200, help='tamanho do esboço de quantis')
+    parser.add_argument('-p', type=int, default=12, help='precisão do HyperLogLog (2 ** p registradores)')
+    parser.add_argument('--comparar', action='store_true', help='compara com os valores exatos (carrega o arquivo)')
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    resumo = resumir_em_blocos(args.caminho, args.tamanho_bloco, args.ano_inicio, args.ano_fim, args.k, args.p)
+    print(f'Esboços construídos em {time.perf_counter() - inicio:.3f} s')
+
+    quantis = tabela_quantis(resumo['quantis_plataforma'])
+    quantis['titulos_distintos'] = contagem_distintos(resumo['titulos_plataforma'])
+    print(quantis)
+    print(contagem_distintos(resumo['titulos_genero']))
+
+    if args.comparar:
+        games = limpar_jogos(ler_jogos(args.caminho))
+        janela = games[(games['year_of_release'] >= args.ano_inicio) & (games['year_of_release'] <= args.ano_fim)]
+        agrupado = janela.groupby(janela['platform'].astype(str), observed=True)
+        exatos = agrupado['total_sales'].quantile(list(QUANTIS_RESUMO.values())).unstack()
+        exatos.columns = list(QUANTIS_RESUMO)
+        print('Maior diferença para os quantis exatos:')
+        print((quantis[list(QUANTIS_RESUMO)] - exatos).abs().max())
+        erro = quantis['titulos_distintos'] / agrupado['name'].nunique() - 1
+        print(f'Maior erro relativo dos títulos distintos: {erro.abs().max():.2%}')
@@ -5,294 +5,379 @@
 # ## Importação do arquivo de dados e informações gerais
 
 
-import pandas as pd # importando a bibioteca pandas
-import matplotlib.pyplot as plt # importando a biblioteca matplotlib
-import seaborn as sns # importando a biblioteca seaborn
-import scipy.stats as stats # importando a biblioteca SciPy
-import numpy as np # importando a biblioteca Numpy
+import time
+inicio_importacao = time.perf_counter()
 
+# matplotlib e seaborn só são importados quando uma seção os usa (o SciPy, pelos módulos de testes e previsão). Com a
+# variável de ambiente ICE_GRAFICOS=0 (modo só números), as seções de gráficos são puladas e matplotlib e seaborn
+# nunca são importados.
+from importacao import importar_sob_demanda, graficos_ligados, relatorio_importacoes # importação sob demanda
+plt = importar_sob_demanda('matplotlib.pyplot') # biblioteca matplotlib
+sns = importar_sob_demanda('seaborn') # biblioteca seaborn
+GRAFICOS = graficos_ligados()
 
-games = pd.read_csv('/datasets/games.csv') # abrindo o arquivo de dados
 
+from carregamento import carregar_jogos # função de carregamento e limpeza dos dados
+from cubo import construir_cubo, agregar_cubo # cubo de agregados pré-calculados
+from tendencias import matriz_anual, matriz_regioes, crescimento_anual, media_movel, resumir_tendencias # tendências anuais
+from previsao import prever, validar, matriz_series, estatisticas_ciclo_vida # previsão das vendas de 2017
+from simulacao import simular, fronteira_eficiente # simulação de Monte Carlo da divisão da campanha
+from densidade import histogramas, figura_densidade, figura_pequenos_multiplos # dispersão por densidade (grade 2D)
+from esbocos import EsbocoQuantis, HyperLogLog, atualizar_por_grupo, tabela_quantis, contagem_distintos, estatisticas_caixa, desenhar_caixas # esboços de quantis e de títulos distintos
+from titulos import carregar_indice # índice de títulos e agregados entre plataformas
+from testes import testar_pares, testar_dois_grupos # testes de hipóteses em lote para todos os pares
+from correlacoes import correlacoes_por_plataforma, correlacao_mascarada # correlações entre avaliações e vendas por plataforma
+from instrumentacao import Rastreador # medição de tempo, linhas e memória de cada seção
 
-games.info() # acessando as principais informações do dataframe
+tempo_importacao = time.perf_counter() - inicio_importacao
+print(f"Importações iniciais: {tempo_importacao:.3f} s (gráficos {'ligados' if GRAFICOS else 'desligados'})")
 
 
-print(games.sample(10)) #extraindo uma amostra aleatória de 10 linhas do dataframe
+# Instrumentação das seções (desativada por padrão). Com a variável de ambiente ICE_RASTREIO=rastreio.jsonl
+# (ou rastreio.json, no formato de trace do Chrome), cada seção registra o tempo, as linhas de entrada e saída
+# e a variação de memória; com ICE_PERFIL=1, também um perfil do cProfile.
+rastreador = Rastreador.do_ambiente()
 
 
-# Precisam ser transformadas as variáveias 'Year_of_Release', 'User_Score' para int64 e float64, respectivamente. Uma vez que o ano é um dado de valor inteiro e a pontuação do usuário um dado numérico de ponto flutuante. Existem dados faltantes que precisam ser trabalhados. Os nomes das colunas precisam ser passados para letra minúscula, para se evitar erros de nomenclatura ao se chamar os dados.
+with rastreador.secao('preparacao_dados') as secao:
+    # O arquivo é lido com tipos explícitos ('platform', 'genre' e 'rating' como categorias e as vendas em float32)
+    # e a preparação dos dados descrita abaixo é aplicada dentro de 'carregar_jogos'. O resultado fica salvo em
+    # cache (Parquet), identificado pelo hash e pela data de modificação do arquivo, de forma que as próximas
+    # execuções carregam os dados já limpos sem interpretar o CSV novamente.
+    games = carregar_jogos('/datasets/games.csv') # abrindo o arquivo de dados
 
-# ## Preparação dos dados
 
-# Transformando os nomes das colunas em letra minúscula
-games.columns = games.columns.str.lower()
-nomes_colunas = games.columns
-print("Nomes das Colunas:")
-print(nomes_colunas)
+    # ## Preparação dos dados
 
+    # A preparação feita por 'carregar_jogos' consiste em:
+    # 
+    # - Transformar os nomes das colunas em letra minúscula, para se evitar erros de nomenclatura ao se chamar os dados.
+    # - Remover as linhas sem 'year_of_release': como a coluna será importante para a analise das vendas da empresa e são poucos os dados sem o ano de lançamento, optei por remover estas linhas.
+    # - Substituir os valores nulos para as variáveis do tipo string por 'None'.
+    # - Manter os dados de pontuação ('critic_score' e 'user_score') faltantes como nulos, uma vez que são jogos que aparentemente não tiveram vendas expressivas, e por isso mesmo não foram avaliados. O valor não numerico 'tbd' de 'user_score' (que provavelmente se refere a críticas ainda não inseridas) também é tratado como nulo. As pontuações ficam como float nulável (Float32), de forma que médias, variâncias e correlações ignoram os jogos não avaliados.
+    # - Criar a coluna booleana 'is_rated', que indica os jogos com as duas avaliações (usuário e crítica), para identificar os jogos não avaliados, que podem ser importantes de serem analisados para se compreender o motivo das vendas baixas.
+    # - Converter 'year_of_release' para int64.
+    # - Criar uma nova coluna chamada 'total_sales', que é o total de vendas para cada jogo.
 
+    games.info() # acessando as principais informações do dataframe
 
-# Encontrando os valores nulos
-print(games.isnull().sum()/len(games))
 
+    print(games.sample(10)) #extraindo uma amostra aleatória de 10 linhas do dataframe
 
-# como a coluna 'year_of_release' será importante para a analise das vendas da empresa e são poucos os dados sem o ano de lançamento, optei por remover estas linhas.
 
-games=games.dropna(subset=['year_of_release'])
+    # Verificando os valores nulos restantes (apenas nas pontuações dos jogos não avaliados)
+    print(games.isnull().sum())
 
+    secao.saida(games)
 
-# Os valores nulos para as variáveis do tipo string, substituí por None. 
-# 
-# Para os dados de pontuação ('critic_score' e 'user_score'), substituí pelo valor 999, uma vez que são jogos que aparentemente não tiveram vendas expressivas, e por isso mesmo não foram avaliados, mas que podem ser importantes de serem analisados para se compreender o motivo das vendas baixas.
 
-games['name'].fillna('None', inplace=True)
-games['genre'].fillna('None', inplace=True)
-games['user_score'].fillna('999', inplace=True) 
-games['critic_score'].fillna(999, inplace=True)
-games['rating'].fillna('None', inplace=True)
-print(games.isnull().sum())
+# ### Conclusão
+# Nesta fase de informação e preparação dos dados perdebeu-se que alguns jogos não tinham informação sobre o ano de lançamento, foram excluídas do banco de dados. Boa parte dos valores nulos restantes se encontravam em dados relacionados às pontuações dadas pelos usuários e pela crítica, justamente naquelas observações onde as vendas haviam sido mínimas ou nulas. Nestes casos, optei por manter as pontuações como nulas e marcar os jogos avaliados na coluna 'is_rated', para identificar quais eram os jogos que tinhas baixas vendas, para caso fosse necessário para análise futura, sem que um valor artificial (como 999) distorcesse as médias e os testes. 
 
+# ## Análise dos dados
 
-# Convertendo a coluna 'year_of_release' para int64
-games['year_of_release'] = games['year_of_release'].astype('int64') 
+with rastreador.secao('cubo', entrada=games) as secao:
+    # Construindo, em uma única passada pelos dados, o cubo de agregados por (ano, plataforma, gênero, classificação)
+    # com a contagem, a soma e a soma dos quadrados de cada coluna de vendas. Os agrupamentos a seguir são obtidos a partir dele.
+    cubo = construir_cubo(games)
+    secao.saida(cubo)
 
+# ### Lançamentos por ano
 
-# Verificando quais os valores únicos na coluna 'user_score'
+with rastreador.secao('lancamentos_por_ano', entrada=cubo) as secao:
+    # Calculando a contagem de jogos por ano
+    contagem_por_ano = agregar_cubo(cubo, 'year_of_release', estatistica='contagem')
 
-print(games['user_score'].unique())
+    # Plotando o gráfico de barras
+    if GRAFICOS:
+        plt.figure(figsize=(10, 6))
+        contagem_por_ano.sort_index().plot(kind='bar', color='skyblue')
+        plt.title('Número de Jogos Lançados por Ano')
+        plt.xlabel('Ano de Lançamento')
+        plt.ylabel('Número de Jogos')
+        plt.show()
 
 
-# Como existe um valor não numerico 'tbd'(que provavelmente se refere a críticas ainda não inseridas), vou transformá-lo em 999, antes de proceder à conversão dos dados para numéricos.
+    # Pelo gráfico exposto, percebe-se que a partir dos anos 2000 houve um aumento expressivo no lançamento de jogos no mercado. Até o ano de 1994 menos de duzentos jogos eram lançados, entre 1994 e 2000 eram lançados cerca de 400 jogos por ano. Até 2005, esse número saltou para 800, até chegar no máximo em 2008 e 2009 com cerca de 1400 jogos lançados por ano. Após esse período reduziu, chegando a 600 jogos por ano, entre 2012 e 2016.
 
+    secao.saida(contagem_por_ano)
 
-games['user_score'] = games['user_score'].replace('tbd', '999')
-print(games['user_score'].unique())
+# ### Variação de vendas entre as plataformas
 
+with rastreador.secao('variacao_plataformas', entrada=cubo) as secao:
+    # Nesta seção será visto como as vendas variaram de plataforma para plataforma. Para as plataformas com as maiores vendas totais será construída uma distribuição com base em dados para cada ano. 
+    # 
+    # Depois, serão exibidas as plataformas que costumavam ser populares, mas agora não têm vendas.
 
-# Convertendo a coluna 'user_score' para float64
-games['user_score'] = games['user_score'].astype('float64')
 
+    # Agrupando por plataforma e calculando as vendas totais
+    vendas_por_plataforma = agregar_cubo(cubo, 'platform')
 
-# Como passo final na preparação dos dados, criei uma nova coluna chamada 'total_sales', que é o total de vendas para cada jogo.
-games['total_sales'] = games[['na_sales', 'eu_sales', 'jp_sales', 'other_sales']].sum(axis=1)
-games.info()
+    # Ordenando as plataformas pelas vendas totais em ordem decrescente
+    plataformas_populares = vendas_por_plataforma.sort_values(ascending=False)
 
+    # Selecionando as top 5 plataformas com maiores vendas totais
+    top_plataformas = plataformas_populares.head(5)
+    print(top_plataformas)
 
-# ### Conclusão
-# Nesta fase de informação e preparação dos dados perdebeu-se que alguns jogos não tinham informação sobre o ano de lançamento, foram excluídas do banco de dados. Boa parte dos valores nulos restantes se encontravam em dados relacionados às pontuações dadas pelos usuários e pela crítica, justamente naquelas observações onde as vendas haviam sido mínimas ou nulas. Nestes casos, optei por preencher com 999 para identificar quais eram os jogos que tinhas baixas vendas, para caso fosse necessário para análise futura. 
 
-# ## Análise dos dados
+    # Construindo uma distribuição com base nos dados para cada ano (considerando apenas as top 5 plataformas)
+    # Agrupando por ano e calculando as vendas totais
+    vendas_por_ano_top_plataformas = agregar_cubo(cubo, 'year_of_release', platform=top_plataformas.index)
 
-# ### Lançamentos por ano
+    # Plotando um gráfico de barras para a distribuição das vendas por ano
+    if GRAFICOS:
+        vendas_por_ano_top_plataformas.plot(kind='bar', figsize=(10, 6), title='Vendas Totais por Ano (Top 5 Plataformas)')
+        plt.xlabel('Ano de Lançamento')
+        plt.ylabel('Vendas Totais (milhões)')
+        plt.show()
 
-# Calculando a contagem de jogos por ano
-contagem_por_ano = games['year_of_release'].value_counts()
+    # Limite para vendas totais consideradas "muito baixas"
+    limite_vendas_baixas = 1.0  # Ajuste conforme necessário
 
-# Plotando o gráfico de barras
-plt.figure(figsize=(10, 6))
-contagem_por_ano.sort_index().plot(kind='bar', color='skyblue')
-plt.title('Número de Jogos Lançados por Ano')
-plt.xlabel('Ano de Lançamento')
-plt.ylabel('Número de Jogos')
-plt.show()
+    # Calculando as vendas totais por plataforma considerando apenas os lançamentos antes de 1995
+    vendas_por_plataforma_antes_1995 = agregar_cubo(cubo, 'platform', anos=(None, 1994))
 
+    # Identificando plataformas com vendas totais inferiores ao limite considerado "muito baixas"
+    plataformas_baixas_vendas_antes_1995 = vendas_por_plataforma_antes_1995[vendas_por_plataforma_antes_1995 < limite_vendas_baixas].index
 
-# Pelo gráfico exposto, percebe-se que a partir dos anos 2000 houve um aumento expressivo no lançamento de jogos no mercado. Até o ano de 1994 menos de duzentos jogos eram lançados, entre 1994 e 2000 eram lançados cerca de 400 jogos por ano. Até 2005, esse número saltou para 800, até chegar no máximo em 2008 e 2009 com cerca de 1400 jogos lançados por ano. Após esse período reduziu, chegando a 600 jogos por ano, entre 2012 e 2016.
+    print(f"Plataformas com lançamentos antes de 1995 e vendas muito baixas: {plataformas_baixas_vendas_antes_1995}")
 
-# ### Variação de vendas entre as plataformas
 
-# Nesta seção será visto como as vendas variaram de plataforma para plataforma. Para as plataformas com as maiores vendas totais será construída uma distribuição com base em dados para cada ano. 
-# 
-# Depois, serão exibidas as plataformas que costumavam ser populares, mas agora não têm vendas.
+    # Identificando os anos de lançamento da primeira e última ocorrência de cada plataforma
+    anos_primeira_aparicao = cubo.groupby('platform', observed=True)['year_of_release'].min()
+    anos_ultima_aparicao = cubo.groupby('platform', observed=True)['year_of_release'].max()
 
+    # Calculando a diferença de anos entre a última e primeira aparição de cada plataforma
+    tempo_vida_plataformas = anos_ultima_aparicao - anos_primeira_aparicao
 
-# Agrupando por plataforma e calculando as vendas totais
-vendas_por_plataforma = games.groupby('platform')['total_sales'].sum()
+    # Exibindo a média e a mediana do tempo de vida das plataformas
+    print(f"Média do tempo de vida das plataformas: {tempo_vida_plataformas.mean():.2f} anos")
+    print(f"Mediana do tempo de vida das plataformas: {tempo_vida_plataformas.median()} anos")
 
-# Ordenando as plataformas pelas vendas totais em ordem decrescente
-plataformas_populares = vendas_por_plataforma.sort_values(ascending=False)
 
-# Selecionando as top 5 plataformas com maiores vendas totais
-top_plataformas = plataformas_populares.head(5)
-print(top_plataformas)
+    # Diante do tempo médio de vida de 7 anos e de mediana de 6 anos para cada plataforma e como houve uma queda expressiva no lançamento de novos jogos a partir de 2011, serão considerados apenas os dados do período de 2012 a 2016, para as previsões para 2017.
 
+    # Período considerado para as previsões
+    janela = (2012, 2016)
 
-# Construindo uma distribuição com base nos dados para cada ano (considerando apenas as top 5 plataformas)
-games_top_plataformas = games[games['platform'].isin(top_plataformas.index)]
+    # Filtrando o DataFrame para incluir apenas dados do período de 2012 a 2016
+    games_novo = games.query('2012 <= year_of_release <= 2016')
 
-# Agrupando por ano e calculando as vendas totais
-vendas_por_ano_top_plataformas = games_top_plataformas.groupby('year_of_release')['total_sales'].sum()
+    # Removendo as categorias (plataformas, gêneros e classificações) que não aparecem no período
+    for coluna in ['platform', 'genre', 'rating']:
+        games_novo[coluna] = games_novo[coluna].cat.remove_unused_categories()
 
-# Plotando um gráfico de barras para a distribuição das vendas por ano
-vendas_por_ano_top_plataformas.plot(kind='bar', figsize=(10, 6), title='Vendas Totais por Ano (Top 5 Plataformas)')
-plt.xlabel('Ano de Lançamento')
-plt.ylabel('Vendas Totais (milhões)')
-plt.show()
+    # Calculando as vendas totais por plataforma em 2016 no DataFrame 'games_novo'
+    vendas_por_plataforma_2016 = agregar_cubo(cubo, 'platform', anos=janela)
 
-# Limite para vendas totais consideradas "muito baixas"
-limite_vendas_baixas = 1.0  # Ajuste conforme necessário
+    # Ordenando as plataformas pelas vendas totais em 2016 em ordem decrescente
+    plataformas_lideres_2016 = vendas_por_plataforma_2016.sort_values(ascending=False)
 
-# Filtrando o DataFrame para incluir apenas dados de plataformas com lançamentos antes de 1995
-plataformas_antes_1995 = games[games['year_of_release'] < 1995]
+    print(f"Plataformas líderes em vendas em 2016: {plataformas_lideres_2016}")
 
-# Calculando as vendas totais por plataforma para essas plataformas
-vendas_por_plataforma_antes_1995 = plataformas_antes_1995.groupby('platform')['total_sales'].sum()
+    # Matriz plataforma x ano com as vendas de cada plataforma em cada ano do período
+    vendas_plataforma_ano = matriz_anual(cubo, 'platform', anos=janela)
+    print(vendas_plataforma_ano)
 
-# Identificando plataformas com vendas totais inferiores ao limite considerado "muito baixas"
-plataformas_baixas_vendas_antes_1995 = vendas_por_plataforma_antes_1995[vendas_por_plataforma_antes_1995 < limite_vendas_baixas].index
+    # Variação de cada plataforma em relação ao seu próprio ano anterior e média móvel de 3 anos
+    print(crescimento_anual(vendas_plataforma_ano))
+    print(media_movel(vendas_plataforma_ano, janela=3))
 
-print(f"Plataformas com lançamentos antes de 1995 e vendas muito baixas: {plataformas_baixas_vendas_antes_1995}")
+    # Taxa de crescimento anual composta (CAGR) de cada plataforma e classificação em crescendo, diminuindo ou
+    # estável (considerando um limiar de 10% ao ano)
+    tendencias_plataformas = resumir_tendencias(vendas_plataforma_ano, limiar=0.1)
+    print(tendencias_plataformas)
 
+    plataformas_crescendo = tendencias_plataformas.index[tendencias_plataformas['tendencia'] == 'crescendo']
+    plataformas_diminuindo = tendencias_plataformas.index[tendencias_plataformas['tendencia'] == 'diminuindo']
 
-# Identificando os anos de lançamento da primeira e última ocorrência de cada plataforma
-anos_primeira_aparicao = games.groupby('platform')['year_of_release'].min()
-anos_ultima_aparicao = games.groupby('platform')['year_of_release'].max()
+    print(f"Plataformas crescendo: {list(plataformas_crescendo)}")
+    print(f"Plataformas diminuindo: {list(plataformas_diminuindo)}")
 
-# Calculando a diferença de anos entre a última e primeira aparição de cada plataforma
-tempo_vida_plataformas = anos_ultima_aparicao - anos_primeira_aparicao
+    # As mesmas medidas para os gêneros e para as regiões
+    print(resumir_tendencias(matriz_anual(cubo, 'genre', anos=janela), limiar=0.1))
+    print(resumir_tendencias(matriz_regioes(cubo, anos=janela), limiar=0.1))
 
-# Exibindo a média e a mediana do tempo de vida das plataformas
-print(f"Média do tempo de vida das plataformas: {tempo_vida_plataformas.mean():.2f} anos")
-print(f"Mediana do tempo de vida das plataformas: {tempo_vida_plataformas.median()} anos")
+    # Filtrando plataformas que têm vendas totais em 2016 e que estão crescendo
+    plataformas_potencialmente_lucrativas = set(plataformas_lideres_2016.index.astype(str)) & set(plataformas_crescendo)
 
+    print(f"Plataformas potencialmente lucrativas: {plataformas_potencialmente_lucrativas}")
 
-# Diante do tempo médio de vida de 7 anos e de mediana de 6 anos para cada plataforma e como houve uma queda expressiva no lançamento de novos jogos a partir de 2011, serão considerados apenas os dados do período de 2012 a 2016, para as previsões para 2017.
+    # Os quantis das vendas de cada plataforma vêm de esboços KLL, construídos em uma passada pelos dados e de
+    # tamanho limitado, e os títulos distintos de cada plataforma, de esboços HyperLogLog. O diagrama de caixa é
+    # desenhado a partir desses quantis, sem ordenar todas as vendas de cada plataforma.
+    plataformas_janela = list(games_novo['platform'].cat.remove_unused_categories().cat.categories)
+    esbocos_vendas = atualizar_por_grupo({}, games_novo['platform'], games_novo['total_sales'], lambda: EsbocoQuantis(semente=42))
+    esbocos_titulos = atualizar_por_grupo({}, games_novo['platform'], games_novo['name'], HyperLogLog)
+    resumo_plataformas = tabela_quantis(esbocos_vendas)
+    resumo_plataformas['titulos_distintos'] = contagem_distintos(esbocos_titulos)
+    print(resumo_plataformas)
 
-# Filtrando o DataFrame para incluir apenas dados do período de 2012 a 2016
-games_novo = games.query('2012 <= year_of_release <= 2016')
+    # Os títulos lançados em várias plataformas aparecem em uma linha por plataforma. O índice de títulos (construído
+    # uma vez e guardado junto ao cache dos dados) já tem as vendas somadas entre as plataformas, o número de
+    # plataformas e o primeiro ano de cada título e de cada franquia.
+    indice_titulos = carregar_indice('/datasets/games.csv', games=games)
+    colunas_ranking = ['nome', 'franquia', 'plataformas', 'primeiro_ano', 'total_sales']
+    print(indice_titulos.ranking(10, minimo_plataformas=2)[colunas_ranking])
+    print(indice_titulos.ranking_franquias(10, minimo_titulos=2)[['titulos', 'plataformas', 'primeiro_ano', 'ultimo_ano', 'total_sales']])
 
-# Calculando as vendas totais por plataforma em 2016 no DataFrame 'games_novo'
-vendas_por_plataforma_2016 = games_novo.groupby('platform')['total_sales'].sum()
+    if GRAFICOS:
+        fig, ax = plt.subplots(figsize=(15, 8))
+        desenhar_caixas(ax, estatisticas_caixa(esbocos_vendas, plataformas_janela))
+        plt.title('Diagrama de Caixa das Vendas Globais por Plataforma')
+        plt.xlabel('Plataforma')
+        plt.ylabel('Vendas Globais (milhões)')
+        plt.show()
 
-# Ordenando as plataformas pelas vendas totais em 2016 em ordem decrescente
-plataformas_lideres_2016 = vendas_por_plataforma_2016.sort_values(ascending=False)
 
-print(f"Plataformas líderes em vendas em 2016: {plataformas_lideres_2016}")
+    # Comparando cada plataforma com o seu próprio ano anterior, apenas PS4 e XOne, lançadas em 2013, estão crescendo no período (CAGR de 39% e 11% ao ano), e são as plataformas potencialmente lucrativas. Todas as demais, incluindo PS3 e X360, que lideram as vendas somadas de 2012 a 2016, estão em queda, assim como os gêneros e as regiões como um todo (2016 tem menos vendas registradas que os anos anteriores).
+    # Chama a atenção a X360, por ter a maior variabilidade nas vendas, mas também apresentar a maior mediana.
 
-# Calcular as vendas médias por plataforma no DataFrame 'games_novo'
-vendas_medias_por_plataforma = games_novo.groupby('platform')['total_sales'].mean()
+    secao.saida(plataformas_lideres_2016)
 
-# Calcular a variação percentual nas vendas médias por plataforma em relação ao ano anterior
-variacao_percentual_media = vendas_medias_por_plataforma.pct_change()
+# ### Previsão para 2017
 
-# Identificar plataformas que estão crescendo ou diminuindo em média (considerando um limiar de 10% de variação)
-plataformas_crescendo_media = variacao_percentual_media[variacao_percentual_media > 0.1].index
-plataformas_diminuindo_media = variacao_percentual_media[variacao_percentual_media < -0.1].index
+with rastreador.secao('previsao', entrada=cubo) as secao:
+    # As vendas de 2017 são previstas para cada plataforma, gênero e região com três modelos simples ajustados a todas as séries de 2012 a 2016 de uma vez: tendência linear, suavização exponencial de Holt e ciclo de vida (decaimento das vendas, limitado pelo tempo de vida das plataformas calculado acima). Os modelos são ajustados ao logaritmo das vendas, e cada previsão tem um intervalo de previsão de 90% do próprio modelo (sem intervalo nas séries com menos de 4 anos de vendas). Os modelos são avaliados prevendo 2015 e 2016 a partir dos anos anteriores, e a cobertura mostra a fração das vendas observadas que ficou dentro dos intervalos.
 
-print(f"Plataformas crescendo em média: {plataformas_crescendo_media}")
-print(f"Plataformas diminuindo em média: {plataformas_diminuindo_media}")
+    # Tempo de vida típico e máximo das plataformas e ano de lançamento de cada uma
+    ciclo = estatisticas_ciclo_vida(cubo)
 
-# Filtrando plataformas que têm vendas totais em 2016 e que estão crescendo
-plataformas_potencialmente_lucrativas = set(plataformas_lideres_2016.index) & set(plataformas_crescendo_media)
+    # Previsões para as plataformas
+    previsoes_plataformas = prever(vendas_plataforma_ano, ciclo=ciclo)
+    print(previsoes_plataformas.sort_values('linear', ascending=False))
 
-print(f"Plataformas potencialmente lucrativas: {plataformas_potencialmente_lucrativas}")
+    # Previsões para os gêneros e para as regiões
+    print(prever(matriz_anual(cubo, 'genre', anos=janela)).sort_values('linear', ascending=False))
+    print(prever(matriz_regioes(cubo, anos=janela)))
 
-plt.figure(figsize=(15, 8))
-sns.boxplot(x='platform', y='total_sales', data=games_novo, showfliers=False)
-plt.title('Diagrama de Caixa das Vendas Globais por Plataforma')
-plt.xlabel('Plataforma')
-plt.ylabel('Vendas Globais (milhões)')
-plt.show()
+    # Todas as combinações de região, plataforma e gênero de uma vez
+    series_regiao_plataforma_genero = matriz_series(cubo, ('platform', 'genre'), anos=janela)
+    previsoes_combinacoes = prever(series_regiao_plataforma_genero, ciclo=ciclo)
+    print(previsoes_combinacoes.loc['total_sales'].sort_values('linear', ascending=False).head(10))
 
+    # Erro de cada modelo ao prever 2015 e 2016 a partir dos anos anteriores
+    validacao_plataformas = validar(vendas_plataforma_ano, anos_teste=2, ciclo=ciclo)
+    print(validacao_plataformas)
+    print(validar(series_regiao_plataforma_genero, anos_teste=2, ciclo=ciclo))
 
-# Pode-se perceber que as três plataformas líderes de vendas em 2016 (PS4, PS3 e X360) estão entre as que potencialmente podem alferir lucros. Aparece também uma de menor expressividade que é a PSV.
-# Chama a atenção a X360, por ter a maior variabilidade nas vendas, mas também apresentar a maior mediana.
-# As plataformas PS4 e XOne apresentam vendas parecidas, entretanto, a PS4 se mostrou promissora enquanto que a XOne aparentou ter decrescimento. 
+
+    # A tendência linear teve o menor erro ao prever 2015 e 2016, e as previsões dos três modelos apontam PS4 e XOne como as plataformas com mais vendas em 2017, com PS3, X360 e Wii praticamente sem vendas. Entre os gêneros, Shooter, Sports, Action e Role-Playing seguem na frente. Os intervalos são muito largos, principalmente para PS4 e XOne, que têm apenas quatro anos de vendas e queda em 2016 (os dados de 2016 estão incompletos), então as previsões devem ser usadas para ordenar as plataformas e gêneros, e não como valores exatos.
+
+    secao.saida(previsoes_combinacoes)
 
 # ### Relação entre avaliações e vendas
 
-# Filtrar o DataFrame para incluir apenas os dados da plataforma PS4
-ps4_data = games_novo[games_novo['platform'] == 'PS4']
+with rastreador.secao('correlacao_avaliacoes', entrada=games_novo) as secao:
+    # Os jogos sem avaliação têm as pontuações nulas, e a coluna 'is_rated' indica os que têm as duas avaliações.
+    # Em vez de criar cópias filtradas do DataFrame, as correlações são calculadas com máscaras sobre 'games_novo'.
 
+    # Máscara dos jogos avaliados da plataforma PS4
+    mascara_ps4 = (games_novo['platform'] == 'PS4') & games_novo['is_rated']
 
-# Filtrar as linhas onde 'user_score' e 'critic_score' não são 999
-filtered_games = ps4_data[(ps4_data['user_score'] != 999) & (ps4_data['critic_score'] != 999)]
+    # Os gráficos de dispersão são desenhados por densidade: os jogos são contados em uma grade de avaliação x vendas
+    # (com as vendas em escala logarítmica) e cada célula é colorida pelo número de jogos, de forma que o tempo de
+    # desenho depende do tamanho da grade, e não do número de jogos.
 
-# Criar gráfico de dispersão para avaliação de usuário vs. vendas totais
-plt.figure(figsize=(10, 6))
-plt.scatter(filtered_games['user_score'], filtered_games['total_sales'], color='blue', alpha=0.5)
-plt.title('Avaliação de Usuário vs. Vendas Totais')
-plt.xlabel('Avaliação de Usuário')
-plt.ylabel('Vendas Totais (milhões)')
-plt.show()
+    # Criar gráfico de dispersão para avaliação de usuário vs. vendas totais
+    if GRAFICOS:
+        contagens, _, bordas_x, bordas_y = histogramas(games_novo['user_score'][mascara_ps4], games_novo['total_sales'][mascara_ps4], log_y=True)
+        figura_densidade(contagens[0], bordas_x, bordas_y, 'Avaliação de Usuário vs. Vendas Totais', 'Avaliação de Usuário', log_y=True, cmap='Blues')
+        plt.show()
 
-# Calcular correlação entre avaliação de usuário e vendas totais
-correlation_user_sales = np.corrcoef(filtered_games['user_score'], filtered_games['total_sales'])[0, 1]
-print(f"Correlação entre avaliação de usuário e vendas totais: {correlation_user_sales}")
+    # Calcular correlação entre avaliação de usuário e vendas totais
+    correlation_user_sales = correlacao_mascarada(games_novo['user_score'], games_novo['total_sales'], mascara_ps4)
+    print(f"Correlação entre avaliação de usuário e vendas totais: {correlation_user_sales}")
 
-# Criar gráfico de dispersão para avaliação de crítico vs. vendas totais
-plt.figure(figsize=(10, 6))
-plt.scatter(filtered_games['critic_score'], filtered_games['total_sales'], color='red', alpha=0.5)
-plt.title('Avaliação de Crítico vs. Vendas Totais')
-plt.xlabel('Avaliação de Crítico')
-plt.ylabel('Vendas Totais (milhões)')
-plt.show()
+    # Criar gráfico de dispersão para avaliação de crítico vs. vendas totais
+    if GRAFICOS:
+        contagens, _, bordas_x, bordas_y = histogramas(games_novo['critic_score'][mascara_ps4], games_novo['total_sales'][mascara_ps4], log_y=True)
+        figura_densidade(contagens[0], bordas_x, bordas_y, 'Avaliação de Crítico vs. Vendas Totais', 'Avaliação de Crítico', log_y=True, cmap='Reds')
+        plt.show()
 
-# Calcular correlação entre avaliação de crítico e vendas totais
-correlation_critic_sales = np.corrcoef(filtered_games['critic_score'], filtered_games['total_sales'])[0, 1]
-print(f"Correlação entre avaliação de crítico e vendas totais: {correlation_critic_sales}")
+    # Calcular correlação entre avaliação de crítico e vendas totais
+    correlation_critic_sales = correlacao_mascarada(games_novo['critic_score'], games_novo['total_sales'], mascara_ps4)
+    print(f"Correlação entre avaliação de crítico e vendas totais: {correlation_critic_sales}")
 
 
-# Aparentemente, os usurário do PS4 não analisam as críticas dos usuários para suas decisões de compra, mas analisam as críticas profissionais (apesar da correlação entre estas duas variáveis ter sido relativamente baixa, se mostrou positiva.
-# 
-# Analisando abaixo para a plataforma Xbox One pode-se ver que esse padrão se repete.
+    # Aparentemente, os usurário do PS4 não analisam as críticas dos usuários para suas decisões de compra, mas analisam as críticas profissionais (apesar da correlação entre estas duas variáveis ter sido relativamente baixa, se mostrou positiva.
+    # 
+    # Analisando abaixo para a plataforma Xbox One pode-se ver que esse padrão se repete.
+
+
+    # Máscara dos jogos avaliados da plataforma Xbox One
+    mascara_xbox_one = (games['platform'] == 'XOne') & games['is_rated']
 
+    # Adicionar gráfico de dispersão para avaliação de usuário vs. vendas totais na plataforma Xbox One
+    if GRAFICOS:
+        contagens, _, bordas_x, bordas_y = histogramas(games['user_score'][mascara_xbox_one], games['total_sales'][mascara_xbox_one], log_y=True)
+        figura_densidade(contagens[0], bordas_x, bordas_y, 'Avaliação de Usuário vs. Vendas Totais (Xbox One)', 'Avaliação de Usuário', log_y=True, cmap='Reds')
+        plt.show()
 
-# Filtrar as linhas onde 'user_score' e 'critic_score' não são 999 para a plataforma Xbox One
-xbox_one_games = games[(games['platform'] == 'XOne') & (games['user_score'] != 999) & (games['critic_score'] != 999)]
+    # Calcular correlação entre avaliação de usuário e vendas totais na plataforma Xbox One
+    correlation_user_sales_xbox_one = correlacao_mascarada(games['user_score'], games['total_sales'], mascara_xbox_one)
+    print(f"Correlação entre avaliação de usuário e vendas totais (Xbox One): {correlation_user_sales_xbox_one}")
 
-# Adicionar gráfico de dispersão para avaliação de usuário vs. vendas totais na plataforma Xbox One
-plt.scatter(xbox_one_games['user_score'], xbox_one_games['total_sales'], color='red', alpha=0.5, label='Xbox One')
 
-# Calcular correlação entre avaliação de usuário e vendas totais na plataforma Xbox One
-correlation_user_sales_xbox_one = np.corrcoef(xbox_one_games['user_score'], xbox_one_games['total_sales'])[0, 1]
-print(f"Correlação entre avaliação de usuário e vendas totais (Xbox One): {correlation_user_sales_xbox_one}")
+    # Adicionar gráfico de dispersão para avaliação de profissional vs. vendas totais na plataforma Xbox One
+    if GRAFICOS:
+        contagens, _, bordas_x, bordas_y = histogramas(games['critic_score'][mascara_xbox_one], games['total_sales'][mascara_xbox_one], log_y=True)
+        figura_densidade(contagens[0], bordas_x, bordas_y, 'Avaliação de Crítico vs. Vendas Totais (Xbox One)', 'Avaliação de Crítico', log_y=True, cmap='Reds')
+        plt.show()
 
-# Adicionar legenda
-plt.legend()
-plt.show()
+    # Calcular correlação entre avaliação de usuário e vendas totais na plataforma Xbox One
+    correlation_user_sales_xbox_one = correlacao_mascarada(games['critic_score'], games['total_sales'], mascara_xbox_one)
+    print(f"Correlação entre avaliação de profissionais e vendas totais (Xbox One): {correlation_user_sales_xbox_one}")
 
 
-# Adicionar gráfico de dispersão para avaliação de profissional vs. vendas totais na plataforma Xbox One
-plt.scatter(xbox_one_games['critic_score'], xbox_one_games['total_sales'], color='red', alpha=0.5, label='Xbox One')
+    # Calculando, para todas as plataformas de uma só vez, as correlações de Pearson e de Spearman entre as avaliações e as vendas
+    # (total e por região), com intervalos de confiança de 95% obtidos por bootstrap com 10 mil reamostragens (os
+    # grupos com menos de 10 jogos avaliados, como DS, PSP e Wii, ficam sem intervalo)
+    correlacoes_plataformas = correlacoes_por_plataforma(games_novo, n_bootstrap=10_000, semente=42)
+    print(correlacoes_plataformas[correlacoes_plataformas['vendas'] == 'total_sales'].sort_values(['avaliacao', 'n'], ascending=False))
 
-# Calcular correlação entre avaliação de usuário e vendas totais na plataforma Xbox One
-correlation_user_sales_xbox_one = np.corrcoef(xbox_one_games['critic_score'], xbox_one_games['total_sales'])[0, 1]
-print(f"Correlação entre avaliação de profissionais e vendas totais (Xbox One): {correlation_user_sales_xbox_one}")
+    # Avaliações x vendas de todas as plataformas em pequenos múltiplos (mesmos eixos e mesma escala de cores)
+    if GRAFICOS:
+        avaliados = games_novo[games_novo['is_rated'].to_numpy()]
+        for coluna, rotulo in [('user_score', 'Avaliação de Usuário'), ('critic_score', 'Avaliação de Crítico')]:
+            contagens, plataformas, bordas_x, bordas_y = histogramas(avaliados[coluna], avaliados['total_sales'], avaliados['platform'], log_y=True)
+            figura_pequenos_multiplos(contagens, plataformas, bordas_x, bordas_y, f'{rotulo} vs. Vendas Totais por Plataforma', rotulo, log_y=True)
+            plt.show()
 
-# Adicionar legenda
-plt.legend()
-plt.show()
 
+    secao.saida(correlacoes_plataformas)
 
 # ### Relação entre gênero e vendas
 
+with rastreador.secao('genero', entrada=cubo) as secao:
+    # Calcular as vendas totais por gênero
+    vendas_por_genero = agregar_cubo(cubo, 'genre', anos=janela).sort_values(ascending=False)
 
-# Calcular as vendas totais por gênero
-vendas_por_genero = games_novo.groupby('genre')['total_sales'].sum().sort_values(ascending=False)
+    # Calcular a participação percentual de cada gênero nas vendas totais
+    participacao_percentual = (vendas_por_genero / vendas_por_genero.sum()) * 100
 
-# Calcular a participação percentual de cada gênero nas vendas totais
-participacao_percentual = (vendas_por_genero / vendas_por_genero.sum()) * 100
+    # Plotar um gráfico de barras para as vendas totais por gênero
+    if GRAFICOS:
+        plt.figure(figsize=(12, 6))
+        sns.barplot(x=vendas_por_genero.index, order=vendas_por_genero.index, y=vendas_por_genero.values, palette="viridis")
+        plt.title('Vendas Totais por Gênero')
+        plt.xlabel('Gênero')
+        plt.ylabel('Vendas Globais (milhões)')
+        plt.xticks(rotation=45, ha='right')  # Rotacionar os rótulos para melhor legibilidade
 
-# Plotar um gráfico de barras para as vendas totais por gênero
-plt.figure(figsize=(12, 6))
-sns.barplot(x=vendas_por_genero.index, y=vendas_por_genero.values, palette="viridis")
-plt.title('Vendas Totais por Gênero')
-plt.xlabel('Gênero')
-plt.ylabel('Vendas Globais (milhões)')
-plt.xticks(rotation=45, ha='right')  # Rotacionar os rótulos para melhor legibilidade
+        # Adicionar um segundo eixo y para a participação percentual
+        ax2 = plt.gca().twinx()
+        ax2.set_ylabel('Participação Percentual (%)', color='red')
+        ax2.plot(vendas_por_genero.index, participacao_percentual, color='red', marker='o', linestyle='dashed')
 
-# Adicionar um segundo eixo y para a participação percentual
-ax2 = plt.gca().twinx()
-ax2.set_ylabel('Participação Percentual (%)', color='red')
-ax2.plot(vendas_por_genero.index, participacao_percentual, color='red', marker='o', linestyle='dashed')
+        # Exibir o gráfico
+        plt.show()
 
-# Exibir o gráfico
-plt.show()
 
+    #  O gênero que os usuários mais gostam é Action (50% das vendas). Se somarmos os 4 principais gêneros Action, Shooter, Role-Playing e Sports chegamos a cerca de 80% das vendas.
 
-#  O gênero que os usuários mais gostam é Action (50% das vendas). Se somarmos os 4 principais gêneros Action, Shooter, Role-Playing e Sports chegamos a cerca de 80% das vendas.
+    secao.saida(vendas_por_genero)
 
 # ### Conclusões
 
@@ -304,227 +389,272 @@ plt.show()
 
 # ### América do Norte
 
-# Filtrar os dados para a Região da América do Norte (NA)
-na_data = games_novo[['platform', 'na_sales']].groupby('platform').sum().sort_values(by='na_sales', ascending=False).head(5)
+with rastreador.secao('perfil_america_do_norte', entrada=cubo) as secao:
+    # Calcular as vendas totais por plataforma na Região da América do Norte (NA)
+    na_data = agregar_cubo(cubo, 'platform', coluna='na_sales', anos=janela).sort_values(ascending=False).head(5)
+
+    # Plotar um gráfico de barras para as vendas totais por plataforma na América do Norte
+    if GRAFICOS:
+        plt.figure(figsize=(10, 6))
+        sns.barplot(x=na_data.index, order=na_data.index, y=na_data.values, palette="Blues")
+        plt.title('Vendas Totais por Plataforma na América do Norte')
+        plt.xlabel('Plataforma')
+        plt.ylabel('Vendas Totais (milhões)')
+        plt.show()
+
+    # Calcular as vendas totais por gênero na América do Norte
+    vendas_por_genero_na = agregar_cubo(cubo, 'genre', coluna='na_sales', anos=janela).sort_values(ascending=False)
+
+    # Exibir os cinco principais gêneros na América do Norte
+    top_generos_na = vendas_por_genero_na.head(5)
+    print("Cinco principais gêneros na América:")
+    print(top_generos_na)
+
+    # Plotar um gráfico de barras para visualizar a distribuição das vendas por gênero na América do Norte
+    if GRAFICOS:
+        plt.figure(figsize=(10, 6))
+        sns.barplot(x=top_generos_na.index, order=top_generos_na.index, y=top_generos_na.values, palette="viridis")
+        plt.title('Vendas Totais por Gênero na América do Norte')
+        plt.xlabel('Gênero')
+        plt.ylabel('Vendas Globais (milhões)')
+        plt.xticks(rotation=45, ha='right')
+        plt.show()
+
+
+    # Calcular as vendas totais por classificação do ESRB na América do Norte
+    vendas_por_classificacao_na = agregar_cubo(cubo, 'rating', coluna='na_sales', anos=janela).sort_values(ascending=False)
+
+    # Exibir as vendas por classificação na América do Norte
+    print("Vendas por classificação na América do Norte:")
+    print(vendas_por_classificacao_na)
+
+    # Plotar um gráfico de barras para visualizar as vendas por classificação na América do Norte
+    if GRAFICOS:
+        plt.figure(figsize=(8, 6))
+        sns.barplot(x=vendas_por_classificacao_na.index, order=vendas_por_classificacao_na.index, y=vendas_por_classificacao_na.values, palette="viridis")
+        plt.title('Vendas Totais por Classificação do ESRB na América do Norte')
+        plt.xlabel('Classificação do ESRB')
+        plt.ylabel('Vendas Globais (milhões)')
+        plt.show()
+
+
+    secao.saida(vendas_por_classificacao_na)
 
-# Plotar um gráfico de barras para as vendas totais por plataforma na América do Norte
-plt.figure(figsize=(10, 6))
-sns.barplot(x=na_data.index, y='na_sales', data=na_data, palette="Blues")
-plt.title('Vendas Totais por Plataforma na América do Norte')
-plt.xlabel('Plataforma')
-plt.ylabel('Vendas Totais (milhões)')
-plt.show()
-
-# Filtrar os dados para incluir apenas a região da América do Norte
-na_data = games_novo[games_novo['na_sales'] > 0]
+# ### Europa
 
-# Calcular as vendas totais por gênero na América do Norte
-vendas_por_genero_na = na_data.groupby('genre')['na_sales'].sum().sort_values(ascending=False)
+with rastreador.secao('perfil_europa', entrada=cubo) as secao:
+    # Calcular as vendas totais por plataforma na Região da União Europeia (UE)
+    eu_data = agregar_cubo(cubo, 'platform', coluna='eu_sales', anos=janela).sort_values(ascending=False).head(5)
 
-# Exibir os cinco principais gêneros na América do Norte
-top_generos_na = vendas_por_genero_na.head(5)
-print("Cinco principais gêneros na América:")
-print(top_generos_na)
+    # Plotar um gráfico de barras para as vendas totais por plataforma na União Europeia
+    if GRAFICOS:
+        plt.figure(figsize=(10, 6))
+        sns.barplot(x=eu_data.index, order=eu_data.index, y=eu_data.values, palette="Reds")
+        plt.title('Vendas Totais por Plataforma na União Europeia')
+        plt.xlabel('Plataforma')
+        plt.ylabel('Vendas Totais (milhões)')
+        plt.show()
 
-# Plotar um gráfico de barras para visualizar a distribuição das vendas por gênero na América do Norte
-plt.figure(figsize=(10, 6))
-sns.barplot(x=top_generos_na.index, y=top_generos_na.values, palette="viridis")
-plt.title('Vendas Totais por Gênero na América do Norte')
-plt.xlabel('Gênero')
-plt.ylabel('Vendas Globais (milhões)')
-plt.xticks(rotation=45, ha='right')
-plt.show()
 
+    # Calcular as vendas totais por gênero na Europa
+    vendas_por_genero_eu = agregar_cubo(cubo, 'genre', coluna='eu_sales', anos=janela).sort_values(ascending=False)
 
-# Calcular as vendas totais por classificação do ESRB na América do Norte
-vendas_por_classificacao_na = games_novo.groupby('rating')['na_sales'].sum().sort_values(ascending=False)
+    # Exibir os cinco principais gêneros na Europa
+    top_generos_eu = vendas_por_genero_eu.head(5)
+    print("Cinco principais gêneros na Europa:")
+    print(top_generos_eu)
 
-# Exibir as vendas por classificação na América do Norte
-print("Vendas por classificação na América do Norte:")
-print(vendas_por_classificacao_na)
+    # Plotar um gráfico de barras para visualizar a distribuição das vendas por gênero na Europa
+    if GRAFICOS:
+        plt.figure(figsize=(10, 6))
+        sns.barplot(x=top_generos_eu.index, order=top_generos_eu.index, y=top_generos_eu.values, palette="viridis")
+        plt.title('Vendas Totais por Gênero na Europa')
+        plt.xlabel('Gênero')
+        plt.ylabel('Vendas Globais (milhões)')
+        plt.xticks(rotation=45, ha='right')
+        plt.show()
 
-# Plotar um gráfico de barras para visualizar as vendas por classificação na América do Norte
-plt.figure(figsize=(8, 6))
-sns.barplot(x=vendas_por_classificacao_na.index, y=vendas_por_classificacao_na.values, palette="viridis")
-plt.title('Vendas Totais por Classificação do ESRB na América do Norte')
-plt.xlabel('Classificação do ESRB')
-plt.ylabel('Vendas Globais (milhões)')
-plt.show()
 
+    # Calcular as vendas totais por classificação do ESRB na Europa
+    vendas_por_classificacao_eu = agregar_cubo(cubo, 'rating', coluna='eu_sales', anos=janela).sort_values(ascending=False)
 
-# ### Europa
+    # Exibir as vendas por classificação na Europa
+    print("Vendas por classificação na Europa:")
+    print(vendas_por_classificacao_eu)
 
-# Filtrar os dados para a Região da União Europeia (UE)
-eu_data = games_novo[['platform', 'eu_sales']].groupby('platform').sum().sort_values(by='eu_sales', ascending=False).head(5)
+    # Plotar um gráfico de barras para visualizar as vendas por classificação na Europa
+    if GRAFICOS:
+        plt.figure(figsize=(8, 6))
+        sns.barplot(x=vendas_por_classificacao_eu.index, order=vendas_por_classificacao_eu.index, y=vendas_por_classificacao_eu.values, palette="viridis")
+        plt.title('Vendas Totais por Classificação do ESRB na Europa')
+        plt.xlabel('Classificação do ESRB')
+        plt.ylabel('Vendas Globais (milhões)')
+        plt.show()
 
-# Plotar um gráfico de barras para as vendas totais por plataforma na União Europeia
-plt.figure(figsize=(10, 6))
-sns.barplot(x=eu_data.index, y='eu_sales', data=eu_data, palette="Reds")
-plt.title('Vendas Totais por Plataforma na União Europeia')
-plt.xlabel('Plataforma')
-plt.ylabel('Vendas Totais (milhões)')
-plt.show()
 
+    secao.saida(vendas_por_classificacao_eu)
 
-# Filtrar os dados para incluir apenas a região da Europa
-eu_data = games_novo[games_novo['eu_sales'] > 0]
+# ### Japão
 
-# Calcular as vendas totais por gênero na Europa
-vendas_por_genero_eu = eu_data.groupby('genre')['eu_sales'].sum().sort_values(ascending=False)
+with rastreador.secao('perfil_japao', entrada=cubo) as secao:
+    # Calcular as vendas totais por plataforma na Região Japonesa (JP)
+    jp_data = agregar_cubo(cubo, 'platform', coluna='jp_sales', anos=janela).sort_values(ascending=False).head(5)
+
+    # Plotar um gráfico de barras para as vendas totais por plataforma no Japão
+    if GRAFICOS:
+        plt.figure(figsize=(10, 6))
+        sns.barplot(x=jp_data.index, order=jp_data.index, y=jp_data.values, palette="Greens")
+        plt.title('Vendas Totais por Plataforma no Japão')
+        plt.xlabel('Plataforma')
+        plt.ylabel('Vendas Totais (milhões)')
+        plt.show()
+
+    # Calcular as vendas totais por gênero do Japão
+    vendas_por_genero_jp = agregar_cubo(cubo, 'genre', coluna='jp_sales', anos=janela).sort_values(ascending=False)
+
+    # Exibir os cinco principais gêneros na Europa
+    top_generos_jp = vendas_por_genero_jp.head(5)
+    print("Cinco principais gêneros no Japão:")
+    print(top_generos_jp)
+
+    # Plotar um gráfico de barras para visualizar a distribuição das vendas por gênero na Europa
+    if GRAFICOS:
+        plt.figure(figsize=(10, 6))
+        sns.barplot(x=top_generos_jp.index, order=top_generos_jp.index, y=top_generos_jp.values, palette="viridis")
+        plt.title('Vendas Totais por Gênero no Japão')
+        plt.xlabel('Gênero')
+        plt.ylabel('Vendas Globais (milhões)')
+        plt.xticks(rotation=45, ha='right')
+        plt.show()
+
+    # Calcular as vendas totais por classificação do ESRB no Japão
+    vendas_por_classificacao_jp = agregar_cubo(cubo, 'rating', coluna='jp_sales', anos=janela).sort_values(ascending=False)
+
+    # Exibir as vendas por classificação no Japão
+    print("Vendas por classificação na Japão:")
+    print(vendas_por_classificacao_jp)
+
+    # Plotar um gráfico de barras para visualizar as vendas por classificação no Japão
+    if GRAFICOS:
+        plt.figure(figsize=(8, 6))
+        sns.barplot(x=vendas_por_classificacao_jp.index, order=vendas_por_classificacao_jp.index, y=vendas_por_classificacao_jp.values, palette="viridis")
+        plt.title('Vendas Totais por Classificação do ESRB no Japão')
+        plt.xlabel('Classificação do ESRB')
+        plt.ylabel('Vendas Globais (milhões)')
+        plt.show()
+
+
+    secao.saida(vendas_por_classificacao_jp)
 
-# Exibir os cinco principais gêneros na Europa
-top_generos_eu = vendas_por_genero_eu.head(5)
-print("Cinco principais gêneros na Europa:")
-print(top_generos_eu)
+# ### Conclusões
 
-# Plotar um gráfico de barras para visualizar a distribuição das vendas por gênero na Europa
-plt.figure(figsize=(10, 6))
-sns.barplot(x=top_generos_eu.index, y=top_generos_eu.values, palette="viridis")
-plt.title('Vendas Totais por Gênero na Europa')
-plt.xlabel('Gênero')
-plt.ylabel('Vendas Globais (milhões)')
-plt.xticks(rotation=45, ha='right')
-plt.show()
+# As preferências dos usuários dos principais mercados, América do Norte, Europa e Japão, diferem em alguns aspectos:
+# - Na América do norte as principais plataformas utilizadas foram X360, PS4, PS3 e XOne, sendo que as três últimas dividem o mercado de uma maneira mais equitativa. Os gêneros preferidos são Action e Shooter.
+# - Na Europa, as principais plataformas utilizadas foram PS4 e PS3, com os mesmos gêneros preferidos que na América do Norte (Action e Shooter).
+# - No Japão, a plataforma mais preferida em disparado é a 3DS, com os gêneros Role-Playing e Action. 
+# 
+# Na América do Norte e na Europa os usuários mais adquirem jogos com classificação Mature (Adulto). No Japão, a maior parte das vendas é de jogos sem classificação do ESRB ('None'), e entre os classificados predominam E e T.
 
+# ## Testes de hipóteses
 
-# Calcular as vendas totais por classificação do ESRB na Europa
-vendas_por_classificacao_eu = games_novo.groupby('rating')['eu_sales'].sum().sort_values(ascending=False)
+with rastreador.secao('testes_hipoteses', entrada=games_novo) as secao:
+    # ### Comparação das classificações dos usuários para as plataformas Xbox One e PC
 
-# Exibir as vendas por classificação na Europa
-print("Vendas por classificação na Europa:")
-print(vendas_por_classificacao_eu)
+    # Hipóteses:
+    # 
+    # Hipótese Nula (H0): Não há diferença significativa nas classificações médias dos usuários entre as plataformas Xbox One e PC.
+    # Hipótese Alternativa (H1): Há uma diferença significativa nas classificações médias dos usuários entre as plataformas Xbox One e PC.
 
-# Plotar um gráfico de barras para visualizar as vendas por classificação na Europa
-plt.figure(figsize=(8, 6))
-sns.barplot(x=vendas_por_classificacao_na.index, y=vendas_por_classificacao_eu.values, palette="viridis")
-plt.title('Vendas Totais por Classificação do ESRB na Europa')
-plt.xlabel('Classificação do ESRB')
-plt.ylabel('Vendas Globais (milhões)')
-plt.show()
 
+    # Selecionar, com máscaras, os jogos das duas plataformas que têm avaliação do usuário. As estatísticas de cada grupo
+    # são calculadas com reduções mascaradas sobre a coluna Float32, sem montar cópias filtradas das avaliações
+    avaliado_usuario = games_novo['user_score'].notna().to_numpy()
+    selecao_xone = (games_novo['platform'] == 'XOne').to_numpy() & avaliado_usuario
+    selecao_pc = (games_novo['platform'] == 'PC').to_numpy() & avaliado_usuario
+    teste_xbox_pc = testar_dois_grupos(games_novo['user_score'], selecao_xone, selecao_pc)
 
-# ### Japão
+    # Verificar o resultado do teste de igualdade de variâncias (Bartlett's Test)
+    if teste_xbox_pc['p_valor_bartlett'] > 0.05:
+        equal_var = True
+        print("Variâncias iguais (p-value =", teste_xbox_pc['p_valor_bartlett'], ")")
+    else:
+        equal_var = False
+        print("Variâncias diferentes (p-value =", teste_xbox_pc['p_valor_bartlett'], ")")
 
-# Filtrar os dados para a Região Japonesa (JP)
-jp_data = games_novo[['platform', 'jp_sales']].groupby('platform').sum().sort_values(by='jp_sales', ascending=False).head(5)
-
-# Plotar um gráfico de barras para as vendas totais por plataforma no Japão
-plt.figure(figsize=(10, 6))
-sns.barplot(x=jp_data.index, y='jp_sales', data=jp_data, palette="Greens")
-plt.title('Vendas Totais por Plataforma no Japão')
-plt.xlabel('Plataforma')
-plt.ylabel('Vendas Totais (milhões)')
-plt.show()
-
-# Filtrar os dados para incluir apenas a região do Japão
-jp_data = games_novo[games_novo['jp_sales'] > 0]
-
-# Calcular as vendas totais por gênero do Japão
-vendas_por_genero_jp = jp_data.groupby('genre')['jp_sales'].sum().sort_values(ascending=False)
-
-# Exibir os cinco principais gêneros na Europa
-top_generos_jp = vendas_por_genero_jp.head(5)
-print("Cinco principais gêneros no Japão:")
-print(top_generos_jp)
-
-# Plotar um gráfico de barras para visualizar a distribuição das vendas por gênero na Europa
-plt.figure(figsize=(10, 6))
-sns.barplot(x=top_generos_jp.index, y=top_generos_jp.values, palette="viridis")
-plt.title('Vendas Totais por Gênero no Japão')
-plt.xlabel('Gênero')
-plt.ylabel('Vendas Globais (milhões)')
-plt.xticks(rotation=45, ha='right')
-plt.show()
-
-# Calcular as vendas totais por classificação do ESRB no Japão
-vendas_por_classificacao_jp = games_novo.groupby('rating')['eu_sales'].sum().sort_values(ascending=False)
-
-# Exibir as vendas por classificação no Japão
-print("Vendas por classificação na Japão:")
-print(vendas_por_classificacao_jp)
-
-# Plotar um gráfico de barras para visualizar as vendas por classificação no Japão
-plt.figure(figsize=(8, 6))
-sns.barplot(x=vendas_por_classificacao_jp.index, y=vendas_por_classificacao_jp.values, palette="viridis")
-plt.title('Vendas Totais por Classificação do ESRB no Japão')
-plt.xlabel('Classificação do ESRB')
-plt.ylabel('Vendas Globais (milhões)')
-plt.show()
 
+    # Teste t de Welch (amostras independentes, variâncias diferentes)
+    print('p-value:', teste_xbox_pc['p_valor'])
 
-# ### Conclusões
 
-# As preferências dos usuários dos principais mercados, América do Norte, Europa e Japão, diferem em alguns aspectos:
-# - Na América do norte as principais plataformas utilizadas foram X360, PS4, PS3 e XOne, sendo que as três últimas dividem o mercado de uma maneira mais equitativa. Os gêneros preferidos são Action e Shooter.
-# - Na Europa, as principais plataformas utilizadas foram PS4 e PS3, com os mesmos gêneros preferidos que na América do Norte (Action e Shooter).
-# - No Japão, a plataforma mais preferida em disparado é a 3DS, com os gêneros Role-Playing e Action. 
-# 
-# Nas três regiões os usuários mais adquirem jogos com classificação Mature (Adulto).
+    # Neste caso, o P-Value é 0.549, que é maior que o valor nível de significancia de 0,05. Portanto, não podemos rejeitar a hipótese nula com um nível de significância de 0,05. Isso significa que não há evidências suficientes para sugerir que as médias entre as avaliações dos usuários das plataformas Xbox One e PC são diferentes.
+    # 
+    # Observação: quando os jogos não avaliados eram preenchidos com 999, esses valores entravam no teste (o .dropna() não os removia) e o P-Value era 0.0188, indicando uma diferença que vinha apenas da proporção de jogos não avaliados em cada plataforma.
 
-# ## Testes de hipóteses
+    # ### Comparação das classificações dos usuários para os gêneros Action e Sports
 
-# ### Comparação das classificações dos usuários para as plataformas Xbox One e PC
+    # Hipótese Nula (H0): Não há diferença significativa nas classificações médias dos usuários entre os gêneros Action e Sports.
+    # 
+    # Hipótese Alternativa (H1): Há uma diferença significativa nas classificações médias dos usuários entre os gêneros Action e Sports.
 
-# Hipóteses:
-# 
-# Hipótese Nula (H0): Não há diferença significativa nas classificações médias dos usuários entre as plataformas Xbox One e PC.
-# Hipótese Alternativa (H1): Há uma diferença significativa nas classificações médias dos usuários entre as plataformas Xbox One e PC.
 
+    # Selecionar, com as mesmas máscaras, os jogos dos dois gêneros que têm avaliação do usuário
+    selecao_action = (games_novo['genre'] == 'Action').to_numpy() & avaliado_usuario
+    selecao_sports = (games_novo['genre'] == 'Sports').to_numpy() & avaliado_usuario
+    teste_action_sports = testar_dois_grupos(games_novo['user_score'], selecao_action, selecao_sports)
 
-# Filtrar os dados para incluir apenas as plataformas Xbox One e PC
-xbox_one_scores = games_novo[games_novo['platform'] == 'XOne']['user_score'].dropna()
-pc_scores = games_novo[games_novo['platform'] == 'PC']['user_score'].dropna()
+    # Verificar o resultado do teste de igualdade de variâncias (Bartlett's Test)
+    if teste_action_sports['p_valor_bartlett'] > 0.05:
+        equal_var = True
+        print("Variâncias iguais (p-value =", teste_action_sports['p_valor_bartlett'], ")")
+    else:
+        equal_var = False
+        print("Variâncias diferentes (p-value =", teste_action_sports['p_valor_bartlett'], ")")
 
-# Realizar teste de igualdade de variâncias (Bartlett's Test)
-bartlett_test = stats.bartlett(xbox_one_scores, pc_scores)
 
-# Verificar o resultado do teste de igualdade de variâncias
-if bartlett_test.pvalue > 0.05:
-    equal_var = True
-    print("Variâncias iguais (p-value =", bartlett_test.pvalue, ")")
-else:
-    equal_var = False
-    print("Variâncias diferentes (p-value =", bartlett_test.pvalue, ")")
+    # Teste t de Welch (amostras independentes, variâncias diferentes)
+    print('p-value:', teste_action_sports['p_valor'])
 
 
-# Teste t de amostras independentes
-results = stats.ttest_ind(xbox_one_scores, pc_scores, equal_var=False)
+    # Neste caso, O valor p (4.243073475332145e-20) é muito pequeno. Portanto, podemos rejeitar a hipótese nula com um nível de significância de 0,05. Isso significa que há evidências suficientes para sugerir que as médias entre as avaliações dos usuários dos gênerod Action e Sportes são diferentes.
 
-print('p-value:', results.pvalue)
+    # ### Comparação de todos os pares de plataformas e de gêneros
 
+    # Os mesmos testes (Bartlett e t de Welch) aplicados a todos os pares de plataformas e de gêneros do período de 2012 a 2016, de uma só vez.
+    # Como são feitas muitas comparações, os p-valores são corrigidos pelo método de Holm antes de comparar com o nível de significância de 0,05.
 
-# Neste caso, o P-Value é 0.0188, que é menor que o valor nível de significancia de 0,05. Portanto, podemos rejeitar a hipótese nula com um nível de significância de 0,05. Isso significa que há evidências suficientes para sugerir que as médias entre as avaliações dos usuários das plataformas Xbox One e PC são diferentes.
+    testes_plataformas = testar_pares(games_novo, grupo='platform', coluna='user_score', correcao='holm')
+    print("Pares de plataformas com avaliações médias dos usuários diferentes:")
+    print(testes_plataformas[testes_plataformas['medias_diferentes']].sort_values('p_ajustado')[['grupo_a', 'grupo_b', 'media_a', 'media_b', 'p_valor', 'p_ajustado']])
 
-# ### Comparação das classificações dos usuários para os gêneros Action e Sports
+    testes_generos = testar_pares(games_novo, grupo='genre', coluna='user_score', correcao='holm')
+    print("Pares de gêneros com avaliações médias dos usuários diferentes:")
+    print(testes_generos[testes_generos['medias_diferentes']].sort_values('p_ajustado')[['grupo_a', 'grupo_b', 'media_a', 'media_b', 'p_valor', 'p_ajustado']])
 
-# Hipótese Nula (H0): Não há diferença significativa nas classificações médias dos usuários entre os gêneros Action e Sports.
-# 
-# Hipótese Alternativa (H1): Há uma diferença significativa nas classificações médias dos usuários entre os gêneros Action e Sports.
 
+    secao.saida(testes_generos)
 
-# Filtrar os dados para incluir apenas os gêneros Action e Sports
-action_scores = games_novo[games_novo['genre'] == 'Action']['user_score'].dropna()
-sports_scores = games_novo[games_novo['genre'] == 'Sports']['user_score'].dropna()
+# ### Simulação da divisão da campanha
 
-# Realizar teste de igualdade de variâncias (Bartlett's Test)
-bartlett_test = stats.bartlett(action_scores, sports_scores)
+with rastreador.secao('simulacao_campanha', entrada=games_novo) as secao:
+    # As conclusões abaixo sugerem dividir a campanha entre PS4, PS3 e X360, os gêneros Action, Shooter, Role-Playing e Sports e as regiões NA, EU e JP. Para medir a incerteza dessa divisão, as vendas por título de cada combinação de plataforma, gênero e região de 2012 a 2016 são reamostradas milhares de vezes, e 5000 divisões do orçamento são avaliadas nos mesmos sorteios, com o valor esperado (vendas médias por título, em milhões) e o risco de cada uma. A primeira é a divisão igual entre todas as opções.
+    # Aqui a simulação roda em um único processo, com um número fixo de sorteios (e não um tempo fixo), para que o
+    # resultado dependa só da semente e não da velocidade da máquina; 'simulacao.py' faz o mesmo com vários processos.
 
-# Verificar o resultado do teste de igualdade de variâncias
-if bartlett_test.pvalue > 0.05:
-    equal_var = True
-    print("Variâncias iguais (p-value =", bartlett_test.pvalue, ")")
-else:
-    equal_var = False
-    print("Variâncias diferentes (p-value =", bartlett_test.pvalue, ")")
+    resultado_simulacao, informacoes_simulacao = simular(games_novo, n_alocacoes=5000, tempo=float('inf'),
+                                                         max_sorteios=20_000, processos=1, semente=42)
+    print(informacoes_simulacao)
 
+    # Divisão igual do orçamento
+    print(resultado_simulacao[resultado_simulacao['recomendada']].T)
 
-# Teste t de amostras independentes
-results = stats.ttest_ind(action_scores, sports_scores, equal_var=False)
+    # Divisões com os maiores valores esperados e fronteira eficiente (maior valor esperado para cada nível de risco)
+    print(resultado_simulacao.head(10))
+    print(fronteira_eficiente(resultado_simulacao))
 
-print('p-value:', results.pvalue)
 
+    # A divisão igual tem valor esperado de cerca de 0,27 milhão por título e fica abaixo da média observada em cerca de metade dos sorteios. As divisões com os maiores valores esperados (cerca de 0,6 milhão por título) concentram o orçamento em Shooter, em PS4 e X360 e nas regiões NA e EU, com pouca participação do Japão, à custa de um desvio padrão maior.
 
-# Neste caso, O valor p (6.851256251893839e-12) é muito pequeno. Portanto, podemos rejeitar a hipótese nula com um nível de significância de 0,05. Isso significa que há evidências suficientes para sugerir que as médias entre as avaliações dos usuários dos gênerod Action e Sportes são diferentes.
+    secao.saida(resultado_simulacao)
 
 # ## Conclusão Geral
 
@@ -534,7 +664,7 @@ print('p-value:', results.pvalue)
 # O mercado de lançamentos de jogos atingiu seu pico em 2008-2009, estabilizando em cerca de 600 jogos por ano desde 2012.
 # 
 # - Plataformas Promissoras:
-# As plataformas PS4, PS3 e X360 se destacaram nos últimos anos, indicando oportunidades promissoras para campanhas.
+# As plataformas PS4, PS3 e X360 lideraram as vendas de 2012 a 2016, mas apenas PS4 e XOne estão em crescimento ano a ano e são as que têm as maiores vendas previstas para 2017, indicando as oportunidades mais promissoras para campanhas.
 # 
 # - Influência das Críticas:
 # As análises profissionais são significativas para os usuários na escolha de jogos, destacando a importância de parcerias com críticos.
@@ -546,7 +676,13 @@ print('p-value:', results.pvalue)
 # Estratégias de marketing devem considerar as preferências regionais, como o destaque da 3DS no Japão e as preferências de plataformas e gêneros nas Américas e Europa.
 # 
 # - Classificação Etária:
-# Jogos com classificação Mature são preferidos em todas as regiões, sugerindo oportunidades para conteúdo direcionado a adultos.
+# Jogos com classificação Mature são preferidos na América do Norte e na Europa, sugerindo oportunidades para conteúdo direcionado a adultos nessas regiões. No Japão predominam jogos sem classificação do ESRB.
 # 
-# Considerando o teste de hipótese entre as plataformas Xbox One e PC, assim como entre os gêneros Action e Sports, os resultados indicam diferenças estatisticamente significativas. Isso ressalta a importância de adaptar estratégias de marketing com base nas preferências específicas dos usuários de cada plataforma e gênero.
+# Considerando os testes de hipótese, não há diferença estatisticamente significativa entre as avaliações dos usuários das plataformas Xbox One e PC, enquanto entre os gêneros Action e Sports a diferença é significativa. Isso ressalta a importância de adaptar estratégias de marketing com base nas preferências específicas dos usuários de cada gênero.
+
+
+# Tempo das importações iniciais e das bibliotecas importadas sob demanda durante a execução
+print(relatorio_importacoes(tempo_importacao))
 
+# Gravando o rastreio das seções (no formato do Chrome, o arquivo é gravado só aqui)
+rastreador.fechar()
@@ -0,0 +1,73 @@
+# # Importação sob demanda das bibliotecas pesadas
+
+# matplotlib, seaborn e scipy levam mais tempo para importar do que muitas execuções curtas levam para calcular as
+# tabelas. Em 'ice.py' (e nos módulos que usam o SciPy, como 'testes.py' e 'previsao.py') elas são representadas
+# por módulos sob demanda: o import de verdade só acontece no primeiro uso de um atributo (plt.figure,
+# stats.t.sf, ...), e o tempo de cada import fica registrado. Há um único módulo sob demanda para cada nome, então
+# o tempo é registrado pelo primeiro uso, qualquer que seja o módulo que o faça.
+#
+# Os gráficos podem ser desligados pela variável de ambiente ICE_GRAFICOS=0 (modo só números): as seções de
+# gráficos não são executadas, e matplotlib e seaborn nunca são importados.
+
+import importlib
+import os
+import sys
+import time
+
+
+# Tempo de importação (em segundos) de cada módulo carregado sob demanda
+TEMPOS_IMPORTACAO = {}
+
+# Bibliotecas pesadas, verificadas no resumo das importações
+BIBLIOTECAS_PESADAS = ['matplotlib', 'seaborn', 'scipy']
+
+# Módulos sob demanda já criados, por nome
+_MODULOS = {}
+
+
+# Os gráficos estão ligados, a menos que ICE_GRAFICOS seja '0' ou vazio
+def graficos_ligados():
+    return os.environ.get('ICE_GRAFICOS', '1') not in ('', '0')
+
+
+class ModuloSobDemanda:
+    def __init__(self, nome):
+        self._nome = nome
+        self._modulo = None
+
+    def _carregar(self):
+        if self._modulo is None:
+            ja_importado = self._nome in sys.modules
+            inicio = time.perf_counter()
+            self._modulo = importlib.import_module(self._nome)
+            # None quando o módulo já tinha sido importado por outro módulo
+            TEMPOS_IMPORTACAO[self._nome] = None if ja_importado else time.perf_counter() - inicio
+        return self._modulo
+
+    def __getattr__(self, atributo):
+        return getattr(self._carregar(), atributo)
+
+    def __repr__(self):
+        estado = 'carregado' if self._modulo is not None else 'não carregado'
+        return f"<módulo sob demanda '{self._nome}' ({estado})>"
+
+
+def importar_sob_demanda(nome):
+    if nome not in _MODULOS:
+        _MODULOS[nome] = ModuloSobDemanda(nome)
+    return _MODULOS[nome]
+
+
+# Resumo dos tempos de importação: os módulos importados no início e os carregados sob demanda durante a execução
+def relatorio_importacoes(tempo_inicial=None):
+    linhas = []
+    if tempo_inicial is not None:
+        linhas.append(f'Importações iniciais: {tempo_inicial:.3f} s')
+    for nome, tempo in TEMPOS_IMPORTACAO.items():
+        if tempo is None:
+            linhas.append(f'Importado sob demanda: {nome} (já importado por outro módulo)')
+        else:
+            linhas.append(f'Importado sob demanda: {nome} em {tempo:.3f} s')
+    carregadas = [nome for nome in BIBLIOTECAS_PESADAS if nome in sys.modules]
+    linhas.append(f"Bibliotecas pesadas carregadas: {', '.join(carregadas) if carregadas else 'nenhuma'}")
+    return '\n'.join(linhas)
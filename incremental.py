@@ -0,0 +1,212 @@
+# # Atualização incremental dos agregados
+
+# A cada mês chega um novo lote de vendas. Em vez de executar 'ice.py' de novo sobre todo o histórico, o estado
+# agregado fica em disco (o cubo de 'cubo.py', com somas, contagens e somas dos quadrados por ano, plataforma,
+# gênero e classificação, e o primeiro e o último ano de cada plataforma) e cada lote novo é incorporado a ele:
+# o lote é limpo, resumido em um cubo próprio e somado apenas às células das plataformas, gêneros e anos que
+# aparecem nele. O custo de uma atualização depende do tamanho do lote (e do número de células do cubo, que é
+# pequeno), e não do número de linhas do histórico.
+#
+# Os lotes já incorporados ficam registrados pelo hash do conteúdo, então incorporar o mesmo arquivo duas vezes
+# não conta as vendas em dobro. Cada lote passa pela validação de 'validacao.py' antes da limpeza: as linhas
+# rejeitadas não entram nos agregados e são acrescentadas a 'quarentena.csv', no diretório do estado.
+#
+# Exemplo:
+#     python incremental.py estado_ice --inicial /datasets/games.csv
+#     python incremental.py estado_ice lote_2017_01.csv lote_2017_02.csv
+
+import argparse
+import json
+import os
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+
+import pandas as pd
+
+from carregamento import VERSAO_LIMPEZA, _formato_cache, hash_arquivo, limpar_jogos
+from cubo import DIMENSOES, agregar_cubo, carregar_cubo, construir_cubo, salvar_cubo
+from validacao import ler_validado
+
+
+# Arquivos do estado, dentro do diretório do estado
+ARQUIVO_METADADOS = 'estado.json'
+ARQUIVO_QUARENTENA = 'quarentena.csv'
+
+
+def _arquivos_estado(dir_estado):
+    formato = _formato_cache()
+    return {
+        'cubo': Path(dir_estado) / f'cubo.{formato}',
+        'plataformas': Path(dir_estado) / f'plataformas.{formato}',
+        'metadados': Path(dir_estado) / ARQUIVO_METADADOS,
+    }
+
+
+def estado_vazio():
+    return {
+        'cubo': None,
+        'plataformas': pd.DataFrame({'ano_primeiro': pd.Series(dtype='int64'), 'ano_ultimo': pd.Series(dtype='int64')},
+                                    index=pd.Index([], name='platform', dtype='object')),
+        'lotes': [],
+    }
+
+
+# Lendo o estado do disco (um estado vazio quando o diretório ainda não existe)
+def carregar_estado(dir_estado):
+    arquivos = _arquivos_estado(dir_estado)
+    if not arquivos['metadados'].exists():
+        return estado_vazio()
+
+    metadados = json.loads(arquivos['metadados'].read_text())
+    if metadados['versao_limpeza'] != VERSAO_LIMPEZA:
+        raise ValueError(f"O estado em '{dir_estado}' foi criado com a versão {metadados['versao_limpeza']} da limpeza "
+                         f"(atual: {VERSAO_LIMPEZA}); reconstrua-o com --inicial")
+
+    plataformas = carregar_cubo(arquivos['plataformas']).set_index('platform')
+    return {
+        'cubo': carregar_cubo(arquivos['cubo']),
+        'plataformas': plataformas,
+        'lotes': metadados['lotes'],
+    }
+
+
+# Gravando o estado: cada arquivo é gravado em um temporário e renomeado, e os metadados (com a lista de lotes)
+# por último, para que uma gravação interrompida não registre um lote que não foi somado ao cubo
+def salvar_estado(estado, dir_estado):
+    Path(dir_estado).mkdir(parents=True, exist_ok=True)
+    arquivos = _arquivos_estado(dir_estado)
+
+    for nome, dados in [('cubo', estado['cubo']), ('plataformas', estado['plataformas'].reset_index())]:
+        temporario = arquivos[nome].with_name(f'{arquivos[nome].stem}.tmp{os.getpid()}{arquivos[nome].suffix}')
+        salvar_cubo(dados, temporario)
+        os.replace(temporario, arquivos[nome])
+
+    metadados = {'versao_limpeza': VERSAO_LIMPEZA, 'lotes': estado['lotes']}
+    temporario = arquivos['metadados'].with_suffix(f'.tmp{os.getpid()}')
+    temporario.write_text(json.dumps(metadados, indent=1))
+    os.replace(temporario, arquivos['metadados'])
+
+
+# Somando o cubo do lote ao cubo do estado. As células que já existem são atualizadas diretamente pela chave
+# (ano, plataforma, gênero, classificação); as novas são acrescentadas ao final
+def somar_ao_cubo(cubo, delta):
+    delta = delta.astype({d: 'object' for d in DIMENSOES[1:]}).set_index(DIMENSOES)
+    if cubo is None or not len(cubo):
+        return delta.reset_index().astype({d: 'category' for d in DIMENSOES[1:]})
+
+    cubo = cubo.astype({d: 'object' for d in DIMENSOES[1:]}).set_index(DIMENSOES)
+    existentes = delta.index.isin(cubo.index)
+    chaves = delta.index[existentes]
+    cubo.loc[chaves, delta.columns] = cubo.loc[chaves, delta.columns].to_numpy() + delta[existentes].to_numpy()
+    if not existentes.all():
+        cubo = pd.concat([cubo, delta[~existentes]])
+    return cubo.reset_index().astype({d: 'category' for d in DIMENSOES[1:]})
+
+
+# Atualizando o primeiro e o último ano apenas das plataformas presentes no lote
+def atualizar_plataformas(plataformas, lote):
+    anos = lote.groupby('platform', observed=True)['year_of_release'].agg(['min', 'max'])
+    anos.index = anos.index.astype('object')
+    plataformas = plataformas.reindex(plataformas.index.union(anos.index))
+
+    afetadas = anos.index
+    primeiro = plataformas.loc[afetadas, 'ano_primeiro']
+    ultimo = plataformas.loc[afetadas, 'ano_ultimo']
+    plataformas.loc[afetadas, 'ano_primeiro'] = primeiro.fillna(anos['min']).clip(upper=anos['min'])
+    plataformas.loc[afetadas, 'ano_ultimo'] = ultimo.fillna(anos['max']).clip(lower=anos['max'])
+    return plataformas.astype('int64')
+
+
+# Incorporando um lote limpo ao estado (em memória). Retorna o novo estado e as plataformas, gêneros e anos afetados
+def incorporar(estado, lote, registro=None):
+    delta = construir_cubo(lote)
+    novo = {
+        'cubo': somar_ao_cubo(estado['cubo'], delta),
+        'plataformas': atualizar_plataformas(estado['plataformas'], lote),
+        'lotes': estado['lotes'] + ([registro] if registro is not None else []),
+    }
+    afetados = {
+        'platform': sorted(delta['platform'].astype(str).unique()),
+        'genre': sorted(delta['genre'].astype(str).unique()),
+        'year_of_release': sorted(int(ano) for ano in delta['year_of_release'].unique()),
+    }
+    return novo, afetados
+
+
+# Incorporando um arquivo CSV de lote ao estado em disco. Lotes já incorporados (mesmo conteúdo) são ignorados
+def incorporar_lote(dir_estado, caminho):
+    estado = carregar_estado(dir_estado)
+    hash_lote = hash_arquivo(caminho)
+    if any(registro['hash'] == hash_lote for registro in estado['lotes']):
+        return estado, None
+
+    jogos, rejeitadas, _ = ler_validado(caminho, Path(dir_estado) / ARQUIVO_QUARENTENA)
+    lote = limpar_jogos(jogos)
+    registro = {
+        'arquivo': str(Path(caminho).resolve()),
+        'hash': hash_lote,
+        'linhas': int(len(lote)),
+        'rejeitadas': int(len(rejeitadas)),
+        'incorporado_em': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+    }
+    estado, afetados = incorporar(estado, lote, registro)
+    salvar_estado(estado, dir_estado)
+    return estado, afetados
+
+
+# Criando o estado do zero a partir do histórico completo (apaga o estado anterior)
+def reconstruir_estado(dir_estado, caminho):
+    arquivos = _arquivos_estado(dir_estado)
+    if arquivos['metadados'].exists():
+        arquivos['metadados'].unlink()
+    return incorporar_lote(dir_estado, caminho)
+
+
+# Resumo do estado com os mesmos agregados de 'ice.py' que dependem apenas do cubo e dos anos das plataformas
+def resumir_estado(estado, janela=(2012, 2016), top_n=5):
+    plataformas = estado['plataformas']
+    tempo_vida_plataformas = plataformas['ano_ultimo'] - plataformas['ano_primeiro']
+    return {
+        'contagem_por_ano': agregar_cubo(estado['cubo'], 'year_of_release', estatistica='contagem'),
+        'top_plataformas': agregar_cubo(estado['cubo'], 'platform').sort_values(ascending=False).head(top_n),
+        'tempo_vida_media': tempo_vida_plataformas.mean(),
+        'tempo_vida_mediana': tempo_vida_plataformas.median(),
+        'plataformas_lideres': agregar_cubo(estado['cubo'], 'platform', anos=janela).sort_values(ascending=False),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Incorpora lotes de vendas aos agregados salvos em disco.')
+    parser.add_argument('dir_estado', help='diretório do estado agregado')
+    parser.add_argument('lotes', nargs='*', help='arquivos CSV de lotes novos, na ordem em que devem ser incorporados')
+    parser.add_argument('--inicial', metavar='CSV', help='reconstrói o estado a partir deste arquivo com o histórico completo')
+    parser.add_argument('--ano-inicio', type=int, default=2012, help='primeiro ano do período do resumo')
+    parser.add_argument('--ano-fim', type=int, default=2016, help='último ano do período do resumo')
+    parser.add_argument('--top-n', type=int, default=5, help='tamanho dos rankings do resumo')
+    args = parser.parse_intermixed_args()
+
+    if args.inicial:
+        inicio = time.perf_counter()
+        estado, _ = reconstruir_estado(args.dir_estado, args.inicial)
+        print(f'Estado criado a partir de {args.inicial} em {time.perf_counter() - inicio:.3f} s')
+
+    for caminho in args.lotes:
+        inicio = time.perf_counter()
+        estado, afetados = incorporar_lote(args.dir_estado, caminho)
+        if afetados is None:
+            print(f'{caminho}: já incorporado, ignorado')
+            continue
+        registro = estado['lotes'][-1]
+        print(f'{caminho}: {registro["linhas"]} linhas incorporadas, {registro["rejeitadas"]} rejeitadas, '
+              f'em {time.perf_counter() - inicio:.3f} s')
+        for dimensao, valores in afetados.items():
+            print(f'    {dimensao}: {", ".join(map(str, valores))}')
+
+    estado = carregar_estado(args.dir_estado)
+    if estado['cubo'] is None:
+        raise SystemExit(f"Estado vazio em '{args.dir_estado}': use --inicial com o histórico completo")
+    for chave, valor in resumir_estado(estado, (args.ano_inicio, args.ano_fim), args.top_n).items():
+        print(f'{chave}:')
+        print(valor)
+        print()
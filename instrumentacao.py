@@ -0,0 +1,209 @@
+# # Instrumentação das seções da análise
+
+# Cada seção (preparação dos dados, lançamentos por ano, variação entre plataformas, ...) é medida com o tempo,
+# o número de linhas de entrada e de saída, a variação de memória (RSS) e, opcionalmente, um perfil do cProfile.
+# Os eventos são gravados como JSON lines (um objeto por linha) ou no formato de trace do Chrome
+# (chrome://tracing, Perfetto), conforme a extensão do arquivo: '.jsonl' ou '.json'. As seções são delimitadas
+# com 'with rastreador.secao(...)', e uma seção que termina com erro também é registrada (com o erro). No formato
+# do Chrome, os eventos ficam em memória e o arquivo é gravado uma única vez, em 'fechar' (chamado também na saída
+# do interpretador).
+#
+# Em 'ice.py' a instrumentação é ativada pelas variáveis de ambiente:
+#     ICE_RASTREIO=rastreio.jsonl   arquivo de saída dos eventos
+#     ICE_PERFIL=1                  grava também um perfil do cProfile por seção (em ICE_DIR_PERFIS, padrão 'perfis')
+
+import atexit
+import cProfile
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+
+# RSS atual (lido de /proc no Linux) e pico de RSS do processo, em MB
+def rss_atual_mb():
+    try:
+        with open('/proc/self/statm') as arquivo:
+            paginas = int(arquivo.read().split()[1])
+        return paginas * resource.getpagesize() / 2 ** 20
+    except OSError:
+        return float('nan')
+
+
+def rss_pico_mb():
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Em macOS o valor é em bytes; no Linux, em KB
+    return pico / 2 ** 20 if sys.platform == 'darwin' else pico / 2 ** 10
+
+
+# Pico de RSS de um trecho do código, em MB: uma thread lê o RSS atual a cada 'intervalo' segundos enquanto o
+# bloco 'with' executa. O pico de 'rss_pico_mb' (ru_maxrss) é o do processo inteiro e nunca diminui, então não
+# serve para medir uma etapa depois de outra que usou mais memória. Picos mais curtos que o intervalo podem
+# não ser vistos
+class AmostradorRSS:
+    def __init__(self, intervalo=0.01):
+        self.intervalo = intervalo
+        self.pico_mb = float('nan')
+        self._parar = threading.Event()
+        self._thread = None
+
+    def _amostrar(self):
+        while not self._parar.wait(self.intervalo):
+            self.pico_mb = max(self.pico_mb, rss_atual_mb())
+
+    def __enter__(self):
+        self.pico_mb = rss_atual_mb()
+        self._parar.clear()
+        self._thread = threading.Thread(target=self._amostrar, daemon=True)
+        self._thread.start()
+        return self
+
+    def __exit__(self, *excecao):
+        self._parar.set()
+        self._thread.join()
+        self.pico_mb = max(self.pico_mb, rss_atual_mb())
+        return False
+
+
+# Número de linhas de um DataFrame, Series ou qualquer objeto com len(); None quando não se aplica
+def contar_linhas(objeto):
+    if objeto is None:
+        return None
+    try:
+        return len(objeto)
+    except TypeError:
+        return None
+
+
+class Secao:
+    def __init__(self, nome, entrada=None, perfil=False):
+        self.nome = nome
+        self.linhas_entrada = contar_linhas(entrada)
+        self.linhas_saida = None
+        self.erro = None
+        self.perfil = cProfile.Profile() if perfil else None
+        self.rss_antes = rss_atual_mb()
+        self.inicio = time.time()
+        self.inicio_relogio = time.perf_counter()
+        if self.perfil is not None:
+            self.perfil.enable()
+
+    # Registrando o resultado da seção, para a contagem de linhas de saída
+    def saida(self, objeto):
+        self.linhas_saida = contar_linhas(objeto)
+        return objeto
+
+
+class Rastreador:
+    def __init__(self, arquivo=None, perfil=False, dir_perfis='perfis'):
+        self.arquivo = Path(arquivo) if arquivo else None
+        self.formato = 'chrome' if self.arquivo is not None and self.arquivo.suffix == '.json' else 'jsonl'
+        self.perfil = perfil
+        self.dir_perfis = Path(dir_perfis)
+        self.eventos = []
+        self.pid = os.getpid()
+        self.pendentes = False
+        if self.arquivo is not None and self.formato == 'jsonl':
+            self.arquivo.parent.mkdir(parents=True, exist_ok=True)
+            self.arquivo.write_text('')
+        if self.arquivo is not None and self.formato == 'chrome':
+            atexit.register(self.fechar)
+
+    # Rastreador configurado pelas variáveis de ambiente ICE_RASTREIO, ICE_PERFIL e ICE_DIR_PERFIS
+    @classmethod
+    def do_ambiente(cls):
+        return cls(
+            arquivo=os.environ.get('ICE_RASTREIO'),
+            perfil=os.environ.get('ICE_PERFIL', '') not in ('', '0'),
+            dir_perfis=os.environ.get('ICE_DIR_PERFIS', 'perfis'),
+        )
+
+    @property
+    def ativo(self):
+        return self.arquivo is not None
+
+    def iniciar(self, nome, entrada=None):
+        return Secao(nome, entrada, perfil=self.ativo and self.perfil)
+
+    def encerrar(self, secao, saida=None):
+        duracao = time.perf_counter() - secao.inicio_relogio
+        if secao.perfil is not None:
+            secao.perfil.disable()
+        if saida is not None:
+            secao.saida(saida)
+        if not self.ativo:
+            return None
+
+        rss_depois = rss_atual_mb()
+        evento = {
+            'nome': secao.nome,
+            'inicio': secao.inicio,
+            'duracao_s': duracao,
+            'linhas_entrada': secao.linhas_entrada,
+            'linhas_saida': secao.linhas_saida,
+            'rss_antes_mb': secao.rss_antes,
+            'rss_depois_mb': rss_depois,
+            'delta_rss_mb': rss_depois - secao.rss_antes,
+            'pico_rss_mb': rss_pico_mb(),
+            'pid': self.pid,
+            'tid': threading.get_ident(),
+        }
+        if secao.erro is not None:
+            evento['erro'] = secao.erro
+        if secao.perfil is not None:
+            self.dir_perfis.mkdir(parents=True, exist_ok=True)
+            arquivo_perfil = self.dir_perfis / f'{secao.nome}-{self.pid}.prof'
+            secao.perfil.dump_stats(arquivo_perfil)
+            evento['perfil'] = str(arquivo_perfil)
+
+        self.eventos.append(evento)
+        if self.formato == 'jsonl':
+            with open(self.arquivo, 'a') as saida_jsonl:
+                saida_jsonl.write(json.dumps(evento) + '\n')
+        else:
+            self.pendentes = True
+        return evento
+
+    # Seção delimitada por um bloco 'with': o evento é registrado mesmo se o bloco terminar com uma exceção (que
+    # é propagada). As linhas de saída são informadas com secao.saida(objeto)
+    @contextmanager
+    def secao(self, nome, entrada=None):
+        secao = self.iniciar(nome, entrada)
+        try:
+            yield secao
+        except BaseException as erro:
+            secao.erro = repr(erro)
+            raise
+        finally:
+            self.encerrar(secao)
+
+    # Gravando os eventos ainda não gravados (no formato do Chrome, o arquivo inteiro, uma única vez)
+    def fechar(self):
+        if self.ativo and self.formato == 'chrome' and self.pendentes:
+            self.gravar_chrome()
+            self.pendentes = False
+
+    # Gravando todos os eventos no formato de trace do Chrome (eventos completos, 'ph': 'X', em microssegundos)
+    def gravar_chrome(self):
+        eventos = []
+        for evento in self.eventos:
+            argumentos = {chave: valor for chave, valor in evento.items()
+                          if chave not in ('nome', 'inicio', 'duracao_s', 'pid', 'tid')}
+            eventos.append({
+                'name': evento['nome'],
+                'cat': 'ice',
+                'ph': 'X',
+                'ts': evento['inicio'] * 1e6,
+                'dur': evento['duracao_s'] * 1e6,
+                'pid': evento['pid'],
+                'tid': evento['tid'],
+                'args': argumentos,
+            })
+        self.arquivo.parent.mkdir(parents=True, exist_ok=True)
+        temporario = self.arquivo.with_suffix(f'.tmp{self.pid}')
+        temporario.write_text(json.dumps({'traceEvents': eventos, 'displayTimeUnit': 'ms'}))
+        os.replace(temporario, self.arquivo)
@@ -0,0 +1,253 @@
+# # Ingestão de vários arquivos particionada por ano
+
+# Os dados de produção chegam em vários arquivos CSV (por região e por mês), e não em um único 'games.csv'. Aqui
+# os arquivos de um diretório ou de um padrão glob são lidos e validados (com 'validacao.py') em paralelo por
+# um pool de threads, limpos juntos com 'limpar_jogos' e gravados em uma partição por ano de lançamento
+# ('ano=2014.parquet', ...). O arquivo 'particoes.json' registra o ano, o número de linhas e o tamanho de cada
+# partição, as categorias de plataforma, gênero e classificação e os arquivos de origem (com o hash do
+# conteúdo, para que a mesma ingestão não seja refeita).
+#
+# As leituras por período (a janela de 2012 a 2016 e as plataformas com lançamentos antes de 1995) abrem
+# apenas as partições dos anos pedidos, escolhidas pelos metadados, sem ler as demais.
+#
+# Exemplo:
+#     python particoes.py 'vendas/*.csv' --saida particoes_ice
+#     python particoes.py vendas/ --saida particoes_ice --ano-inicio 2012 --ano-fim 2016
+
+import argparse
+import glob
+import json
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import pandas as pd
+
+from carregamento import COLUNAS_CATEGORICAS, TIPOS_COLUNAS, VERSAO_LIMPEZA, _formato_cache, hash_arquivo, limpar_jogos
+from validacao import gravar_quarentena, ler_validado
+
+
+ARQUIVO_METADADOS = 'particoes.json'
+ARQUIVO_QUARENTENA = 'quarentena.csv'
+
+
+# ## Ingestão
+
+# Arquivos CSV de cada origem: um diretório (todos os '.csv' dele), um padrão glob ou um arquivo
+def listar_arquivos(origens):
+    if isinstance(origens, (str, Path)):
+        origens = [origens]
+    arquivos = []
+    for origem in map(str, origens):
+        if Path(origem).is_dir():
+            arquivos += sorted(str(arquivo) for arquivo in Path(origem).glob('*.csv'))
+        elif glob.has_magic(origem):
+            arquivos += sorted(glob.glob(origem))
+        else:
+            arquivos.append(origem)
+    if not arquivos:
+        raise ValueError(f'Nenhum arquivo CSV encontrado em: {", ".join(map(str, origens))}')
+    return list(dict.fromkeys(arquivos))
+
+
+# Lendo e validando os arquivos em um pool de threads (a leitura do CSV e a conversão das colunas liberam o GIL
+# na maior parte do tempo) e limpando o conjunto. As categorias de cada arquivo são diferentes, então as
+# colunas categóricas são reconstruídas depois da concatenação. Retorna os dados limpos e o número de linhas
+# rejeitadas de cada arquivo
+def ler_arquivos(arquivos, threads=None, arquivo_quarentena=None):
+    def ler(arquivo):
+        jogos, rejeitadas, _ = ler_validado(arquivo)
+        return jogos, rejeitadas
+
+    with ThreadPoolExecutor(threads) as pool:
+        lidos = list(pool.map(ler, arquivos))
+
+    # A quarentena é gravada aqui, e não nas threads, para que as linhas de arquivos diferentes não se misturem
+    if arquivo_quarentena is not None:
+        for arquivo, (_, rejeitadas) in zip(arquivos, lidos):
+            gravar_quarentena(rejeitadas, arquivo_quarentena, origem=Path(arquivo).resolve())
+
+    dados = pd.concat([jogos for jogos, _ in lidos], ignore_index=True)
+    dados = dados.astype({coluna: TIPOS_COLUNAS[coluna] for coluna in ['Platform', 'Genre', 'Rating']})
+    rejeitadas = {arquivo: int(len(rejeitadas)) for arquivo, (_, rejeitadas) in zip(arquivos, lidos)}
+    return limpar_jogos(dados), rejeitadas
+
+
+def _ler_arquivo(arquivo, formato):
+    return pd.read_parquet(arquivo) if formato == 'parquet' else pd.read_pickle(arquivo)
+
+
+def _gravar_arquivo(dados, arquivo, formato):
+    if formato == 'parquet':
+        dados.to_parquet(arquivo, index=False)
+    else:
+        dados.to_pickle(arquivo)
+
+
+# Gravando os dados limpos em uma partição por ano. O diretório é montado em um temporário e renomeado no final,
+# para que uma gravação interrompida não deixe partições de ingestões diferentes misturadas
+def gravar_particoes(games, diretorio, origens=(), threads=None):
+    diretorio = Path(diretorio)
+    formato = _formato_cache()
+    temporario = diretorio.with_name(f'{diretorio.name}.tmp{os.getpid()}')
+    temporario.mkdir(parents=True, exist_ok=True)
+
+    partes = {int(ano): parte for ano, parte in games.groupby('year_of_release', sort=True)}
+    nomes = {ano: f'ano={ano}.{formato}' for ano in partes}
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda ano: _gravar_arquivo(partes[ano], temporario / nomes[ano], formato), partes))
+
+    metadados = {
+        'versao_limpeza': VERSAO_LIMPEZA,
+        'formato': formato,
+        'linhas': int(len(games)),
+        'categorias': {coluna: [str(c) for c in games[coluna].cat.categories] for coluna in COLUNAS_CATEGORICAS},
+        'particoes': [
+            {'ano': ano, 'arquivo': nomes[ano], 'linhas': int(len(partes[ano])),
+             'bytes': (temporario / nomes[ano]).stat().st_size}
+            for ano in partes
+        ],
+        'origens': list(origens),
+    }
+    (temporario / ARQUIVO_METADADOS).write_text(json.dumps(metadados, indent=1, ensure_ascii=False))
+    if diretorio.exists():
+        shutil.rmtree(diretorio)
+    os.replace(temporario, diretorio)
+    return metadados
+
+
+def ler_metadados(diretorio):
+    metadados = json.loads((Path(diretorio) / ARQUIVO_METADADOS).read_text())
+    if metadados['versao_limpeza'] != VERSAO_LIMPEZA:
+        raise ValueError(f'Partições gravadas com a versão {metadados["versao_limpeza"]} da limpeza '
+                         f'(atual: {VERSAO_LIMPEZA}); faça a ingestão novamente')
+    return metadados
+
+
+# Ingerindo os arquivos das origens no diretório de partições. Se os mesmos arquivos (mesmo conteúdo) já foram
+# ingeridos, as partições existentes são mantidas. As linhas rejeitadas vão para 'quarentena.csv', ao lado
+# do diretório de partições
+def ingerir(origens, diretorio, threads=None):
+    arquivos = listar_arquivos(origens)
+    with ThreadPoolExecutor(threads) as pool:
+        hashes = list(pool.map(hash_arquivo, arquivos))
+    registros = [{'arquivo': str(Path(arquivo).resolve()), 'hash': h} for arquivo, h in zip(arquivos, hashes)]
+
+    diretorio = Path(diretorio)
+    if (diretorio / ARQUIVO_METADADOS).exists():
+        try:
+            metadados = ler_metadados(diretorio)
+        except ValueError:
+            metadados = None
+        ingeridos = [(registro['arquivo'], registro['hash']) for registro in (metadados or {}).get('origens', [])]
+        if metadados is not None and ingeridos == [(registro['arquivo'], registro['hash']) for registro in registros]:
+            return metadados, None
+
+    # A quarentena corresponde à ingestão atual: a da ingestão anterior é descartada antes da leitura
+    arquivo_quarentena = diretorio.with_name(f'{diretorio.name}_{ARQUIVO_QUARENTENA}')
+    arquivo_quarentena.unlink(missing_ok=True)
+    games, rejeitadas = ler_arquivos(arquivos, threads, arquivo_quarentena)
+    for registro, arquivo in zip(registros, arquivos):
+        registro['rejeitadas'] = rejeitadas[arquivo]
+    return gravar_particoes(games, diretorio, registros, threads), games
+
+
+# ## Leitura com poda das partições
+
+# Partições dos anos entre 'ano_inicio' e 'ano_fim' (inclusive; None deixa o lado aberto), escolhidas apenas
+# pelos metadados
+def selecionar_particoes(metadados, ano_inicio=None, ano_fim=None):
+    return [
+        particao for particao in metadados['particoes']
+        if (ano_inicio is None or particao['ano'] >= ano_inicio) and (ano_fim is None or particao['ano'] <= ano_fim)
+    ]
+
+
+# DataFrame vazio com as colunas e os tipos dos dados limpos (a limpeza aplicada a um arquivo sem linhas)
+def _jogos_vazio():
+    return limpar_jogos(pd.DataFrame({coluna: pd.Series(dtype=tipo) for coluna, tipo in TIPOS_COLUNAS.items()}))
+
+
+# Lendo apenas as partições do período. As colunas categóricas voltam com as categorias do conjunto completo
+# (as mesmas de 'carregar_jogos'); as linhas ficam ordenadas por ano
+def ler_particoes(diretorio, ano_inicio=None, ano_fim=None, threads=None):
+    diretorio = Path(diretorio)
+    metadados = ler_metadados(diretorio)
+    selecionadas = selecionar_particoes(metadados, ano_inicio, ano_fim)
+
+    with ThreadPoolExecutor(threads) as pool:
+        partes = list(pool.map(lambda p: _ler_arquivo(diretorio / p['arquivo'], metadados['formato']), selecionadas))
+    # Nenhuma partição no período (ou nenhuma linha válida na ingestão): o resultado é vazio, com o mesmo esquema
+    if not partes:
+        partes = [_jogos_vazio()]
+
+    games = pd.concat(partes, ignore_index=True)
+    for coluna, categorias in metadados['categorias'].items():
+        games[coluna] = pd.Categorical(games[coluna].astype(str), categories=categorias)
+    return games
+
+
+# Janela de análise de 'ice.py' (games.query('2012 <= year_of_release <= 2016')), lendo só as suas partições
+def ler_janela(diretorio, ano_inicio=2012, ano_fim=2016, threads=None):
+    return ler_particoes(diretorio, ano_inicio, ano_fim, threads)
+
+
+# Lançamentos antes do ano de corte (filtro das plataformas antigas de 'ice.py'), lendo só as suas partições
+def ler_antes_de(diretorio, ano_corte=1995, threads=None):
+    return ler_particoes(diretorio, None, ano_corte - 1, threads)
+
+
+# Quanto da base é lido no período: partições, linhas e bytes lidos e os totais
+def volume_lido(metadados, ano_inicio=None, ano_fim=None):
+    selecionadas = selecionar_particoes(metadados, ano_inicio, ano_fim)
+    return {
+        'particoes': len(selecionadas),
+        'particoes_total': len(metadados['particoes']),
+        'linhas': sum(p['linhas'] for p in selecionadas),
+        'linhas_total': metadados['linhas'],
+        'bytes': sum(p['bytes'] for p in selecionadas),
+        'bytes_total': sum(p['bytes'] for p in metadados['particoes']),
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Ingere vários arquivos de vendas em partições por ano.')
+    parser.add_argument('origens', nargs='+', help='diretórios, padrões glob ou arquivos CSV de vendas')
+    parser.add_argument('--saida', required=True, help='diretório das partições')
+    parser.add_argument('--threads', type=int, help='threads da leitura e da gravação')
+    parser.add_argument('--ano-inicio', type=int, default=2012, help='primeiro ano da janela de análise')
+    parser.add_argument('--ano-fim', type=int, default=2016, help='último ano da janela de análise')
+    parser.add_argument('--ano-corte', type=int, default=1995, help='plataformas antigas: lançamentos antes deste ano')
+    parser.add_argument('--limite-vendas-baixas', type=float, default=1.0, help='vendas totais consideradas muito baixas')
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    metadados, games = ingerir(args.origens, args.saida, args.threads)
+    if games is None:
+        print(f'{len(metadados["origens"])} arquivos já ingeridos em {args.saida}')
+    else:
+        rejeitadas = sum(registro['rejeitadas'] for registro in metadados['origens'])
+        print(f'{len(metadados["origens"])} arquivos, {metadados["linhas"]} linhas em {len(metadados["particoes"])} '
+              f'partições ({rejeitadas} linhas rejeitadas) em {time.perf_counter() - inicio:.3f} s')
+
+    for descricao, anos, leitura in [
+        (f'Janela {args.ano_inicio}-{args.ano_fim}', (args.ano_inicio, args.ano_fim),
+         lambda: ler_janela(args.saida, args.ano_inicio, args.ano_fim, args.threads)),
+        (f'Antes de {args.ano_corte}', (None, args.ano_corte - 1),
+         lambda: ler_antes_de(args.saida, args.ano_corte, args.threads)),
+    ]:
+        inicio = time.perf_counter()
+        dados = leitura()
+        segundos = time.perf_counter() - inicio
+        volume = volume_lido(metadados, *anos)
+        print(f'{descricao}: {volume["particoes"]}/{volume["particoes_total"]} partições, '
+              f'{volume["linhas"]}/{volume["linhas_total"]} linhas, '
+              f'{volume["bytes"] / 2 ** 20:.2f}/{volume["bytes_total"] / 2 ** 20:.2f} MB lidos em {segundos:.3f} s')
+
+        vendas = dados.groupby('platform', observed=True)['total_sales'].sum().sort_values(ascending=False)
+        if anos[0] is None:
+            print(f'    plataformas com vendas muito baixas: {list(vendas[vendas < args.limite_vendas_baixas].index)}')
+        else:
+            print(f'    plataformas líderes: {vendas.head(5).round(2).to_dict()}')
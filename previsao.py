@@ -0,0 +1,273 @@
+# # Previsão das vendas de 2017
+
+# O objetivo de 'ice.py' é planejar a campanha de 2017. Este módulo prevê as vendas do ano seguinte ao período
+# de análise para todas as séries anuais de uma vez (cada linha de uma matriz de 'tendencias.py': plataformas,
+# gêneros, regiões ou combinações entre eles), com três modelos simples:
+# - tendência linear, ajustada por mínimos quadrados com as somas de todas as séries calculadas de uma vez;
+# - suavização exponencial de Holt (nível e tendência), com os parâmetros escolhidos por busca em grade,
+#   executada para todas as séries e todas as combinações de parâmetros ao mesmo tempo;
+# - ciclo de vida: decaimento exponencial (log-linear) das vendas de cada plataforma, que não pode crescer depois
+#   do tempo de vida típico das plataformas e zera depois do tempo de vida máximo.
+# Cada previsão vem com um intervalo de previsão, e a validação prevê os últimos anos do período a partir dos
+# anteriores (a cobertura medida ali mostra se o nível nominal dos intervalos se confirma).
+#
+# Os modelos linear e de Holt são ajustados a log(1 + vendas), e a previsão e os limites do intervalo são
+# calculados nessa escala e só então convertidos para vendas (exp(x) - 1). Como a conversão é monotônica, o
+# intervalo continua sendo um intervalo de previsão do mesmo nível, e a previsão convertida é a mediana prevista.
+# Na escala das vendas, a tendência fica multiplicativa (uma série em queda se aproxima de 0 sem ficar negativa) e
+# o intervalo é assimétrico: o limite inferior não é cortado em 0 e o superior cresce com a incerteza do ajuste.
+# Os anos antes da primeira venda de cada série (como 2012 para PS4 e XOne) ficam fora dos ajustes.
+
+import numpy as np
+import pandas as pd
+
+from cubo import COLUNAS_SOMA
+from importacao import importar_sob_demanda
+from tendencias import matriz_anual
+
+
+stats = importar_sob_demanda('scipy.stats')
+
+MODELOS = ['linear', 'holt', 'ciclo_vida']
+GRADE_HOLT = np.linspace(0.1, 0.9, 9)
+
+# Com 3 anos de vendas resta 1 grau de liberdade para o desvio dos resíduos, e o quantil t (6,3 para 90%) torna o
+# intervalo inútil: o intervalo só é calculado a partir deste número de anos usados no ajuste, e caso contrário os
+# limites ficam NaN
+ANOS_MINIMOS_INTERVALO = 4
+
+
+# Matriz com uma linha para cada combinação de região e das dimensões pedidas (por exemplo, plataforma e gênero)
+def matriz_series(cubo, dimensoes=('platform',), colunas=COLUNAS_SOMA, anos=None):
+    matrizes = {coluna: matriz_anual(cubo, list(dimensoes), coluna, anos=anos) for coluna in colunas}
+    matriz = pd.concat(matrizes, names=['regiao'])
+    return matriz.fillna(0)
+
+
+# Ano de lançamento de cada plataforma e tempos de vida típico (mediana) e máximo (quantil de 90%), como em 'ice.py'
+def estatisticas_ciclo_vida(cubo, quantil_maximo=0.9):
+    anos = cubo.groupby('platform', observed=True)['year_of_release'].agg(['min', 'max'])
+    anos.index = anos.index.astype(str)
+    tempo_vida_plataformas = anos['max'] - anos['min']
+    return {
+        'lancamento': anos['min'],
+        'ultimo_ano': anos['max'],
+        'vida_tipica': float(tempo_vida_plataformas.median()),
+        'vida_maxima': float(tempo_vida_plataformas.quantile(quantil_maximo)),
+    }
+
+
+# Quantil da distribuição t para o intervalo bilateral de nível 'nivel' (normal quando os graus de liberdade
+# não são positivos)
+def _quantil(nivel, graus_liberdade):
+    graus_liberdade = np.asarray(graus_liberdade, dtype='float64')
+    return np.where(graus_liberdade > 0, stats.t.ppf(0.5 + nivel / 2, np.maximum(graus_liberdade, 1)),
+                    stats.norm.ppf(0.5 + nivel / 2))
+
+
+# ## Modelos
+# Cada modelo recebe a matriz de valores (séries x anos), os anos e o ano da previsão, e retorna três vetores:
+# previsão, limite inferior e limite superior
+
+# Primeiro ano (posição) com vendas de cada série: os anos anteriores são de antes do lançamento da plataforma
+# ou do gênero nela, e não vendas nulas, então ficam fora do ajuste (len(anos) nas séries sem vendas)
+def _inicio_vendas(valores):
+    positivos = valores > 0
+    return np.where(positivos.any(axis=1), positivos.argmax(axis=1), valores.shape[1])
+
+
+# Nas séries sem nenhuma venda não há modelo ajustado: a previsão é 0 e o intervalo fica NaN
+def _sem_vendas(valores, resultado):
+    sem_vendas = ~(valores > 0).any(axis=1)
+    previsao, inferior, superior = resultado
+    return np.where(sem_vendas, 0.0, previsao), np.where(sem_vendas, np.nan, inferior), np.where(sem_vendas, np.nan, superior)
+
+
+# Reta ajustada a 'y' nos anos da máscara de cada série (mínimos quadrados ponderados pela máscara, com as somas
+# calculadas para todas as séries de uma vez), com o intervalo de previsão para 't_alvo'. Nas séries de
+# 'limitar', a inclinação é limitada a 0 (o desvio dos resíduos continua sendo o da reta sem a restrição)
+def _reta_mascarada(y, mascara, t, t_alvo, nivel, limitar=None):
+    mascara = mascara.astype('float64')
+    y = np.where(mascara > 0, y, 0.0)
+    n = mascara.sum(axis=1)
+    soma_t = mascara @ t
+    soma_tt = mascara @ t ** 2
+    soma_y = (mascara * y).sum(axis=1)
+    soma_ty = (mascara * y) @ t
+    with np.errstate(divide='ignore', invalid='ignore'):
+        denominador = n * soma_tt - soma_t ** 2
+        inclinacao = np.where(denominador > 0, (n * soma_ty - soma_t * soma_y) / denominador, 0.0)
+        intercepto = (soma_y - inclinacao * soma_t) / n
+
+    residuos = mascara * (y - (intercepto[:, None] + inclinacao[:, None] * t))
+    graus_liberdade = n - 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma = np.where(n >= ANOS_MINIMOS_INTERVALO, np.sqrt((residuos ** 2).sum(axis=1) / graus_liberdade), np.nan)
+
+    if limitar is not None:
+        inclinacao = np.where(limitar, np.minimum(inclinacao, 0.0), inclinacao)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            intercepto = (soma_y - inclinacao * soma_t) / n
+
+    # Margem do intervalo de previsão, com a alavanca do ano previsto (distância à média dos anos usados)
+    previsao = intercepto + inclinacao * t_alvo
+    with np.errstate(divide='ignore', invalid='ignore'):
+        alavanca = 1 / n + n * (t_alvo - soma_t / n) ** 2 / denominador
+    margem = _quantil(nivel, graus_liberdade) * sigma * np.sqrt(1 + alavanca)
+    return previsao, previsao - margem, previsao + margem
+
+
+# Tendência linear: reta ajustada a log(1 + vendas) de cada série, a partir do primeiro ano com vendas
+def prever_linear(valores, anos, ano_alvo, nivel=0.9):
+    t = np.asarray(anos, dtype='float64') - anos[0]
+    mascara = np.arange(len(t))[None, :] >= _inicio_vendas(valores)[:, None]
+    resultado = _reta_mascarada(np.log1p(valores), mascara, t, ano_alvo - anos[0], nivel)
+    return _sem_vendas(valores, tuple(np.expm1(v) for v in resultado))
+
+
+# Holt (nível e tendência atualizados por suavização exponencial), ajustado a log(1 + vendas) a partir do primeiro
+# ano com vendas de cada série. As recursões são feitas ano a ano sobre um array (parâmetros x séries), e cada
+# série fica com a combinação (alfa, beta) de menor erro quadrático
+def prever_holt(valores, anos, ano_alvo, nivel=0.9, grade=GRADE_HOLT):
+    if valores.shape[1] < 3:
+        raise ValueError('O modelo de Holt precisa de pelo menos 3 anos')
+    inicio = _inicio_vendas(valores)
+    ultimo = valores.shape[1] - 1
+    log_valores = np.log1p(valores)
+    alfas, betas = [g.ravel()[:, None] for g in np.meshgrid(grade, grade, indexing='ij')]
+
+    # Nível e tendência iniciais: o primeiro ano com vendas e a variação até o ano seguinte
+    colunas = np.arange(len(valores))
+    primeiro = log_valores[colunas, np.minimum(inicio, ultimo)]
+    segundo = log_valores[colunas, np.minimum(inicio + 1, ultimo)]
+    nivel_atual = np.broadcast_to(primeiro, (len(alfas), len(valores))).copy()
+    tendencia = np.broadcast_to(segundo - primeiro, (len(alfas), len(valores))).copy()
+    erro_quadratico = np.zeros((len(alfas), len(valores)))
+    for t in range(1, valores.shape[1]):
+        esperado = nivel_atual + tendencia
+        erro_quadratico += np.where(t > inicio + 1, (log_valores[:, t] - esperado) ** 2, 0.0)
+        novo_nivel = alfas * log_valores[:, t] + (1 - alfas) * esperado
+        ativa = t > inicio
+        tendencia = np.where(ativa, betas * (novo_nivel - nivel_atual) + (1 - betas) * tendencia, tendencia)
+        nivel_atual = np.where(ativa, novo_nivel, nivel_atual)
+
+    melhor = erro_quadratico.argmin(axis=0)
+    alfa, beta = alfas[melhor, 0], betas[melhor, 0]
+    h = ano_alvo - anos[-1]
+    previsao = nivel_atual[melhor, colunas] + h * tendencia[melhor, colunas]
+
+    # Variância do erro de previsão h passos à frente do modelo de Holt aditivo
+    graus_liberdade = valores.shape[1] - inicio - 2
+    with np.errstate(divide='ignore', invalid='ignore'):
+        sigma2 = np.where(graus_liberdade + 2 >= ANOS_MINIMOS_INTERVALO,
+                          erro_quadratico[melhor, colunas] / graus_liberdade, np.nan)
+    fator = 1 + sum((alfa * (1 + j * beta)) ** 2 for j in range(1, h))
+    margem = _quantil(nivel, graus_liberdade) * np.sqrt(sigma2 * fator)
+    return _sem_vendas(valores, tuple(np.expm1(v) for v in (previsao, previsao - margem, previsao + margem)))
+
+
+# Ciclo de vida: reta ajustada ao logaritmo das vendas positivas de cada série. A inclinação é limitada a 0
+# quando a plataforma já passou do tempo de vida típico, e a previsão é 0 quando ela passou do tempo de vida
+# máximo ou não teve vendas no último ano. Plataformas que já vivem mais que o máximo e seguem vendendo (como PC)
+# e séries sem plataforma não têm essas restrições
+def prever_ciclo_vida(valores, anos, ano_alvo, nivel=0.9, lancamento=None, vida_tipica=np.inf, vida_maxima=np.inf,
+                      perene=None):
+    t = np.asarray(anos, dtype='float64') - anos[0]
+    mascara = valores > 0
+
+    sem_restricao = np.ones(len(valores), dtype=bool) if lancamento is None else np.isnan(lancamento)
+    if perene is not None:
+        sem_restricao |= perene
+    idade = ano_alvo - (np.asarray(lancamento, dtype='float64') if lancamento is not None else np.nan)
+    resultado = _reta_mascarada(np.log(np.where(mascara, valores, 1.0)), mascara, t, ano_alvo - anos[0], nivel,
+                                limitar=~sem_restricao & (idade >= vida_tipica))
+
+    encerradas = ~mascara.any(axis=1) | (valores[:, -1] <= 0) | (~sem_restricao & (idade > vida_maxima))
+    return tuple(np.where(encerradas, 0.0, np.exp(v)) for v in resultado)
+
+
+# ## Previsão e validação
+
+# Argumentos do modelo de ciclo de vida para as linhas da matriz (a partir do nível 'platform' do índice, se houver)
+def _argumentos_ciclo_vida(matriz, ciclo):
+    if ciclo is None or 'platform' not in (matriz.index.names or []):
+        return {}
+    plataformas = matriz.index.get_level_values('platform').astype(str)
+    lancamento = ciclo['lancamento'].reindex(plataformas).to_numpy(dtype='float64')
+    tempo_vida = (ciclo['ultimo_ano'] - ciclo['lancamento']).reindex(plataformas).to_numpy(dtype='float64')
+    return {
+        'lancamento': lancamento,
+        'vida_tipica': ciclo['vida_tipica'],
+        'vida_maxima': ciclo['vida_maxima'],
+        'perene': tempo_vida > ciclo['vida_maxima'],
+    }
+
+
+def _prever_valores(valores, anos, ano_alvo, nivel, modelos, argumentos_ciclo):
+    resultados = {}
+    for modelo in modelos:
+        if modelo == 'linear':
+            resultados[modelo] = prever_linear(valores, anos, ano_alvo, nivel)
+        elif modelo == 'holt':
+            resultados[modelo] = prever_holt(valores, anos, ano_alvo, nivel)
+        elif modelo == 'ciclo_vida':
+            resultados[modelo] = prever_ciclo_vida(valores, anos, ano_alvo, nivel, **argumentos_ciclo)
+        else:
+            raise ValueError(f'Modelo desconhecido: {modelo} (use um de {MODELOS})')
+    # Vendas não podem ser negativas
+    return {modelo: tuple(np.clip(v, 0, None) for v in vetores) for modelo, vetores in resultados.items()}
+
+
+# Previsões para o ano seguinte ao último ano da matriz (ou 'ano_alvo'): uma linha por série, com as colunas
+# '{modelo}', '{modelo}_inf' e '{modelo}_sup' para cada modelo
+def prever(matriz, ano_alvo=None, modelos=MODELOS, nivel=0.9, ciclo=None):
+    anos = matriz.columns.to_numpy(dtype='int64')
+    ano_alvo = int(anos[-1]) + 1 if ano_alvo is None else ano_alvo
+    valores = np.nan_to_num(matriz.to_numpy(dtype='float64'))
+
+    resultados = _prever_valores(valores, anos, ano_alvo, nivel, modelos, _argumentos_ciclo_vida(matriz, ciclo))
+    colunas = {}
+    for modelo, (previsao, inferior, superior) in resultados.items():
+        colunas[modelo] = previsao
+        colunas[f'{modelo}_inf'] = inferior
+        colunas[f'{modelo}_sup'] = superior
+    previsoes = pd.DataFrame(colunas, index=matriz.index)
+    previsoes.columns.name = ano_alvo
+    return previsoes
+
+
+# Validação com origem móvel: cada um dos últimos 'anos_teste' anos é previsto a partir dos anos anteriores a ele
+# (com pelo menos 'anos_minimos' anos de treino). Retorna, por modelo, o erro absoluto médio, a raiz do erro
+# quadrático médio, o erro percentual ponderado (soma dos erros absolutos / soma das vendas) e a cobertura dos
+# intervalos, calculada nas séries com intervalo ('com_intervalo'; NaN quando nenhuma tem)
+def validar(matriz, anos_teste=2, modelos=MODELOS, nivel=0.9, ciclo=None, anos_minimos=3):
+    anos = matriz.columns.to_numpy(dtype='int64')
+    valores = np.nan_to_num(matriz.to_numpy(dtype='float64'))
+    argumentos_ciclo = _argumentos_ciclo_vida(matriz, ciclo)
+
+    erros = {modelo: [] for modelo in modelos}
+    for fim in range(len(anos) - anos_teste, len(anos)):
+        if fim < anos_minimos:
+            continue
+        observado = valores[:, fim]
+        resultados = _prever_valores(valores[:, :fim], anos[:fim], int(anos[fim]), nivel, modelos, argumentos_ciclo)
+        for modelo, (previsao, inferior, superior) in resultados.items():
+            # Séries sem intervalo (limites NaN) ficam fora da cobertura
+            dentro = np.where(np.isnan(inferior) | np.isnan(superior), np.nan,
+                              (observado >= inferior) & (observado <= superior))
+            erros[modelo].append((int(anos[fim]), observado, previsao, dentro))
+
+    linhas = []
+    for modelo, registros in erros.items():
+        for ano, observado, previsao, dentro in registros:
+            erro = previsao - observado
+            linhas.append({
+                'modelo': modelo,
+                'ano': ano,
+                'mae': np.abs(erro).mean(),
+                'rmse': np.sqrt((erro ** 2).mean()),
+                'wape': np.abs(erro).sum() / observado.sum() if observado.sum() > 0 else np.nan,
+                'cobertura': np.nanmean(dentro) if not np.isnan(dentro).all() else np.nan,
+                'com_intervalo': int((~np.isnan(dentro)).sum()),
+            })
+    return pd.DataFrame(linhas)
@@ -0,0 +1,228 @@
+# # Relatório em lote (sem interface gráfica)
+
+# Gera todas as figuras de 'ice.py' diretamente em arquivos, com o backend Agg do matplotlib, sem chamar
+# plt.show(). Os agregados são calculados uma única vez (a partir do cubo) e cada figura é construída em
+# paralelo em um pool de processos. O resultado é um único arquivo HTML com as figuras embutidas e o tempo
+# de renderização de cada uma.
+
+import argparse
+import base64
+import html
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import matplotlib
+matplotlib.use('Agg')
+
+import matplotlib.pyplot as plt
+import numpy as np
+import seaborn as sns
+
+from carregamento import carregar_jogos
+from cubo import construir_cubo, agregar_cubo
+from densidade import figura_densidade, figura_pequenos_multiplos, histogramas
+from esbocos import EsbocoQuantis, atualizar_por_grupo, desenhar_caixas, estatisticas_caixa
+
+
+REGIOES = {
+    'na_sales': ('América do Norte', 'Blues'),
+    'eu_sales': ('Europa', 'Reds'),
+    'jp_sales': ('Japão', 'Greens'),
+}
+
+
+# ## Funções de cada tipo de figura
+# Todas recebem os dados já agregados (pequenos), para que o envio aos processos seja barato
+
+def figura_barras(serie, titulo, xlabel, ylabel, cor='skyblue'):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    serie.plot(kind='bar', color=cor, ax=ax)
+    ax.set_title(titulo)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    return fig
+
+
+def figura_barras_sns(serie, titulo, xlabel, ylabel, paleta='viridis', rotacionar=False, figsize=(10, 6)):
+    fig, ax = plt.subplots(figsize=figsize)
+    x = serie.index.astype(str)
+    sns.barplot(x=x, y=serie.values, hue=x, order=x, palette=paleta, legend=False, ax=ax)
+    ax.set_title(titulo)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel(ylabel)
+    if rotacionar:
+        plt.setp(ax.get_xticklabels(), rotation=45, ha='right')
+    return fig
+
+
+def figura_generos(vendas_por_genero, titulo):
+    fig = figura_barras_sns(vendas_por_genero, titulo, 'Gênero', 'Vendas Globais (milhões)', rotacionar=True, figsize=(12, 6))
+    participacao_percentual = vendas_por_genero / vendas_por_genero.sum() * 100
+    ax2 = fig.axes[0].twinx()
+    ax2.set_ylabel('Participação Percentual (%)', color='red')
+    ax2.plot(vendas_por_genero.index.astype(str), participacao_percentual.values, color='red', marker='o', linestyle='dashed')
+    return fig
+
+
+# O diagrama de caixa é desenhado a partir das estatísticas de 'esbocos.estatisticas_caixa' (quantis dos
+# esboços de cada plataforma), e não das vendas de todos os jogos
+def figura_caixa(estatisticas, titulo):
+    fig, ax = plt.subplots(figsize=(15, 8))
+    desenhar_caixas(ax, estatisticas)
+    ax.set_title(titulo)
+    ax.set_xlabel('Plataforma')
+    ax.set_ylabel('Vendas Globais (milhões)')
+    return fig
+
+
+def figura_dispersao(x, y, titulo, xlabel, cor):
+    fig, ax = plt.subplots(figsize=(10, 6))
+    ax.scatter(x, y, color=cor, alpha=0.5)
+    ax.set_title(titulo)
+    ax.set_xlabel(xlabel)
+    ax.set_ylabel('Vendas Totais (milhões)')
+    return fig
+
+
+# Renderizando uma figura em PNG (executado nos processos do pool)
+def renderizar(nome, funcao, kwargs, dir_saida):
+    inicio = time.perf_counter()
+    fig = funcao(**kwargs)
+    arquivo = Path(dir_saida) / f'{nome}.png'
+    fig.savefig(arquivo, dpi=100, bbox_inches='tight')
+    plt.close(fig)
+    return nome, str(arquivo), time.perf_counter() - inicio
+
+
+# ## Montagem das figuras a partir dos dados
+
+# Calculando os agregados e montando a lista de figuras: (nome, função, argumentos). Com dispersao='densidade',
+# as avaliações x vendas são enviadas aos processos já contadas em grades (de tamanho fixo), e não os pontos
+def montar_figuras(games, janela=(2012, 2016), top_n=5, dispersao='densidade'):
+    cubo = construir_cubo(games)
+    figuras = []
+
+    contagem_por_ano = agregar_cubo(cubo, 'year_of_release', estatistica='contagem').sort_index()
+    figuras.append(('lancamentos_por_ano', figura_barras, dict(
+        serie=contagem_por_ano, titulo='Número de Jogos Lançados por Ano',
+        xlabel='Ano de Lançamento', ylabel='Número de Jogos')))
+
+    top_plataformas = agregar_cubo(cubo, 'platform').sort_values(ascending=False).head(top_n)
+    vendas_por_ano_top = agregar_cubo(cubo, 'year_of_release', platform=top_plataformas.index)
+    figuras.append(('vendas_por_ano_top_plataformas', figura_barras, dict(
+        serie=vendas_por_ano_top, titulo=f'Vendas Totais por Ano (Top {top_n} Plataformas)',
+        xlabel='Ano de Lançamento', ylabel='Vendas Totais (milhões)', cor='C0')))
+
+    inicio, fim = janela
+    games_novo = games[(games['year_of_release'] >= inicio) & (games['year_of_release'] <= fim)]
+    plataformas = list(games_novo['platform'].cat.remove_unused_categories().cat.categories)
+    esbocos = atualizar_por_grupo({}, games_novo['platform'], games_novo['total_sales'], EsbocoQuantis)
+    figuras.append(('caixa_plataformas', figura_caixa, dict(
+        estatisticas=estatisticas_caixa(esbocos, plataformas),
+        titulo='Diagrama de Caixa das Vendas Globais por Plataforma')))
+
+    for plataforma, origem in [('PS4', games_novo), ('XOne', games)]:
+        mascara = ((origem['platform'] == plataforma) & origem['is_rated']).to_numpy()
+        for coluna, rotulo, cor in [('user_score', 'Usuário', 'blue'), ('critic_score', 'Crítico', 'red')]:
+            x = origem[coluna].to_numpy(dtype='float64', na_value=np.nan)[mascara]
+            y = origem['total_sales'].to_numpy()[mascara]
+            titulo = f'Avaliação de {rotulo} vs. Vendas Totais ({plataforma})'
+            if dispersao == 'pontos':
+                figuras.append((f'dispersao_{coluna}_{plataforma}', figura_dispersao, dict(
+                    x=x, y=y, titulo=titulo, xlabel=f'Avaliação de {rotulo}', cor=cor)))
+            else:
+                contagens, _, bordas_x, bordas_y = histogramas(x, y, log_y=True)
+                figuras.append((f'dispersao_{coluna}_{plataforma}', figura_densidade, dict(
+                    contagens=contagens[0], bordas_x=bordas_x, bordas_y=bordas_y, titulo=titulo,
+                    xlabel=f'Avaliação de {rotulo}', log_y=True, cmap='Blues' if cor == 'blue' else 'Reds')))
+
+    # Com a dispersão por densidade, também as avaliações x vendas de todas as plataformas em pequenos múltiplos
+    if dispersao == 'densidade':
+        avaliados = games_novo[games_novo['is_rated'].to_numpy()]
+        for coluna, rotulo in [('user_score', 'Usuário'), ('critic_score', 'Crítico')]:
+            contagens, plataformas, bordas_x, bordas_y = histogramas(
+                avaliados[coluna], avaliados['total_sales'], avaliados['platform'], log_y=True)
+            figuras.append((f'densidade_{coluna}_plataformas', figura_pequenos_multiplos, dict(
+                contagens=contagens, grupos=plataformas, bordas_x=bordas_x, bordas_y=bordas_y,
+                titulo=f'Avaliação de {rotulo} vs. Vendas Totais por Plataforma', xlabel=f'Avaliação de {rotulo}',
+                log_y=True)))
+
+    vendas_por_genero = agregar_cubo(cubo, 'genre', anos=janela).sort_values(ascending=False)
+    figuras.append(('vendas_por_genero', figura_generos, dict(
+        vendas_por_genero=vendas_por_genero, titulo='Vendas Totais por Gênero')))
+
+    for coluna, (regiao, paleta) in REGIOES.items():
+        sufixo = coluna.split('_')[0]
+        por_plataforma = agregar_cubo(cubo, 'platform', coluna=coluna, anos=janela).sort_values(ascending=False).head(top_n)
+        figuras.append((f'plataformas_{sufixo}', figura_barras_sns, dict(
+            serie=por_plataforma, titulo=f'Vendas Totais por Plataforma - {regiao}',
+            xlabel='Plataforma', ylabel='Vendas Totais (milhões)', paleta=paleta)))
+        por_genero = agregar_cubo(cubo, 'genre', coluna=coluna, anos=janela).sort_values(ascending=False).head(top_n)
+        figuras.append((f'generos_{sufixo}', figura_barras_sns, dict(
+            serie=por_genero, titulo=f'Vendas Totais por Gênero - {regiao}',
+            xlabel='Gênero', ylabel='Vendas Globais (milhões)', rotacionar=True)))
+        por_classificacao = agregar_cubo(cubo, 'rating', coluna=coluna, anos=janela).sort_values(ascending=False)
+        figuras.append((f'classificacao_{sufixo}', figura_barras_sns, dict(
+            serie=por_classificacao, titulo=f'Vendas Totais por Classificação do ESRB - {regiao}',
+            xlabel='Classificação do ESRB', ylabel='Vendas Globais (milhões)', figsize=(8, 6))))
+
+    return figuras
+
+
+# ## Geração do relatório
+
+# Escrevendo o HTML com as figuras embutidas (base64) e a tabela de tempos
+def escrever_html(resultados, arquivo_html, titulo):
+    linhas_tabela = ''.join(
+        f'<tr><td>{html.escape(nome)}</td><td>{tempo:.3f}</td></tr>' for nome, _, tempo in resultados
+    )
+    secoes = []
+    for nome, arquivo, _ in resultados:
+        conteudo = base64.b64encode(Path(arquivo).read_bytes()).decode('ascii')
+        secoes.append(f'<h2>{html.escape(nome)}</h2>\n<img src="data:image/png;base64,{conteudo}">')
+
+    Path(arquivo_html).write_text(
+        '<!DOCTYPE html>\n<html lang="pt-BR">\n<head><meta charset="utf-8">'
+        f'<title>{html.escape(titulo)}</title></head>\n<body>\n<h1>{html.escape(titulo)}</h1>\n'
+        f'<table><tr><th>Figura</th><th>Tempo (s)</th></tr>{linhas_tabela}</table>\n'
+        + '\n'.join(secoes) + '\n</body>\n</html>\n',
+        encoding='utf-8',
+    )
+
+
+# Renderizando todas as figuras em paralelo e gerando o relatório
+def gerar_relatorio(games, dir_saida, processos=None, janela=(2012, 2016), top_n=5, dispersao='densidade'):
+    dir_saida = Path(dir_saida)
+    dir_saida.mkdir(parents=True, exist_ok=True)
+
+    inicio = time.perf_counter()
+    figuras = montar_figuras(games, janela, top_n, dispersao)
+    tempo_agregados = time.perf_counter() - inicio
+
+    with ProcessPoolExecutor(max_workers=processos) as executor:
+        futuros = [executor.submit(renderizar, nome, funcao, kwargs, dir_saida) for nome, funcao, kwargs in figuras]
+        resultados = [futuro.result() for futuro in futuros]
+
+    arquivo_html = dir_saida / 'relatorio.html'
+    escrever_html(resultados, arquivo_html, 'Vendas de videogame da Loja Online Ice')
+
+    print(f'Agregados: {tempo_agregados:.3f} s')
+    for nome, _, tempo in resultados:
+        print(f'{nome}: {tempo:.3f} s')
+    print(f'Total: {time.perf_counter() - inicio:.3f} s')
+    print(f'Relatório: {arquivo_html}')
+    return arquivo_html
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Gera o relatório de figuras de ice.py sem interface gráfica.')
+    parser.add_argument('caminho', nargs='?', default='/datasets/games.csv', help='arquivo CSV de vendas')
+    parser.add_argument('--saida', default='relatorio', help='diretório de saída')
+    parser.add_argument('--processos', type=int, default=os.cpu_count(), help='número de processos')
+    parser.add_argument('--dispersao', default='densidade', choices=['densidade', 'pontos'],
+                        help='avaliações x vendas como grade de densidade ou como pontos')
+    args = parser.parse_args()
+
+    gerar_relatorio(carregar_jogos(args.caminho), args.saida, args.processos, dispersao=args.dispersao)
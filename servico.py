@@ -0,0 +1,272 @@
+# # Serviço local de consultas sobre os agregados
+
+# Serviço HTTP/JSON (asyncio, sem dependências além das da análise) que carrega e limpa os dados uma única vez,
+# monta o cubo de 'cubo.py' e responde consultas de filtro + agrupamento + top N sobre as dimensões usadas em
+# 'ice.py' (plataforma, gênero, classificação, ano e região), em vez de copiar e executar o script de novo para
+# cada variação. Os resultados recentes ficam em um cache LRU, e cada resposta informa a latência da consulta.
+#
+# Exemplo:
+#     python servico.py /datasets/games.csv --porta 8000
+#     curl 'http://127.0.0.1:8000/consulta?por=platform&regiao=eu&anos=2014-2016&rating=M&top=5'
+#
+# Parâmetros da consulta (na URL de um GET ou em um objeto JSON no corpo de um POST):
+#     por          dimensões do agrupamento, separadas por vírgula (platform, genre, rating, year_of_release)
+#     regiao       na, eu, jp, other ou total (padrão), ou o nome da coluna de vendas
+#     estatistica  soma (padrão), contagem, media, variancia ou desvio
+#     anos         '2014-2016', '2014-', '-2010' ou '2016'
+#     platform, genre, rating
+#                  valores aceitos em cada dimensão, separados por vírgula
+#     top          número de grupos com os maiores valores (padrão: todos)
+#
+# Outros caminhos: '/saude' e '/estatisticas' (uso do cache e latências).
+
+import argparse
+import asyncio
+import json
+import time
+from collections import deque
+from functools import lru_cache
+from urllib.parse import parse_qsl, urlsplit
+
+import numpy as np
+
+from carregamento import carregar_jogos
+from cubo import COLUNAS_SOMA, DIMENSOES, ESTATISTICAS, agregar_cubo, construir_cubo
+
+
+REGIOES = {'na': 'na_sales', 'eu': 'eu_sales', 'jp': 'jp_sales', 'other': 'other_sales', 'total': 'total_sales'}
+DIMENSOES_FILTRO = ['platform', 'genre', 'rating']
+MENSAGENS_HTTP = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed', 500: 'Internal Server Error'}
+
+
+def _lista(valor):
+    if valor is None:
+        return []
+    if isinstance(valor, str):
+        valor = valor.split(',')
+    elif not isinstance(valor, (list, tuple)):
+        raise ValueError(f'Esperado texto ou lista, recebido {type(valor).__name__}: {valor!r}')
+    return [str(v).strip() for v in valor if str(v).strip()]
+
+
+# Tamanho do corpo da requisição pelo cabeçalho Content-Length (ValueError se não for um inteiro não negativo)
+def _tamanho_corpo(cabecalhos):
+    valor = cabecalhos.get('content-length', '0')
+    try:
+        tamanho = int(valor)
+    except ValueError:
+        raise ValueError(f'Content-Length inválido: {valor!r}') from None
+    if tamanho < 0:
+        raise ValueError(f'Content-Length inválido: {valor!r}')
+    return tamanho
+
+
+def _intervalo_anos(valor):
+    if valor in (None, ''):
+        return None
+    if isinstance(valor, (list, tuple)):
+        inicio, fim = valor
+    elif '-' in str(valor):
+        inicio, fim = str(valor).split('-', 1)
+    else:
+        inicio = fim = valor
+    try:
+        return (int(inicio) if inicio not in (None, '') else None, int(fim) if fim not in (None, '') else None)
+    except ValueError:
+        raise ValueError(f'Intervalo de anos inválido: {valor}') from None
+
+
+# Convertendo os parâmetros recebidos em uma chave de consulta normalizada (e que pode ser usada no cache):
+# consultas equivalentes escritas de formas diferentes têm a mesma chave
+def normalizar_consulta(parametros):
+    desconhecidos = set(parametros) - {'por', 'regiao', 'estatistica', 'anos', 'top'} - set(DIMENSOES_FILTRO)
+    if desconhecidos:
+        raise ValueError(f'Parâmetros desconhecidos: {", ".join(sorted(desconhecidos))}')
+
+    por = tuple(_lista(parametros.get('por')) or ['platform'])
+    for dimensao in por:
+        if dimensao not in DIMENSOES:
+            raise ValueError(f'Dimensão desconhecida: {dimensao} (use uma de {DIMENSOES})')
+    if len(set(por)) < len(por):
+        raise ValueError(f'Dimensão repetida em por: {",".join(por)}')
+
+    regiao = str(parametros.get('regiao', 'total'))
+    coluna = REGIOES.get(regiao, regiao)
+    if coluna not in COLUNAS_SOMA:
+        raise ValueError(f'Região desconhecida: {regiao} (use uma de {list(REGIOES)})')
+
+    estatistica = str(parametros.get('estatistica', 'soma'))
+    if estatistica not in ESTATISTICAS:
+        raise ValueError(f'Estatística desconhecida: {estatistica} (use uma de {ESTATISTICAS})')
+
+    top = parametros.get('top')
+    try:
+        top = int(top) if top not in (None, '') else None
+    except ValueError:
+        raise ValueError(f'top inválido: {top}') from None
+    if top is not None and top < 1:
+        raise ValueError(f'top deve ser pelo menos 1: {top}')
+
+    filtros = tuple((d, tuple(sorted(_lista(parametros[d])))) for d in DIMENSOES_FILTRO if _lista(parametros.get(d)))
+    return por, coluna, estatistica, _intervalo_anos(parametros.get('anos')), filtros, top
+
+
+class ServicoConsultas:
+    def __init__(self, cubo, tamanho_cache=1024, n_latencias=1000):
+        self.cubo = cubo
+        self.consultar = lru_cache(maxsize=tamanho_cache)(self._consultar)
+        self.latencias = deque(maxlen=n_latencias)
+        self.inicio = time.time()
+
+    @classmethod
+    def do_arquivo(cls, caminho, **kwargs):
+        return cls(construir_cubo(carregar_jogos(caminho)), **kwargs)
+
+    # Executando a consulta sobre o cubo (apenas em caso de falta no cache). O resultado é uma tupla de linhas,
+    # para que o mesmo objeto possa ser devolvido a várias consultas sem ser alterado
+    def _consultar(self, chave):
+        por, coluna, estatistica, anos, filtros, top = chave
+        serie = agregar_cubo(self.cubo, list(por), coluna, estatistica, anos, **dict(filtros))
+        serie = serie.dropna().sort_values(ascending=False)
+        if top is not None:
+            serie = serie.head(top)
+
+        linhas = []
+        for grupo, valor in serie.items():
+            grupo = grupo if isinstance(grupo, tuple) else (grupo,)
+            linha = {d: (int(g) if isinstance(g, (int, np.integer)) else str(g)) for d, g in zip(por, grupo)}
+            linha['valor'] = int(valor) if estatistica == 'contagem' else float(valor)
+            linhas.append(linha)
+        return tuple(linhas)
+
+    # Respondendo uma consulta: retorna o corpo da resposta (dicionário) e se ela veio do cache
+    def responder(self, parametros):
+        inicio = time.perf_counter()
+        chave = normalizar_consulta(parametros)
+        faltas = self.consultar.cache_info().misses
+        resultado = self.consultar(chave)
+        do_cache = self.consultar.cache_info().misses == faltas
+        latencia_ms = (time.perf_counter() - inicio) * 1000
+        self.latencias.append(latencia_ms)
+
+        por, coluna, estatistica, anos, filtros, top = chave
+        return {
+            'consulta': {'por': list(por), 'coluna': coluna, 'estatistica': estatistica, 'anos': anos,
+                         'filtros': {d: list(v) for d, v in filtros}, 'top': top},
+            'resultado': list(resultado),
+            'cache': do_cache,
+            'latencia_ms': latencia_ms,
+        }
+
+    def estatisticas(self):
+        informacoes = self.consultar.cache_info()
+        latencias = np.array(self.latencias) if self.latencias else np.array([np.nan])
+        return {
+            'consultas': informacoes.hits + informacoes.misses,
+            'acertos_cache': informacoes.hits,
+            'faltas_cache': informacoes.misses,
+            'itens_cache': informacoes.currsize,
+            'tamanho_cache': informacoes.maxsize,
+            'latencia_ms': {nome: float(np.percentile(latencias, p)) for nome, p in [('p50', 50), ('p95', 95), ('p99', 99)]},
+            'celulas_cubo': len(self.cubo),
+            'segundos_ativo': time.time() - self.inicio,
+        }
+
+    # ## HTTP
+
+    def rotear(self, metodo, alvo, corpo):
+        url = urlsplit(alvo)
+        if url.path == '/saude':
+            return 200, {'ok': True}
+        if url.path == '/estatisticas':
+            return 200, self.estatisticas()
+        if url.path != '/consulta':
+            return 404, {'erro': f'Caminho desconhecido: {url.path}'}
+        if metodo == 'GET':
+            parametros = dict(parse_qsl(url.query))
+        elif metodo == 'POST':
+            parametros = json.loads(corpo or b'{}')
+            if not isinstance(parametros, dict):
+                return 400, {'erro': 'O corpo deve ser um objeto JSON'}
+        else:
+            return 405, {'erro': f'Método não suportado: {metodo}'}
+        try:
+            return 200, self.responder(parametros)
+        except ValueError as erro:
+            return 400, {'erro': str(erro)}
+
+    # Uma conexão pode enviar várias requisições em sequência (keep-alive do HTTP/1.1)
+    async def atender(self, leitor, escritor):
+        try:
+            while True:
+                linha = await leitor.readline()
+                if not linha:
+                    break
+                inicio = time.perf_counter()
+                try:
+                    metodo, alvo, versao = linha.decode('latin-1').split()
+                except ValueError:
+                    break
+
+                cabecalhos = {}
+                while (cabecalho := await leitor.readline()) not in (b'\r\n', b'\n', b''):
+                    nome, _, valor = cabecalho.decode('latin-1').partition(':')
+                    cabecalhos[nome.strip().lower()] = valor.strip()
+                # Sem um Content-Length válido não há como saber onde a requisição termina: a resposta é 400 e a
+                # conexão é fechada
+                try:
+                    tamanho = _tamanho_corpo(cabecalhos)
+                except ValueError as erro:
+                    tamanho, status, resposta = None, 400, {'erro': str(erro)}
+
+                if tamanho is not None:
+                    corpo = await leitor.readexactly(tamanho) if tamanho else b''
+                    try:
+                        status, resposta = self.rotear(metodo, alvo, corpo)
+                    except json.JSONDecodeError as erro:
+                        status, resposta = 400, {'erro': f'JSON inválido: {erro}'}
+                    except Exception as erro:
+                        status, resposta = 500, {'erro': repr(erro)}
+
+                fechar = tamanho is None or cabecalhos.get('connection', '').lower() == 'close' or versao == 'HTTP/1.0'
+                dados = json.dumps(resposta, ensure_ascii=False).encode('utf-8')
+                latencia_ms = (time.perf_counter() - inicio) * 1000
+                escritor.write(
+                    f'HTTP/1.1 {status} {MENSAGENS_HTTP[status]}\r\n'
+                    f'Content-Type: application/json; charset=utf-8\r\n'
+                    f'Content-Length: {len(dados)}\r\n'
+                    f'X-Latencia-Ms: {latencia_ms:.3f}\r\n'
+                    f'Connection: {"close" if fechar else "keep-alive"}\r\n\r\n'.encode('latin-1') + dados
+                )
+                await escritor.drain()
+                print(f'{metodo} {alvo} {status} {latencia_ms:.2f} ms', flush=True)
+                if fechar:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            escritor.close()
+
+    async def servir(self, host='127.0.0.1', porta=8000):
+        servidor = await asyncio.start_server(self.atender, host, porta)
+        enderecos = ', '.join(f'{s.getsockname()[0]}:{s.getsockname()[1]}' for s in servidor.sockets)
+        print(f'Servindo consultas em {enderecos} ({len(self.cubo)} células no cubo)', flush=True)
+        async with servidor:
+            await servidor.serve_forever()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serviço HTTP/JSON de consultas sobre os agregados das vendas.')
+    parser.add_argument('caminho', nargs='?', default='/datasets/games.csv', help='arquivo CSV de vendas')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8000)
+    parser.add_argument('--cache', type=int, default=1024, help='número de resultados mantidos no cache LRU')
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    servico = ServicoConsultas.do_arquivo(args.caminho, tamanho_cache=args.cache)
+    print(f'Dados carregados em {time.perf_counter() - inicio:.3f} s')
+    try:
+        asyncio.run(servico.servir(args.host, args.porta))
+    except KeyboardInterrupt:
+        pass
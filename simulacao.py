@@ -0,0 +1,255 @@
+# # Simulação de Monte Carlo da divisão do orçamento da campanha
+
+# A "Conclusão Geral" de 'ice.py' sugere dividir a campanha entre plataformas, gêneros e regiões. Esta simulação
+# quantifica a incerteza dessa divisão: para cada célula plataforma x gênero x região, as vendas dos títulos do
+# período de 2012 a 2016 são reamostradas (com reposição), e cada sorteio dá as vendas médias por título de cada
+# célula. O retorno de uma alocação em um sorteio é a média dessas vendas ponderada pela fração do orçamento de
+# cada célula, e, com milhares de alocações candidatas avaliadas nos mesmos sorteios, são estimados o valor
+# esperado e o risco de cada uma (desvio padrão, probabilidade de ficar abaixo de um limiar e semidesvio abaixo
+# dele).
+#
+# Os sorteios são feitos em blocos por um ProcessPoolExecutor. As vendas dos títulos e a matriz de alocações
+# ficam em memória compartilhada (multiprocessing.shared_memory), somente para leitura, e cada processo devolve
+# apenas as somas de cada alocação no seu bloco. Novos blocos são enviados até o fim do tempo disponível ou até
+# completar exatamente 'max_sorteios' sorteios.
+#
+# Exemplo:
+#     python simulacao.py /datasets/games.csv --alocacoes 5000 --tempo 20
+
+import argparse
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import numpy as np
+import pandas as pd
+
+from colunas import ArraysCompartilhados, anexar_arrays
+
+
+PLATAFORMAS_CAMPANHA = ['PS4', 'PS3', 'X360']
+GENEROS_CAMPANHA = ['Action', 'Shooter', 'Role-Playing', 'Sports']
+REGIOES_CAMPANHA = ['na_sales', 'eu_sales', 'jp_sales']
+
+
+# ## Dados das células
+
+# Vendas por título de cada célula plataforma x gênero x região, em um único vetor 'valores' em que a célula i
+# ocupa as posições inicios[i] .. inicios[i] + tamanhos[i]. As células sem títulos ficam de fora
+def montar_celulas(games_novo, plataformas=PLATAFORMAS_CAMPANHA, generos=GENEROS_CAMPANHA, regioes=REGIOES_CAMPANHA):
+    selecionados = games_novo[games_novo['platform'].isin(plataformas) & games_novo['genre'].isin(generos)]
+    codigo_plataforma = pd.Categorical(selecionados['platform'].astype(str), categories=plataformas).codes
+    codigo_genero = pd.Categorical(selecionados['genre'].astype(str), categories=generos).codes
+    grupo = codigo_plataforma.astype('int64') * len(generos) + codigo_genero
+
+    ordem = np.argsort(grupo, kind='stable')
+    contagens = np.bincount(grupo, minlength=len(plataformas) * len(generos))
+    inicios_grupo = np.concatenate([[0], np.cumsum(contagens)[:-1]])
+
+    valores = np.concatenate([selecionados[regiao].to_numpy(dtype='float64')[ordem] for regiao in regioes])
+    celulas = pd.MultiIndex.from_product([plataformas, generos, regioes], names=['platform', 'genre', 'regiao'])
+    inicios = (np.arange(len(regioes))[None, :] * len(selecionados) + inicios_grupo[:, None]).ravel()
+    tamanhos = np.repeat(contagens, len(regioes))
+
+    com_titulos = tamanhos > 0
+    return {
+        'celulas': celulas[com_titulos],
+        'valores': valores,
+        'inicios': inicios[com_titulos].astype('int64'),
+        'tamanhos': tamanhos[com_titulos].astype('int64'),
+    }
+
+
+# Alocações candidatas: cada uma é o produto de uma divisão entre as plataformas, uma entre os gêneros e uma entre
+# as regiões (sorteadas de distribuições de Dirichlet), normalizado nas células com títulos. A primeira é a
+# divisão igual sugerida na conclusão de 'ice.py'
+def gerar_alocacoes(celulas, n_alocacoes=5000, semente=None):
+    rng = np.random.default_rng(semente)
+    fracoes = {}
+    pesos = np.ones((n_alocacoes, len(celulas)))
+    for nome in celulas.names:
+        valores = list(celulas.get_level_values(nome))
+        categorias = list(dict.fromkeys(valores))
+        divisao = rng.dirichlet(np.ones(len(categorias)), size=n_alocacoes)
+        divisao[0] = 1 / len(categorias)
+        fracoes.update({f'{nome}={c}': divisao[:, i] for i, c in enumerate(categorias)})
+        pesos *= divisao[:, [categorias.index(v) for v in valores]]
+    pesos /= pesos.sum(axis=1, keepdims=True)
+    return pesos, pd.DataFrame(fracoes)
+
+
+# Arrays abertos em cada processo do pool (preenchido por '_anexar')
+_BLOCOS = {}
+_ARRAYS = {}
+
+
+def _anexar(descritores):
+    _ARRAYS.update(anexar_arrays(descritores, _BLOCOS))
+
+
+# ## Sorteios
+
+# Um bloco de sorteios: para cada sorteio e célula são escolhidos 'titulos' títulos com reposição, e o retorno de
+# cada alocação é a soma das vendas médias das células ponderadas pela alocação. Retorna as somas por alocação
+# (retorno, quadrado do retorno, sorteios abaixo do limiar e quadrado da falta abaixo do limiar)
+def simular_bloco(arrays, semente, n_sorteios, titulos, limiar):
+    rng = np.random.default_rng(semente)
+    inicios, tamanhos = arrays['inicios'], arrays['tamanhos']
+
+    sorteio = rng.random((n_sorteios, len(inicios), titulos))
+    indices = inicios[None, :, None] + (sorteio * tamanhos[None, :, None]).astype('int64')
+    medias = arrays['valores'][indices].mean(axis=2)
+
+    retornos = medias @ arrays['pesos'].T
+    falta = np.clip(limiar - retornos, 0, None)
+    return {
+        'n': n_sorteios,
+        'soma': retornos.sum(axis=0),
+        'soma_quad': (retornos ** 2).sum(axis=0),
+        'abaixo': (retornos < limiar).sum(axis=0),
+        'falta_quad': (falta ** 2).sum(axis=0),
+    }
+
+
+def _simular_bloco_compartilhado(semente, n_sorteios, titulos, limiar):
+    return simular_bloco(_ARRAYS, semente, n_sorteios, titulos, limiar)
+
+
+def _acumular(total, parcial):
+    if total is None:
+        return dict(parcial)
+    return {chave: total[chave] + parcial[chave] for chave in total}
+
+
+# Simulando as alocações até o fim do tempo disponível (ou até 'max_sorteios'), com pelo menos um bloco de
+# sorteios mesmo que o tempo acabe durante a preparação. O limiar padrão é o retorno médio da alocação igual nos
+# dados observados. Retorna uma tabela com as frações de cada alocação e as medidas de valor esperado e risco,
+# ordenada pelo valor esperado, e um dicionário com o número de sorteios e o tempo gasto
+def simular(games_novo, n_alocacoes=5000, titulos=10, tempo=10.0, max_sorteios=1_000_000, sorteios_por_bloco=500,
+            processos=None, semente=None, limiar=None, plataformas=PLATAFORMAS_CAMPANHA, generos=GENEROS_CAMPANHA,
+            regioes=REGIOES_CAMPANHA):
+    if tempo <= 0 or max_sorteios <= 0 or sorteios_por_bloco <= 0:
+        raise ValueError(f'tempo, max_sorteios e sorteios_por_bloco devem ser positivos: {tempo}, {max_sorteios}, '
+                         f'{sorteios_por_bloco}')
+    inicio = time.perf_counter()
+    dados = montar_celulas(games_novo, plataformas, generos, regioes)
+    sementes = np.random.SeedSequence(semente)
+    semente_alocacoes, semente_sorteios = sementes.spawn(2)
+    pesos, fracoes = gerar_alocacoes(dados['celulas'], n_alocacoes, semente_alocacoes)
+
+    if limiar is None:
+        acumulado = np.concatenate([[0.0], np.cumsum(dados['valores'])])
+        medias_celulas = (acumulado[dados['inicios'] + dados['tamanhos']] - acumulado[dados['inicios']]) / dados['tamanhos']
+        limiar = float(pesos[0] @ medias_celulas)
+
+    arrays = {'valores': dados['valores'], 'inicios': dados['inicios'], 'tamanhos': dados['tamanhos'], 'pesos': pesos}
+    processos = processos or os.cpu_count() or 1
+    total = None
+    enviados = 0
+
+    # Cada bloco tem 'sorteios_por_bloco' sorteios, e o último é reduzido ao que falta para 'max_sorteios'
+    def proximo_bloco():
+        nonlocal enviados
+        n_sorteios = min(sorteios_por_bloco, max_sorteios - enviados)
+        enviados += n_sorteios
+        return semente_sorteios.spawn(1)[0], n_sorteios, titulos, limiar
+
+    def esgotado():
+        return time.perf_counter() - inicio >= tempo
+
+    def terminou():
+        return enviados >= max_sorteios or esgotado()
+
+    if processos == 1:
+        while total is None or not terminou():
+            total = _acumular(total, simular_bloco(arrays, *proximo_bloco()))
+    else:
+        # Os blocos são somados na ordem em que foram enviados (e não na ordem em que terminam), para que o
+        # resultado dependa só da semente e do número de sorteios, e não do número de processos
+        with ArraysCompartilhados(arrays) as compartilhados, \
+                ProcessPoolExecutor(processos, initializer=_anexar, initargs=(compartilhados.descritores,)) as pool:
+            indices = {}
+            terminados = {}
+            proximo_a_somar = 0
+
+            def enviar():
+                indices[pool.submit(_simular_bloco_compartilhado, *proximo_bloco())] = len(indices)
+
+            enviar()
+            while len(indices) < 2 * processos and not terminou():
+                enviar()
+            pendentes = set(indices)
+            while pendentes:
+                prontos, pendentes = wait(pendentes, return_when=FIRST_COMPLETED)
+                for futuro in prontos:
+                    terminados[indices[futuro]] = futuro.result()
+                    if not terminou():
+                        enviar()
+                        pendentes.add(next(reversed(indices)))
+                while proximo_a_somar in terminados:
+                    total = _acumular(total, terminados.pop(proximo_a_somar))
+                    proximo_a_somar += 1
+
+    # Todos os blocos enviados foram somados, e o total só fica abaixo de 'max_sorteios' se o tempo acabou
+    if total['n'] != enviados or total['n'] > max_sorteios or (total['n'] < max_sorteios and not esgotado()):
+        raise RuntimeError(f'{total["n"]} sorteios simulados de {enviados} enviados (máximo: {max_sorteios})')
+
+    n = total['n']
+    esperado = total['soma'] / n
+    resultado = fracoes.assign(
+        esperado=esperado,
+        desvio=np.sqrt(np.clip(total['soma_quad'] / n - esperado ** 2, 0, None) * n / max(n - 1, 1)),
+        prob_abaixo=total['abaixo'] / n,
+        semidesvio=np.sqrt(total['falta_quad'] / n),
+    )
+    resultado['recomendada'] = np.arange(len(resultado)) == 0
+    informacoes = {
+        'sorteios': int(n),
+        'alocacoes': int(n_alocacoes),
+        'celulas': len(dados['celulas']),
+        'limiar': limiar,
+        'processos': processos,
+        'segundos': time.perf_counter() - inicio,
+    }
+    return resultado.sort_values('esperado', ascending=False), informacoes
+
+
+# Alocações da fronteira eficiente: nenhuma outra tem valor esperado maior com desvio padrão menor ou igual
+def fronteira_eficiente(resultado, risco='desvio'):
+    ordenado = resultado.sort_values([risco, 'esperado'], ascending=[True, False])
+    maximo_anterior = np.maximum.accumulate(ordenado['esperado'].to_numpy())
+    eficiente = ordenado['esperado'].to_numpy() >= maximo_anterior
+    return ordenado[eficiente]
+
+
+if __name__ == '__main__':
+    from carregamento import carregar_jogos
+
+    parser = argparse.ArgumentParser(description='Simulação de Monte Carlo da divisão do orçamento da campanha.')
+    parser.add_argument('caminho', nargs='?', default='/datasets/games.csv', help='arquivo CSV de vendas')
+    parser.add_argument('--ano-inicio', type=int, default=2012, help='primeiro ano do período de análise')
+    parser.add_argument('--ano-fim', type=int, default=2016, help='último ano do período de análise')
+    parser.add_argument('--plataformas', nargs='+', default=PLATAFORMAS_CAMPANHA)
+    parser.add_argument('--generos', nargs='+', default=GENEROS_CAMPANHA)
+    parser.add_argument('--regioes', nargs='+', default=REGIOES_CAMPANHA)
+    parser.add_argument('--alocacoes', type=int, default=5000, help='número de alocações candidatas')
+    parser.add_argument('--titulos', type=int, default=10, help='títulos sorteados por célula em cada sorteio')
+    parser.add_argument('--tempo', type=float, default=10.0, help='tempo disponível, em segundos')
+    parser.add_argument('--max-sorteios', type=int, default=1_000_000, help='número máximo de sorteios')
+    parser.add_argument('--processos', type=int, help='número de processos (padrão: um por CPU)')
+    parser.add_argument('--semente', type=int, default=42)
+    args = parser.parse_args()
+
+    games = carregar_jogos(args.caminho)
+    games_novo = games[(games['year_of_release'] >= args.ano_inicio) & (games['year_of_release'] <= args.ano_fim)]
+    resultado, informacoes = simular(games_novo, args.alocacoes, args.titulos, args.tempo, args.max_sorteios,
+                                     processos=args.processos, semente=args.semente, plataformas=args.plataformas,
+                                     generos=args.generos, regioes=args.regioes)
+
+    print(', '.join(f'{chave}: {valor}' for chave, valor in informacoes.items()))
+    print('Alocação recomendada (divisão igual):')
+    print(resultado[resultado['recomendada']].T)
+    print('Maiores valores esperados:')
+    print(resultado.head(10))
+    print('Fronteira eficiente (valor esperado x desvio padrão):')
+    print(fronteira_eficiente(resultado))
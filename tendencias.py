@@ -0,0 +1,117 @@
+# # Tendências anuais por plataforma, gênero ou região
+
+# A partir do cubo de 'cubo.py' é montada uma única matriz (linhas x anos) com as vendas (ou médias, ou contagens)
+# de cada plataforma, gênero ou região em cada ano, e todas as medidas de tendência saem de operações vetorizadas
+# do NumPy sobre essa matriz: variação em relação ao ano anterior da mesma linha, médias móveis, taxa de
+# crescimento anual composta (CAGR) e a classificação em 'crescendo', 'diminuindo' ou 'estável'.
+#
+# Em 'ice.py' a variação era calculada com pct_change() sobre as médias das plataformas em ordem alfabética,
+# comparando cada plataforma com a anterior na lista, e não com o próprio ano anterior.
+
+import numpy as np
+import pandas as pd
+
+from cubo import COLUNAS_SOMA, agregar_cubo, filtrar_cubo
+
+
+TENDENCIAS = ['crescendo', 'diminuindo', 'estável']
+
+
+# Matriz (plataforma, gênero ou classificação, ou uma combinação delas) x ano para a coluna e a estatística
+# pedidas. Os anos sem vendas de uma linha ficam com 0 (soma e contagem) ou nulos (demais estatísticas)
+def matriz_anual(cubo, linhas='platform', coluna='total_sales', estatistica='soma', anos=None, **filtros):
+    linhas = [linhas] if isinstance(linhas, str) else list(linhas)
+    serie = agregar_cubo(cubo, linhas + ['year_of_release'], coluna, estatistica, anos, **filtros)
+    matriz = serie.unstack('year_of_release')
+    if len(linhas) == 1:
+        matriz.index = matriz.index.astype(str)
+    else:
+        matriz.index = pd.MultiIndex.from_arrays(
+            [matriz.index.get_level_values(nivel).astype(str) for nivel in range(len(linhas))], names=linhas)
+    return _completar_anos(matriz, estatistica)
+
+
+# Matriz região x ano: uma linha para cada coluna de vendas (na_sales, eu_sales, ...), com todas as regiões
+# agregadas de uma vez a partir do cubo
+def matriz_regioes(cubo, colunas=COLUNAS_SOMA, estatistica='soma', anos=None, **filtros):
+    if estatistica not in ('soma', 'media'):
+        raise ValueError(f'Estatística não suportada para regiões: {estatistica} (use soma ou media)')
+    selecionado = filtrar_cubo(cubo, anos, **filtros)
+    somas = selecionado.groupby('year_of_release')[[f'{c}_soma' for c in colunas] + ['contagem']].sum()
+    matriz = somas[[f'{c}_soma' for c in colunas]]
+    if estatistica == 'media':
+        matriz = matriz.div(somas['contagem'], axis=0)
+    matriz.columns = list(colunas)
+    return _completar_anos(matriz.T, estatistica)
+
+
+def _completar_anos(matriz, estatistica):
+    if len(matriz.columns):
+        matriz = matriz.reindex(columns=range(int(matriz.columns.min()), int(matriz.columns.max()) + 1))
+    if estatistica in ('soma', 'contagem'):
+        matriz = matriz.fillna(0)
+    matriz.columns.name = 'year_of_release'
+    return matriz.astype('float64')
+
+
+# Variação em relação ao ano anterior da mesma linha (nula quando o ano anterior é 0 ou nulo)
+def crescimento_anual(matriz):
+    valores = matriz.to_numpy(dtype='float64')
+    anterior = valores[:, :-1]
+    with np.errstate(divide='ignore', invalid='ignore'):
+        variacao = np.where(anterior > 0, valores[:, 1:] / anterior - 1, np.nan)
+    return pd.DataFrame(variacao, index=matriz.index, columns=matriz.columns[1:])
+
+
+# Média móvel dos últimos 'janela' anos de cada linha, calculada com somas acumuladas (nula nos primeiros anos)
+def media_movel(matriz, janela=3):
+    valores = matriz.to_numpy(dtype='float64')
+    acumulado = np.cumsum(np.nan_to_num(valores), axis=1)
+    acumulado = np.concatenate([np.zeros((len(valores), 1)), acumulado], axis=1)
+    medias = np.full(valores.shape, np.nan)
+    if janela <= valores.shape[1]:
+        medias[:, janela - 1:] = (acumulado[:, janela:] - acumulado[:, :-janela]) / janela
+    return pd.DataFrame(medias, index=matriz.index, columns=matriz.columns)
+
+
+# Taxa de crescimento anual composta entre o primeiro ano com valor positivo de cada linha e o último ano da
+# matriz. Linhas que chegam a 0 no último ano têm CAGR de -100%; linhas com um único ano, CAGR nulo
+def cagr(matriz):
+    valores = np.nan_to_num(matriz.to_numpy(dtype='float64'))
+    positivos = valores > 0
+    primeiro = positivos.argmax(axis=1)
+    inicial = valores[np.arange(len(valores)), primeiro]
+    final = valores[:, -1]
+    periodos = valores.shape[1] - 1 - primeiro
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        taxa = np.where(periodos > 0, (final / inicial) ** (1 / periodos) - 1, np.nan)
+    taxa[~positivos.any(axis=1)] = np.nan
+    return pd.Series(taxa, index=matriz.index, name='cagr')
+
+
+# Classificando cada linha pela CAGR: 'crescendo' acima do limiar, 'diminuindo' abaixo de -limiar
+def classificar_tendencias(taxas, limiar=0.1):
+    valores = taxas.to_numpy(dtype='float64')
+    classes = np.select([valores > limiar, valores < -limiar], TENDENCIAS[:2], default=TENDENCIAS[2])
+    return pd.Series(pd.Categorical(classes, categories=TENDENCIAS), index=taxas.index, name='tendencia')
+
+
+# Resumo por linha: primeiro ano com vendas, valor no último ano, variação no último ano, média móvel no
+# último ano, CAGR e tendência
+def resumir_tendencias(matriz, limiar=0.1, janela_media=3):
+    valores = np.nan_to_num(matriz.to_numpy(dtype='float64'))
+    positivos = valores > 0
+    primeiro_ano = np.where(positivos.any(axis=1), matriz.columns.to_numpy()[positivos.argmax(axis=1)], -1)
+    taxas = cagr(matriz)
+
+    resumo = pd.DataFrame({
+        'primeiro_ano': primeiro_ano,
+        'ultimo_valor': matriz.iloc[:, -1],
+        'variacao_ultimo_ano': crescimento_anual(matriz).iloc[:, -1] if matriz.shape[1] > 1 else np.nan,
+        'media_movel': media_movel(matriz, janela_media).iloc[:, -1],
+        'cagr': taxas,
+        'tendencia': classificar_tendencias(taxas, limiar),
+    }, index=matriz.index)
+    resumo['primeiro_ano'] = resumo['primeiro_ano'].where(resumo['primeiro_ano'] >= 0)
+    return resumo.sort_values('cagr', ascending=False)
@@ -0,0 +1,152 @@
+# # Testes de hipóteses em lote para todos os pares de grupos
+
+# Em vez de filtrar os dados e chamar stats.bartlett e stats.ttest_ind para cada par, as estatísticas de cada
+# grupo (n, média e variância) são calculadas uma única vez e os testes t de Welch e de Bartlett são avaliados
+# para todos os pares ao mesmo tempo, com operações vetorizadas do NumPy. Os p-valores são corrigidos para
+# comparações múltiplas (Holm ou Benjamini-Hochberg). O SciPy só é importado quando um teste é executado.
+
+import numpy as np
+import pandas as pd
+
+from importacao import importar_sob_demanda
+
+
+stats = importar_sob_demanda('scipy.stats')
+
+CORRECOES = ['holm', 'bh', None]
+
+
+# Calculando n, média e variância amostral (ddof=1) de 'coluna' para cada grupo, ignorando valores nulos. As
+# avaliações são Float32 nulável, e as somas são feitas em float64 (como em 'estatisticas_mascaradas')
+def estatisticas_por_grupo(games, grupo, coluna):
+    valores = pd.Series(games[coluna].to_numpy(dtype='float64', na_value=np.nan), index=games.index)
+    estatisticas = valores.groupby(games[grupo], observed=True).agg(['count', 'mean', 'var'])
+    estatisticas.columns = ['n', 'media', 'variancia']
+    if isinstance(estatisticas.index, pd.CategoricalIndex):
+        estatisticas.index = estatisticas.index.astype(str)
+    return estatisticas
+
+
+# Correção de Holm (controle do FWER) dos p-valores
+def corrigir_holm(p_valores):
+    p_valores = np.asarray(p_valores, dtype='float64')
+    m = len(p_valores)
+    ordem = np.argsort(p_valores)
+    ajustados = np.maximum.accumulate((m - np.arange(m)) * p_valores[ordem])
+    resultado = np.empty(m)
+    resultado[ordem] = np.minimum(ajustados, 1.0)
+    return resultado
+
+
+# Correção de Benjamini-Hochberg (controle do FDR) dos p-valores
+def corrigir_bh(p_valores):
+    p_valores = np.asarray(p_valores, dtype='float64')
+    m = len(p_valores)
+    ordem = np.argsort(p_valores)
+    ajustados = p_valores[ordem] * m / np.arange(1, m + 1)
+    ajustados = np.minimum.accumulate(ajustados[::-1])[::-1]
+    resultado = np.empty(m)
+    resultado[ordem] = np.minimum(ajustados, 1.0)
+    return resultado
+
+
+def corrigir(p_valores, correcao):
+    if correcao == 'holm':
+        return corrigir_holm(p_valores)
+    if correcao == 'bh':
+        return corrigir_bh(p_valores)
+    if correcao is None:
+        return np.asarray(p_valores, dtype='float64')
+    raise ValueError(f'Correção desconhecida: {correcao} (use uma de {CORRECOES})')
+
+
+# Teste t de Welch para todos os pares (i, j), a partir das estatísticas dos grupos
+def welch_pares(n1, m1, v1, n2, m2, v2):
+    e1 = v1 / n1
+    e2 = v2 / n2
+    t = (m1 - m2) / np.sqrt(e1 + e2)
+    graus_liberdade = (e1 + e2) ** 2 / (e1 ** 2 / (n1 - 1) + e2 ** 2 / (n2 - 1))
+    p_valor = 2 * stats.t.sf(np.abs(t), graus_liberdade)
+    return t, graus_liberdade, p_valor
+
+
+# Teste de Bartlett (igualdade de variâncias) para todos os pares (i, j), com dois grupos em cada teste
+def bartlett_pares(n1, v1, n2, v2):
+    n_total = n1 + n2
+    variancia_combinada = ((n1 - 1) * v1 + (n2 - 1) * v2) / (n_total - 2)
+    numerador = (n_total - 2) * np.log(variancia_combinada) - (n1 - 1) * np.log(v1) - (n2 - 1) * np.log(v2)
+    correcao = 1 + (1 / (n1 - 1) + 1 / (n2 - 1) - 1 / (n_total - 2)) / 3
+    estatistica = numerador / correcao
+    return estatistica, stats.chi2.sf(estatistica, 1)
+
+
+# n, média e variância amostral (ddof=1) dos valores selecionados pela máscara, ignorando os nulos. As somas são
+# ponderadas pela máscara (0 ou 1), sem montar uma cópia filtrada dos valores
+def estatisticas_mascaradas(valores, mascara):
+    if isinstance(valores, pd.Series):
+        valores = valores.to_numpy(dtype='float64', na_value=np.nan)
+    valores = np.asarray(valores, dtype='float64')
+    pesos = (np.asarray(mascara, dtype=bool) & ~np.isnan(valores)).astype('float64')
+    valores = np.where(pesos > 0, valores, 0.0)
+    n = pesos.sum()
+    media = (pesos @ valores) / n
+    variancia = (pesos @ (valores - media) ** 2) / (n - 1)
+    return n, media, variancia
+
+
+# Testes t de Welch e de Bartlett entre os dois grupos de valores selecionados pelas máscaras (por exemplo,
+# plataforma == 'XOne' e plataforma == 'PC', com as avaliações nulas ignoradas)
+def testar_dois_grupos(valores, mascara_a, mascara_b):
+    if isinstance(valores, pd.Series):
+        valores = valores.to_numpy(dtype='float64', na_value=np.nan)
+    n1, m1, v1 = estatisticas_mascaradas(valores, mascara_a)
+    n2, m2, v2 = estatisticas_mascaradas(valores, mascara_b)
+    t, graus_liberdade, p_valor = welch_pares(n1, m1, v1, n2, m2, v2)
+    estatistica_bartlett, p_bartlett = bartlett_pares(n1, v1, n2, v2)
+    return {
+        'n_a': int(n1),
+        'n_b': int(n2),
+        'media_a': m1,
+        'media_b': m2,
+        't': float(t),
+        'graus_liberdade': float(graus_liberdade),
+        'p_valor': float(p_valor),
+        'bartlett': float(estatistica_bartlett),
+        'p_valor_bartlett': float(p_bartlett),
+    }
+
+
+# Testando todos os pares de grupos de 'grupo' (por exemplo, 'platform' ou 'genre') para a coluna 'coluna'.
+# Grupos com menos de 'n_minimo' valores (ou variância nula) são ignorados
+def testar_pares(games, grupo='platform', coluna='user_score', correcao='holm', alfa=0.05, n_minimo=2):
+    estatisticas = estatisticas_por_grupo(games, grupo, coluna)
+    estatisticas = estatisticas[(estatisticas['n'] >= max(n_minimo, 2)) & (estatisticas['variancia'] > 0)]
+
+    nomes = estatisticas.index.to_numpy()
+    n = estatisticas['n'].to_numpy(dtype='float64')
+    media = estatisticas['media'].to_numpy(dtype='float64')
+    variancia = estatisticas['variancia'].to_numpy(dtype='float64')
+    i, j = np.triu_indices(len(nomes), k=1)
+
+    t, graus_liberdade, p_t = welch_pares(n[i], media[i], variancia[i], n[j], media[j], variancia[j])
+    estatistica_bartlett, p_bartlett = bartlett_pares(n[i], variancia[i], n[j], variancia[j])
+    p_t_ajustado = corrigir(p_t, correcao)
+    p_bartlett_ajustado = corrigir(p_bartlett, correcao)
+
+    return pd.DataFrame({
+        'grupo_a': nomes[i],
+        'grupo_b': nomes[j],
+        'n_a': n[i].astype('int64'),
+        'n_b': n[j].astype('int64'),
+        'media_a': media[i],
+        'media_b': media[j],
+        't': t,
+        'graus_liberdade': graus_liberdade,
+        'p_valor': p_t,
+        'p_ajustado': p_t_ajustado,
+        'medias_diferentes': p_t_ajustado < alfa,
+        'bartlett': estatistica_bartlett,
+        'p_valor_bartlett': p_bartlett,
+        'p_ajustado_bartlett': p_bartlett_ajustado,
+        'variancias_iguais': p_bartlett_ajustado > alfa,
+    })
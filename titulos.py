@@ -0,0 +1,268 @@
+# # Índice de títulos e agregados entre plataformas
+
+# Cada linha dos dados é um título em uma plataforma, então um lançamento em várias plataformas (uma franquia
+# de esportes, por exemplo) aparece separado em cada uma, e procurar um título exige percorrer toda a coluna
+# 'name'. Aqui os nomes são normalizados (sem diferença de maiúsculas, acentos e pontuação), e o índice guarda,
+# para cada título normalizado, as linhas dos dados limpos em que ele aparece e os agregados entre plataformas
+# (vendas somadas, número de plataformas, primeiro e último ano), e o mesmo para as franquias. O índice é
+# construído uma vez e gravado no diretório de cache, identificado pelo mesmo hash de 'carregamento.py'; a busca
+# por título é uma consulta a um dicionário.
+#
+# A franquia de um título é obtida por uma regra simples: o nome normalizado antes do subtítulo (':', ' - ' ou
+# '('), sem a numeração final ('FIFA 16' -> 'fifa', 'Call of Duty 4: Modern Warfare' -> 'call of duty'), e
+# agrupado no menor prefixo que também seja a base de outra franquia ('madden nfl football' -> 'madden nfl').
+# Para não juntar títulos sem relação, a regra é conservadora: algarismos romanos só são removidos depois de
+# uma base com mais de uma palavra ('Star X' continua 'star x', 'Final Fantasy X' vira 'final fantasy'), e só
+# servem de prefixo as bases com mais de uma palavra (assim 'star' e 'nba' nunca juntam 'Star Wars' com 'Star Fox'
+# ou 'NBA 2K' com 'NBA Live'). Algumas séries com nomes diferentes ficam separadas ('fifa' e 'fifa soccer').
+#
+# Exemplo:
+#     python titulos.py /datasets/games.csv --buscar 'call of duty: black ops' --top 10
+
+import argparse
+import json
+import os
+import re
+import shutil
+import time
+import unicodedata
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from carregamento import COLUNAS_VENDAS, DIR_CACHE_PADRAO, VERSAO_LIMPEZA, _formato_cache, carregar_jogos, chave_cache
+
+
+ARQUIVO_METADADOS = 'titulos.json'
+# Versão da regra de normalização e de franquias (faz parte do diretório do índice)
+VERSAO_INDICE = 2
+
+# Numeração ao final do nome: números (anos inclusive) e algarismos romanos
+NUMERO = re.compile(r'\d+')
+ROMANO = re.compile(r'[ivx]{1,4}')
+SEPARADOR_SUBTITULO = re.compile(r'\s*(?::|\s-\s|\()')
+APOSTROFOS = re.compile(r"['’]")
+PONTUACAO = re.compile(r'[^0-9a-z]+')
+
+
+# ## Normalização
+
+# Normalizando um nome: sem acentos, em minúsculas, '&' como 'and' e a pontuação trocada por espaços (em Python
+# puro, para que a busca de um título não pague o custo de montar uma Series)
+def normalizar_titulo(nome):
+    nome = unicodedata.normalize('NFKD', str(nome))
+    nome = ''.join(c for c in nome if not unicodedata.combining(c)).casefold().replace('&', ' and ')
+    return ' '.join(PONTUACAO.sub(' ', APOSTROFOS.sub('', nome)).split())
+
+
+# Normalizando uma coluna de nomes: cada nome distinto é normalizado uma única vez
+def normalizar_titulos(nomes):
+    codigos, distintos = pd.factorize(pd.Series(nomes).fillna('None').astype(str))
+    return np.array([normalizar_titulo(nome) for nome in distintos], dtype=object)[codigos]
+
+
+# Base da franquia de um nome (original, não normalizado): o trecho antes do subtítulo, normalizado e sem a
+# numeração final (os algarismos romanos só depois de uma base com mais de uma palavra)
+def _base_franquia(nome):
+    palavras = (normalizar_titulo(SEPARADOR_SUBTITULO.split(nome, maxsplit=1)[0]) or normalizar_titulo(nome)).split()
+    while len(palavras) > 1 and (NUMERO.fullmatch(palavras[-1]) or
+                                 (len(palavras) > 2 and ROMANO.fullmatch(palavras[-1]))):
+        palavras.pop()
+    return ' '.join(palavras)
+
+
+# Franquia de cada nome distinto (ver a regra no início do arquivo)
+def franquias(nomes):
+    nomes = list(dict.fromkeys(nomes))
+    bases = {nome: _base_franquia(nome) for nome in nomes}
+    prefixos = {base for base in bases.values() if ' ' in base}
+
+    resultado = {}
+    for nome, base in bases.items():
+        palavras = base.split(' ')
+        resultado[nome] = next(
+            (' '.join(palavras[:n]) for n in range(2, len(palavras)) if ' '.join(palavras[:n]) in prefixos), base
+        )
+    return resultado
+
+
+# Casos conhecidos da regra de franquias: nomes que devem ficar juntos e nomes que não podem se juntar
+FRANQUIAS_JUNTAS = [
+    ['Call of Duty 4: Modern Warfare', 'Call of Duty: Black Ops II', 'Call of Duty 2'],
+    ['FIFA 16', 'FIFA 15'],
+    ['Final Fantasy X', 'Final Fantasy VII', 'Final Fantasy XIII-2'],
+]
+FRANQUIAS_SEPARADAS = [
+    ['Star X', 'Star Wars: Battlefront', 'Star Fox 64', 'Star Ocean: The Last Hope'],
+    ['NBA 2K16', 'NBA Live 15', 'NBA 06'],
+]
+
+
+# Conferindo a regra de franquias nos casos conhecidos (AssertionError com o caso que falhou)
+def verificar_franquias():
+    for nomes in FRANQUIAS_JUNTAS:
+        mapa = franquias(nomes)
+        assert len(set(mapa.values())) == 1, f'franquias separadas: {mapa}'
+    for nomes in FRANQUIAS_SEPARADAS:
+        mapa = franquias(nomes)
+        assert len(set(mapa.values())) == len(nomes), f'franquias juntas: {mapa}'
+    assert _base_franquia('Star X') == 'star x'
+
+
+# ## Índice
+
+class IndiceTitulos:
+    def __init__(self, titulos, franquias_, ordem, inicios, metadados=None):
+        self.titulos = titulos
+        self.franquias = franquias_
+        self.ordem = ordem
+        self.inicios = inicios
+        self.metadados = metadados or {}
+        # Título normalizado -> posição em 'titulos' (e no vetor de inícios)
+        self.posicoes = dict(zip(titulos.index, range(len(titulos))))
+
+    # Construindo o índice a partir dos dados limpos (as linhas do índice são as posições em 'games')
+    @classmethod
+    def construir(cls, games):
+        chaves = normalizar_titulos(games['name'])
+        codigos, distintas = pd.factorize(chaves, sort=True)
+
+        # Linhas de cada título, contíguas em 'ordem': o título i ocupa ordem[inicios[i]:inicios[i + 1]]
+        ordem = np.argsort(codigos, kind='stable')
+        inicios = np.concatenate([[0], np.cumsum(np.bincount(codigos, minlength=len(distintas)))])
+
+        # Agregados por código inteiro do título (sem agrupar por texto)
+        dados = pd.DataFrame({'codigo': codigos, 'year_of_release': games['year_of_release'].to_numpy()})
+        for coluna in COLUNAS_VENDAS + ['total_sales']:
+            dados[coluna] = games[coluna].to_numpy(dtype='float64')
+        dados['plataforma'] = games['platform'].cat.codes.to_numpy() if hasattr(games['platform'], 'cat') \
+            else pd.factorize(games['platform'])[0]
+        agrupado = dados.groupby('codigo', sort=True)
+        titulos = agrupado[COLUNAS_VENDAS + ['total_sales']].sum()
+        titulos['plataformas'] = agrupado['plataforma'].nunique()
+        titulos['linhas'] = agrupado.size()
+        titulos['primeiro_ano'] = agrupado['year_of_release'].min()
+        titulos['ultimo_ano'] = agrupado['year_of_release'].max()
+
+        # Nome exibido: o nome original da primeira linha de cada título
+        nomes = games['name'].astype(str).to_numpy()[ordem[inicios[:-1]]]
+        mapa_franquias = franquias(nomes)
+        titulos.insert(0, 'nome', nomes)
+        titulos.insert(1, 'franquia', [mapa_franquias[nome] for nome in nomes])
+        titulos.index = pd.Index(distintas, name='titulo')
+
+        agrupado = titulos.groupby('franquia', sort=True)
+        franquias_ = agrupado[COLUNAS_VENDAS + ['total_sales']].sum()
+        franquias_['titulos'] = agrupado.size()
+        franquias_['primeiro_ano'] = agrupado['primeiro_ano'].min()
+        franquias_['ultimo_ano'] = agrupado['ultimo_ano'].max()
+        # Plataformas distintas da franquia (contadas sobre as linhas, não somadas por título)
+        codigo_franquia = pd.Categorical(titulos['franquia'].to_numpy()[codigos], categories=franquias_.index).codes
+        franquias_['plataformas'] = (
+            pd.DataFrame({'f': codigo_franquia, 'p': dados['plataforma']}).groupby('f')['p'].nunique().to_numpy()
+        )
+        return cls(titulos, franquias_, ordem.astype(np.int64), inicios.astype(np.int64), {'linhas': int(len(games))})
+
+    def __len__(self):
+        return len(self.titulos)
+
+    # Linhas (posições nos dados limpos) de um título, pelo nome em qualquer grafia
+    def linhas(self, titulo):
+        posicao = self.posicoes.get(normalizar_titulo(titulo))
+        if posicao is None:
+            return np.empty(0, dtype=np.int64)
+        return self.ordem[self.inicios[posicao]:self.inicios[posicao + 1]]
+
+    def buscar(self, games, titulo):
+        return games.iloc[self.linhas(titulo)]
+
+    # Agregados de um título entre as plataformas (None se o título não existe)
+    def titulo(self, titulo):
+        chave = normalizar_titulo(titulo)
+        return self.titulos.loc[chave] if chave in self.posicoes else None
+
+    # Títulos de uma franquia, pelo nome da franquia ou de um dos seus títulos
+    def franquia(self, nome):
+        registro = self.titulo(nome)
+        franquia = registro['franquia'] if registro is not None else _base_franquia(nome)
+        return self.titulos[self.titulos['franquia'] == franquia].sort_values('total_sales', ascending=False)
+
+    # Títulos com mais vendas somando todas as plataformas (opcionalmente só os lançados em várias plataformas)
+    def ranking(self, n=10, coluna='total_sales', minimo_plataformas=1):
+        titulos = self.titulos[self.titulos['plataformas'] >= minimo_plataformas]
+        return titulos.nlargest(n, coluna)
+
+    def ranking_franquias(self, n=10, coluna='total_sales', minimo_titulos=1):
+        return self.franquias[self.franquias['titulos'] >= minimo_titulos].nlargest(n, coluna)
+
+    # ## Gravação
+
+    # Gravando o índice em um diretório (montado em um temporário e renomeado no final)
+    def salvar(self, diretorio):
+        diretorio = Path(diretorio)
+        formato = _formato_cache()
+        temporario = diretorio.with_name(f'{diretorio.name}.tmp{os.getpid()}')
+        temporario.mkdir(parents=True, exist_ok=True)
+        for nome, tabela in [('titulos', self.titulos), ('franquias', self.franquias)]:
+            if formato == 'parquet':
+                tabela.to_parquet(temporario / f'{nome}.parquet')
+            else:
+                tabela.to_pickle(temporario / f'{nome}.pkl')
+        np.save(temporario / 'ordem.npy', self.ordem)
+        np.save(temporario / 'inicios.npy', self.inicios)
+        metadados = {**self.metadados, 'formato': formato, 'versao_limpeza': VERSAO_LIMPEZA,
+                     'versao_indice': VERSAO_INDICE, 'titulos': len(self)}
+        (temporario / ARQUIVO_METADADOS).write_text(json.dumps(metadados, ensure_ascii=False))
+        if diretorio.exists():
+            shutil.rmtree(diretorio)
+        os.replace(temporario, diretorio)
+        return diretorio
+
+    @classmethod
+    def abrir(cls, diretorio):
+        diretorio = Path(diretorio)
+        metadados = json.loads((diretorio / ARQUIVO_METADADOS).read_text())
+        ler = pd.read_parquet if metadados['formato'] == 'parquet' else pd.read_pickle
+        return cls(ler(diretorio / f'titulos.{metadados["formato"]}'), ler(diretorio / f'franquias.{metadados["formato"]}'),
+                   np.load(diretorio / 'ordem.npy'), np.load(diretorio / 'inicios.npy'), metadados)
+
+
+# Índice de títulos do arquivo, no diretório de cache. As linhas do índice são as posições nos dados de
+# carregar_jogos(caminho)
+def carregar_indice(caminho, dir_cache=DIR_CACHE_PADRAO, games=None):
+    chave = f'{Path(caminho).stem}-{chave_cache(caminho, dir_cache)}-v{VERSAO_INDICE}'
+    diretorio = Path(dir_cache) / 'titulos' / chave
+    if (diretorio / ARQUIVO_METADADOS).exists():
+        return IndiceTitulos.abrir(diretorio)
+    indice = IndiceTitulos.construir(games if games is not None else carregar_jogos(caminho, dir_cache))
+    indice.salvar(diretorio)
+    return indice
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Índice de títulos e agregados entre plataformas.')
+    parser.add_argument('caminho', nargs='?', default='/datasets/games.csv', help='arquivo CSV de vendas')
+    parser.add_argument('--dir-cache', default=DIR_CACHE_PADRAO, help='diretório do cache')
+    parser.add_argument('--buscar', action='append', default=[], metavar='TITULO', help='título a procurar')
+    parser.add_argument('--top', type=int, default=10, help='tamanho dos rankings')
+    args = parser.parse_args()
+
+    verificar_franquias()
+    inicio = time.perf_counter()
+    indice = carregar_indice(args.caminho, args.dir_cache)
+    print(f'{len(indice)} títulos e {len(indice.franquias)} franquias ({time.perf_counter() - inicio:.3f} s)')
+
+    print('Títulos com mais vendas em várias plataformas:')
+    print(indice.ranking(args.top, minimo_plataformas=2))
+    print('Franquias com mais vendas:')
+    print(indice.ranking_franquias(args.top, minimo_titulos=2))
+
+    if args.buscar:
+        games = carregar_jogos(args.caminho, args.dir_cache)
+        for titulo in args.buscar:
+            inicio = time.perf_counter()
+            linhas = indice.linhas(titulo)
+            print(f'{titulo!r}: {len(linhas)} linhas em {(time.perf_counter() - inicio) * 1e6:.0f} µs')
+            print(games.iloc[linhas][['name', 'platform', 'year_of_release', 'total_sales']])
+            print(indice.franquia(titulo)[['nome', 'plataformas', 'primeiro_ano', 'total_sales']].head(args.top))
@@ -0,0 +1,196 @@
+# # Validação dos arquivos de vendas e quarentena das linhas rejeitadas
+
+# A limpeza de 'carregamento.py' supõe que o arquivo tem o formato de 'games.csv'. Um arquivo malformado (vendas
+# não numéricas, marcadores em 'User_Score' além de 'tbd', anos fora do intervalo, classificações desconhecidas)
+# faria a conversão de tipos falhar ou seria convertido sem aviso. Aqui o arquivo é lido todo como texto, cada
+# coluna é verificada com máscaras vetorizadas, e os motivos de rejeição de cada linha são acumulados em um
+# único inteiro (um bit por motivo), em uma passada pelas colunas. As linhas rejeitadas são gravadas com os
+# códigos dos motivos em um arquivo de quarentena; as válidas seguem, já com os tipos de 'ler_jogos', para
+# 'limpar_jogos'.
+#
+# Exemplo:
+#     python validacao.py lote_2017_01.csv --quarentena quarentena.csv
+
+import argparse
+import os
+import time
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from carregamento import TIPOS_COLUNAS
+
+
+COLUNAS_VENDAS_ORIGINAIS = ['NA_sales', 'EU_sales', 'JP_sales', 'Other_sales']
+CLASSIFICACOES = ['E', 'T', 'M', 'E10+', 'EC', 'K-A', 'RP', 'AO']
+MARCADORES_AVALIACAO = ['tbd']
+ANO_MINIMO = 1970
+ANO_MAXIMO = date.today().year + 1
+
+# Motivos de rejeição: código -> bit
+MOTIVOS = {
+    'plataforma_ausente': 1 << 0,
+    'ano_nao_numerico': 1 << 1,
+    'ano_fora_do_intervalo': 1 << 2,
+    'venda_ausente': 1 << 3,
+    'venda_nao_numerica': 1 << 4,
+    'venda_negativa': 1 << 5,
+    'nota_critica_nao_numerica': 1 << 6,
+    'nota_critica_fora_do_intervalo': 1 << 7,
+    'nota_usuario_nao_numerica': 1 << 8,
+    'nota_usuario_fora_do_intervalo': 1 << 9,
+    'classificacao_desconhecida': 1 << 10,
+}
+
+
+# Lendo o arquivo inteiro como texto, sem nenhuma conversão (nada falha na leitura)
+def ler_bruto(caminho, **kwargs):
+    return pd.read_csv(caminho, dtype=str, keep_default_na=False, na_values=[''], **kwargs)
+
+
+# Convertendo uma coluna de texto em número: retorna os valores (NaN nos ausentes e nos inválidos) e a máscara
+# dos valores presentes que não são números. As colunas de vendas, notas e anos têm poucos valores distintos em
+# relação ao número de linhas; cada valor distinto é convertido uma única vez e o resultado é espalhado pelos
+# códigos (a conversão de texto em número, linha a linha, é a parte mais lenta da validação)
+def _numeros(coluna, ignorar=()):
+    codigos, distintos = pd.factorize(coluna)
+    convertidos = pd.to_numeric(pd.Series(distintos, dtype=object), errors='coerce').to_numpy(dtype='float64')
+    invalidos_distintos = np.isnan(convertidos) & ~np.isin(distintos, list(ignorar))
+
+    # O código -1 (valor ausente) cai na posição extra do final: NaN e válido
+    convertidos = np.append(convertidos, np.nan)
+    invalidos_distintos = np.append(invalidos_distintos, False)
+    return convertidos[codigos], invalidos_distintos[codigos]
+
+
+# Validando todas as colunas. Retorna os códigos de rejeição de cada linha (0 para as válidas) e as colunas
+# numéricas já convertidas, para que a conversão de tipos não precise interpretar o texto de novo
+def codigos_rejeicao(bruto, ano_minimo=ANO_MINIMO, ano_maximo=ANO_MAXIMO):
+    faltando = [coluna for coluna in TIPOS_COLUNAS if coluna not in bruto.columns]
+    if faltando:
+        raise ValueError(f'Colunas ausentes no arquivo: {", ".join(faltando)}')
+
+    codigos = np.zeros(len(bruto), dtype=np.uint32)
+    convertidas = {}
+
+    def marcar(mascara, motivo):
+        codigos[mascara] |= MOTIVOS[motivo]
+
+    marcar(bruto['Platform'].isna().to_numpy(), 'plataforma_ausente')
+
+    # O ano pode faltar (essas linhas são removidas na limpeza), mas, se presente, deve ser um ano plausível
+    anos, invalidos = _numeros(bruto['Year_of_Release'])
+    marcar(invalidos, 'ano_nao_numerico')
+    with np.errstate(invalid='ignore'):
+        fora = (anos < ano_minimo) | (anos > ano_maximo) | (np.isfinite(anos) & (anos % 1 != 0))
+    marcar(fora, 'ano_fora_do_intervalo')
+    convertidas['Year_of_Release'] = anos
+
+    for coluna in COLUNAS_VENDAS_ORIGINAIS:
+        vendas, invalidos = _numeros(bruto[coluna])
+        marcar(bruto[coluna].isna().to_numpy(), 'venda_ausente')
+        marcar(invalidos, 'venda_nao_numerica')
+        with np.errstate(invalid='ignore'):
+            marcar(vendas < 0, 'venda_negativa')
+        convertidas[coluna] = vendas
+
+    notas_critica, invalidos = _numeros(bruto['Critic_Score'])
+    marcar(invalidos, 'nota_critica_nao_numerica')
+    with np.errstate(invalid='ignore'):
+        marcar((notas_critica < 0) | (notas_critica > 100), 'nota_critica_fora_do_intervalo')
+    convertidas['Critic_Score'] = notas_critica
+
+    notas_usuario, invalidos = _numeros(bruto['User_Score'], ignorar=MARCADORES_AVALIACAO)
+    marcar(invalidos, 'nota_usuario_nao_numerica')
+    with np.errstate(invalid='ignore'):
+        marcar((notas_usuario < 0) | (notas_usuario > 10), 'nota_usuario_fora_do_intervalo')
+
+    marcar((bruto['Rating'].notna() & ~bruto['Rating'].isin(CLASSIFICACOES)).to_numpy(), 'classificacao_desconhecida')
+    return codigos, convertidas
+
+
+# Texto com os motivos de cada código (separados por ';'), montado por combinação distinta de motivos
+def descrever_codigos(codigos):
+    distintos, posicoes = np.unique(codigos, return_inverse=True)
+    descricoes = np.array([';'.join(m for m, bit in MOTIVOS.items() if c & bit) for c in distintos], dtype=object)
+    return descricoes[posicoes.ravel()]
+
+
+# Validando o DataFrame bruto: retorna as linhas válidas (com os tipos de 'ler_jogos'), as rejeitadas (texto
+# original, número da linha no arquivo e motivos) e a contagem de linhas por motivo
+def validar_jogos(bruto, ano_minimo=ANO_MINIMO, ano_maximo=ANO_MAXIMO):
+    codigos, convertidas = codigos_rejeicao(bruto, ano_minimo, ano_maximo)
+    validas = codigos == 0
+
+    jogos = bruto.loc[validas, list(TIPOS_COLUNAS)]
+    for coluna, valores in convertidas.items():
+        jogos[coluna] = valores[validas]
+    jogos = jogos.astype(TIPOS_COLUNAS).reset_index(drop=True)
+
+    rejeitadas = bruto.loc[~validas].copy()
+    # Linha no arquivo, contando o cabeçalho como linha 1
+    rejeitadas.insert(0, 'linha', np.flatnonzero(~validas) + 2)
+    rejeitadas['motivos'] = descrever_codigos(codigos[~validas])
+
+    contagens = pd.Series({motivo: int(np.count_nonzero(codigos & bit)) for motivo, bit in MOTIVOS.items()},
+                          name='linhas')
+    return jogos, rejeitadas, contagens[contagens > 0]
+
+
+# Gravando as linhas rejeitadas no arquivo de quarentena. Por padrão, as linhas são acrescentadas às que já estão
+# no arquivo, sem repetir a mesma linha do mesmo arquivo de origem (validar o mesmo arquivo de novo não duplica a
+# quarentena); com 'substituir', o arquivo passa a ter só estas linhas. O arquivo é montado em um temporário e
+# renomeado no final
+def gravar_quarentena(rejeitadas, arquivo, origem=None, substituir=False):
+    arquivo = Path(arquivo)
+    if origem is not None:
+        rejeitadas = rejeitadas.assign(arquivo=str(origem))
+    if not substituir and arquivo.exists():
+        anteriores = pd.read_csv(arquivo, dtype=str, keep_default_na=False, na_values=[''])
+        rejeitadas = pd.concat([anteriores, rejeitadas.astype({'linha': str})], ignore_index=True)
+        chave = [coluna for coluna in ['arquivo', 'linha'] if coluna in rejeitadas.columns]
+        rejeitadas = rejeitadas.drop_duplicates(subset=chave, keep='last')
+    if not len(rejeitadas) and not substituir:
+        return None
+    arquivo.parent.mkdir(parents=True, exist_ok=True)
+    temporario = arquivo.with_name(f'{arquivo.name}.tmp{os.getpid()}')
+    rejeitadas.to_csv(temporario, index=False)
+    os.replace(temporario, arquivo)
+    return arquivo
+
+
+# Lendo e validando um arquivo; as linhas rejeitadas vão para 'arquivo_quarentena' (quando informado)
+def ler_validado(caminho, arquivo_quarentena=None, **kwargs):
+    jogos, rejeitadas, contagens = validar_jogos(ler_bruto(caminho), **kwargs)
+    if arquivo_quarentena is not None:
+        gravar_quarentena(rejeitadas, arquivo_quarentena, origem=Path(caminho).resolve())
+    return jogos, rejeitadas, contagens
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Valida um arquivo de vendas e separa as linhas rejeitadas.')
+    parser.add_argument('caminho', help='arquivo CSV de vendas')
+    parser.add_argument('--quarentena', help='arquivo CSV onde as linhas rejeitadas são acrescentadas')
+    parser.add_argument('--ano-minimo', type=int, default=ANO_MINIMO)
+    parser.add_argument('--ano-maximo', type=int, default=ANO_MAXIMO)
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    bruto = ler_bruto(args.caminho)
+    leitura = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    jogos, rejeitadas, contagens = validar_jogos(bruto, args.ano_minimo, args.ano_maximo)
+    validacao = time.perf_counter() - inicio
+
+    print(f'{len(bruto)} linhas lidas em {leitura:.3f} s; validadas em {validacao:.3f} s '
+          f'({len(bruto) / max(validacao, 1e-9) / 1e6:.2f} milhões de linhas/s)')
+    print(f'{len(jogos)} válidas, {len(rejeitadas)} rejeitadas')
+    if len(contagens):
+        print(contagens.to_string())
+    if args.quarentena:
+        arquivo = gravar_quarentena(rejeitadas, args.quarentena, origem=Path(args.caminho).resolve())
+        if arquivo is not None:
+            print(f'Linhas rejeitadas em {arquivo}')